@@ -0,0 +1,4 @@
+"""Benchmarks for anchorpy.
+
+Run them from the repo root with `python -m benchmarks.<name>`.
+"""
@@ -0,0 +1,126 @@
+"""Compare the `base64` and `base64+zstd` account encodings.
+
+For the accounts of the test IDLs, builds the `getMultipleAccounts` response
+an RPC node would send for 100 accounts in each encoding, and reports the bytes
+on the wire per account, with and without gzip response compression, and the
+time `solders` takes to parse the response, per account. "random" accounts are
+filled with random field values; "sparse" ones are all zeros after the
+discriminator, like freshly initialized accounts.
+
+Also reports the size of a batched `getMultipleAccounts` request body, which
+`get_multiple_accounts(gzip_requests=True)` compresses.
+
+Requires `zstandard` to build the zstd payloads.
+
+Usage: python -m benchmarks.account_encoding
+"""
+import gzip
+import json
+import random
+from base64 import b64encode
+from pathlib import Path
+from timeit import Timer
+from typing import Callable, Dict, List
+
+import zstandard
+from anchorpy import Idl
+from anchorpy.coder.accounts import _account_discriminator
+from anchorpy.coder.common import _account_size
+from anchorpy.utils.rpc import _GET_MULTIPLE_ACCOUNTS_LIMIT
+from solders.pubkey import Pubkey
+from solders.rpc.config import RpcAccountInfoConfig
+from solders.rpc.requests import GetMultipleAccounts, batch_to_json
+from solders.rpc.responses import GetMultipleAccountsResp, batch_from_json
+
+from tests.samples import sample_typedef_bytes
+
+_MAX_SAMPLE_SIZE = 10_000
+_OWNER = str(Pubkey.default())
+
+
+def _time_per_call(func: Callable[[], object]) -> float:
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def _samples(rng: random.Random) -> Dict[str, List[bytes]]:
+    samples: Dict[str, List[bytes]] = {"random": [], "sparse": []}
+    for path in sorted(Path("tests/idls").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        idl = Idl.from_json(path.read_text())
+        for acc in idl.accounts:
+            try:
+                size = _account_size(idl, acc)
+            except ValueError:
+                continue
+            if size > _MAX_SAMPLE_SIZE:
+                continue
+            disc = _account_discriminator(acc.name)
+            samples["random"].append(disc + sample_typedef_bytes(acc, idl.types, rng))
+            samples["sparse"].append(disc + bytes(size))
+    return samples
+
+
+def _response(datas: List[bytes], encoding: str) -> str:
+    compressor = zstandard.ZstdCompressor()
+    value = []
+    for data in datas:
+        payload = compressor.compress(data) if encoding == "base64+zstd" else data
+        value.append(
+            {
+                "data": [b64encode(payload).decode(), encoding],
+                "executable": False,
+                "lamports": 1,
+                "owner": _OWNER,
+                "rentEpoch": 0,
+                "space": len(data),
+            }
+        )
+    result = {"context": {"slot": 1}, "value": value}
+    return json.dumps([{"jsonrpc": "2.0", "id": 0, "result": result}])
+
+
+def main() -> None:
+    rng = random.Random(0)
+    samples = _samples(rng)
+    print(f"Per account, over batches of {_GET_MULTIPLE_ACCOUNTS_LIMIT} accounts.")
+    print(f"{'':<20} {'bytes':>8} {'gzipped':>8} {'parse':>9}")
+    for kind, datas in samples.items():
+        batches = [
+            rng.sample(datas, min(_GET_MULTIPLE_ACCOUNTS_LIMIT, len(datas)))
+            for _ in range(5)
+        ]
+        n_accounts = sum(len(batch) for batch in batches)
+        for encoding in ("base64", "base64+zstd"):
+            bodies = [_response(batch, encoding) for batch in batches]
+            size = sum(len(body) for body in bodies)
+            gzipped = sum(len(gzip.compress(body.encode())) for body in bodies)
+
+            def parse(bodies: List[str] = bodies) -> None:
+                for body in bodies:
+                    batch_from_json(body, [GetMultipleAccountsResp])
+
+            per_account = _time_per_call(parse) / n_accounts
+            print(
+                f"{kind + ' ' + encoding:<20} {size / n_accounts:8.0f}"
+                f" {gzipped / n_accounts:8.0f} {per_account * 1e6:7.1f}us"
+            )
+    config = RpcAccountInfoConfig()
+    reqs = [
+        GetMultipleAccounts(
+            [Pubkey.new_unique() for _ in range(_GET_MULTIPLE_ACCOUNTS_LIMIT)], config
+        )
+        for _ in range(3)
+    ]
+    body = batch_to_json(reqs)
+    raw = body.encode()
+    print(
+        f"Request body for 3 x {_GET_MULTIPLE_ACCOUNTS_LIMIT} pubkeys: {len(raw)} "
+        f"bytes, {len(gzip.compress(raw, compresslevel=6))} gzipped"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Export synthetic program accounts to Arrow record batches and Parquet.
+
+Usage: python -m benchmarks.arrow_export [n_accounts]
+"""
+import random
+import sys
+import tempfile
+from itertools import cycle, islice
+from pathlib import Path
+from time import perf_counter
+
+from anchorpy import Idl
+from anchorpy.coder.accounts import AccountsCoder
+from anchorpy.utils.arrow import to_record_batches, write_parquet
+
+from tests.samples import sample_typedef_bytes
+
+_CASES = (
+    ("quarry_mine", "Miner"),
+    ("clientgen_example_program", "State"),
+)
+_N_DISTINCT = 1000
+
+
+def _buffers(idl: Idl, name: str, coder: AccountsCoder, count: int) -> list:
+    acc = next(acc for acc in idl.accounts if acc.name == name)
+    disc = coder.acc_name_to_discriminator[name]
+    rng = random.Random(0)
+    distinct = [
+        disc + sample_typedef_bytes(acc, idl.types, rng) for _ in range(_N_DISTINCT)
+    ]
+    return list(islice(cycle(distinct), count))
+
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Exporting {count:,} accounts")
+    print(
+        f"{'account':<40} {'decode':>9} {'batches':>9} {'gc off':>9} "
+        f"{'parquet':>9} {'size':>10}"
+    )
+    for idl_name, name in _CASES:
+        idl = Idl.from_json(Path(f"tests/idls/{idl_name}.json").read_text())
+        coder = AccountsCoder(idl, compiled=True)
+        buffers = _buffers(idl, name, coder, count)
+        start = perf_counter()
+        for buffer in buffers:
+            coder.decode(buffer)
+        decode_time = perf_counter() - start
+        start = perf_counter()
+        for _ in to_record_batches(idl, name, buffers, coder=coder):
+            pass
+        batches_time = perf_counter() - start
+        start = perf_counter()
+        for _ in to_record_batches(idl, name, buffers, coder=coder, pause_gc=True):
+            pass
+        paused_time = perf_counter() - start
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "accounts.parquet"
+            start = perf_counter()
+            write_parquet(path, idl, name, buffers, coder=coder)
+            parquet_time = perf_counter() - start
+            size = path.stat().st_size
+        print(
+            f"{idl_name + '.' + name:<40} {decode_time:8.2f}s {batches_time:8.2f}s "
+            f"{paused_time:8.2f}s {parquet_time:8.2f}s {size / 1e6:8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
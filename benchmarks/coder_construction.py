@@ -0,0 +1,52 @@
+"""Time `Coder(idl)` construction on every test IDL.
+
+Cold times clear `DEFAULT_LAYOUT_CACHE` of generated enums and dataclasses
+before each construction, as in a fresh process. Warm times keep them, as when
+a second `Program` is created for an IDL already loaded.
+
+Usage: python -m benchmarks.coder_construction
+"""
+from pathlib import Path
+from timeit import Timer
+from typing import Callable
+
+from anchorpy import DEFAULT_LAYOUT_CACHE, Coder, Idl
+
+
+def _clear_caches() -> None:
+    DEFAULT_LAYOUT_CACHE.cache_clear()
+
+
+def _time_per_call(func: Callable[[], object]) -> float:
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def _cold(idl: Idl) -> None:
+    _clear_caches()
+    Coder(idl)
+
+
+def main() -> None:
+    print(f"{'IDL':<40} {'types':>6} {'cold':>12} {'warm':>12}")
+    total_cold = total_warm = 0.0
+    for path in sorted(Path("tests/idls").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        idl = Idl.from_json(path.read_text())
+        cold = _time_per_call(lambda: _cold(idl))
+        warm = _time_per_call(lambda: Coder(idl))
+        total_cold += cold
+        total_warm += warm
+        print(
+            f"{path.stem:<40} {len(idl.types):>6} "
+            f"{cold * 1e3:10.2f}ms {warm * 1e3:10.2f}ms"
+        )
+    print(
+        f"{'total':<40} {'':>6} {total_cold * 1e3:10.2f}ms {total_warm * 1e3:10.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
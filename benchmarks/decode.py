@@ -0,0 +1,120 @@
+"""Compare construct decoding with the generated decoders on every test IDL.
+
+Usage: python -m benchmarks.decode [--verbose]
+"""
+import random
+import sys
+from pathlib import Path
+from timeit import Timer
+from typing import Callable, List, NamedTuple
+
+from anchorpy import Coder, Idl
+from anchorpy.coder.common import _account_size
+
+from tests.samples import sample_typedef_bytes
+
+_MAX_SAMPLE_SIZE = 100_000
+_N_SAMPLES = 20
+
+_Decode = Callable[[bytes], object]
+
+
+class _Case(NamedTuple):
+    label: str
+    decode: _Decode
+    compiled_decode: _Decode
+    samples: List[bytes]
+
+
+def _time_per_call(func: Callable[[], object]) -> float:
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def _decode_all(cases: List[_Case], compiled: bool) -> None:
+    for case in cases:
+        decode = case.compiled_decode if compiled else case.decode
+        for sample in case.samples:
+            decode(sample)
+
+
+def _is_small(idl: Idl, typedef) -> bool:
+    try:
+        return _account_size(idl, typedef) <= _MAX_SAMPLE_SIZE
+    except ValueError:
+        return False
+
+
+def _cases(idl: Idl) -> List[_Case]:
+    coder = Coder(idl)
+    compiled_coder = Coder(idl, compiled=True)
+    rng = random.Random(0)
+    cases = []
+    for acc in idl.accounts:
+        if not _is_small(idl, acc):
+            continue
+        disc = coder.accounts.acc_name_to_discriminator[acc.name]
+        samples = [
+            disc + sample_typedef_bytes(acc, idl.types, rng) for _ in range(_N_SAMPLES)
+        ]
+        cases.append(
+            _Case(
+                f"account {acc.name}",
+                coder.accounts.decode,
+                compiled_coder.accounts.decode,
+                samples,
+            )
+        )
+    for typedef in coder.types.filtered_types:
+        if not _is_small(idl, typedef):
+            continue
+        name = typedef.name
+        samples = [
+            sample_typedef_bytes(typedef, idl.types, rng) for _ in range(_N_SAMPLES)
+        ]
+        cases.append(
+            _Case(
+                f"type {name}",
+                lambda data, name=name: coder.types.decode(name, data),
+                lambda data, name=name: compiled_coder.types.decode(name, data),
+                samples,
+            )
+        )
+    return cases
+
+
+def _report(label: str, construct_time: float, compiled_time: float) -> None:
+    print(
+        f"{label:<50} {construct_time * 1e6:10.1f}us {compiled_time * 1e6:10.1f}us "
+        f"{construct_time / compiled_time:7.1f}x"
+    )
+
+
+def main() -> None:
+    verbose = "--verbose" in sys.argv
+    print("Time to decode one sample of every account and type of each IDL.")
+    print(f"{'IDL':<50} {'construct':>12} {'compiled':>12} {'speedup':>8}")
+    for path in sorted(Path("tests/idls").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        cases = _cases(Idl.from_json(path.read_text()))
+        if not cases:
+            continue
+        construct_time = _time_per_call(lambda: _decode_all(cases, compiled=False))
+        compiled_time = _time_per_call(lambda: _decode_all(cases, compiled=True))
+        _report(path.stem, construct_time / _N_SAMPLES, compiled_time / _N_SAMPLES)
+        if not verbose:
+            continue
+        for case in cases:
+            case_construct = _time_per_call(lambda: _decode_all([case], False))
+            case_compiled = _time_per_call(lambda: _decode_all([case], True))
+            _report(
+                f"  {case.label}",
+                case_construct / _N_SAMPLES,
+                case_compiled / _N_SAMPLES,
+            )
+
+
+if __name__ == "__main__":
+    main()
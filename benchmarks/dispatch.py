@@ -0,0 +1,139 @@
+"""Compare `parse` with the direct `decode` path of the coders.
+
+`parse` goes through the `Sequence` and `Switch` constructs around the account,
+instruction and event layouts. `decode` looks up the layout by discriminator
+and parses the data after it. Times are per decode, and peak memory is the
+most memory traced by `tracemalloc` at once during a decode, on average.
+
+Usage: python -m benchmarks.dispatch
+"""
+import random
+import tracemalloc
+from pathlib import Path
+from timeit import Timer
+from typing import Callable, Dict, List, NamedTuple
+
+from anchorpy import Coder, Idl
+from anchorpy.coder.common import _account_size
+from anchorpy.coder.event import _event_discriminator
+from pyheck import snake
+
+from tests.samples import sample_type_bytes, sample_typedef_bytes
+
+_MAX_SAMPLE_SIZE = 10_000
+_N_SAMPLES = 10
+
+_Decode = Callable[[bytes], object]
+
+
+class _Case(NamedTuple):
+    parse: _Decode
+    decode: _Decode
+    samples: List[bytes]
+
+
+_Cases = Dict[str, List[_Case]]
+
+
+def _time_per_call(func: Callable[[], object]) -> float:
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def _peak_bytes(decode: _Decode, samples: List[bytes]) -> float:
+    total = 0
+    tracemalloc.start()
+    for sample in samples:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        decode(sample)
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - before
+    tracemalloc.stop()
+    return total / len(samples)
+
+
+def _is_small(idl: Idl, typedef) -> bool:
+    try:
+        return _account_size(idl, typedef) <= _MAX_SAMPLE_SIZE
+    except ValueError:
+        return False
+
+
+def _add_cases(cases: _Cases, idl: Idl, rng: random.Random) -> None:
+    coder = Coder(idl)
+    for acc in idl.accounts:
+        if not _is_small(idl, acc):
+            continue
+        disc = coder.accounts.acc_name_to_discriminator[acc.name]
+        samples = [
+            disc + sample_typedef_bytes(acc, idl.types, rng) for _ in range(_N_SAMPLES)
+        ]
+        cases["accounts"].append(
+            _Case(
+                lambda data: coder.accounts.parse(data).data,
+                coder.accounts.decode,
+                samples,
+            )
+        )
+    ix_types = [*idl.accounts, *idl.types]
+    for ix in idl.instructions:
+        sighash = coder.instruction.sighashes[snake(ix.name)]
+        samples = [
+            sighash
+            + b"".join(sample_type_bytes(arg.ty, ix_types, rng) for arg in ix.args)
+            for _ in range(_N_SAMPLES)
+        ]
+        cases["instructions"].append(
+            _Case(coder.instruction.parse, coder.instruction.decode, samples)
+        )
+    for event in idl.events or []:
+        disc = _event_discriminator(event.name)
+        samples = [
+            disc
+            + b"".join(sample_type_bytes(f.ty, idl.types, rng) for f in event.fields)
+            for _ in range(_N_SAMPLES)
+        ]
+        cases["events"].append(_Case(coder.events.parse, coder.events.decode, samples))
+
+
+def _decode_all(cases: List[_Case], direct: bool) -> None:
+    for case in cases:
+        decode = case.decode if direct else case.parse
+        for sample in case.samples:
+            decode(sample)
+
+
+def main() -> None:
+    rng = random.Random(0)
+    cases: _Cases = {"accounts": [], "instructions": [], "events": []}
+    for path in sorted(Path("tests/idls").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        _add_cases(cases, Idl.from_json(path.read_text()), rng)
+    print("Per decode, averaged over every account, instruction and event of the")
+    print("test IDLs.")
+    print(
+        f"{'':<14} {'parse':>10} {'decode':>10} {'parse peak':>12} {'decode peak':>12}"
+    )
+    for kind, kind_cases in cases.items():
+        n_samples = sum(len(case.samples) for case in kind_cases)
+        times = [
+            _time_per_call(lambda: _decode_all(kind_cases, direct)) / n_samples
+            for direct in (False, True)
+        ]
+        peaks = [
+            sum(_peak_bytes(case.parse, case.samples) for case in kind_cases),
+            sum(_peak_bytes(case.decode, case.samples) for case in kind_cases),
+        ]
+        peaks = [peak / len(kind_cases) for peak in peaks]
+        print(
+            f"{kind:<14}"
+            + "".join(f"{t * 1e6:9.1f}us" for t in times)
+            + "".join(f"{p / 1024:10.1f}KiB" for p in peaks)
+        )
+
+
+if __name__ == "__main__":
+    main()
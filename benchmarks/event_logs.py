@@ -0,0 +1,101 @@
+"""Time `EventParser.iter_events` on log-heavy transactions.
+
+Each transaction has a few events among many `msg!` logs and `sol_log_data`
+payloads that aren't events. "decode all" is the handler as it was before log
+lines were checked against the base64 prefixes of the event discriminators:
+it base64-decodes every `Program log:` and `Program data:` line and looks up
+the discriminator afterwards.
+
+Usage: python -m benchmarks.event_logs
+"""
+import binascii
+import random
+from base64 import b64decode, b64encode
+from pathlib import Path
+from timeit import Timer
+from typing import Callable, List, Optional
+
+from anchorpy import Event, EventParser, Idl, Program
+from anchorpy.coder.event import _event_discriminator
+from anchorpy.program.event import (
+    PROGRAM_DATA,
+    PROGRAM_DATA_START_INDEX,
+    PROGRAM_LOG,
+    PROGRAM_LOG_START_INDEX,
+)
+from solders.pubkey import Pubkey
+
+_N_TRANSACTIONS = 100
+_N_LOGS = 200
+_EVENT_RATE = 0.05
+
+
+class _DecodeAllParser(EventParser):
+    def handle_program_log(
+        self, log: str
+    ) -> tuple[Optional[Event], Optional[str], bool]:
+        if log.startswith(PROGRAM_LOG):
+            log_str = log[PROGRAM_LOG_START_INDEX:]
+        elif log.startswith(PROGRAM_DATA):
+            log_str = log[PROGRAM_DATA_START_INDEX:]
+        else:
+            return (None, *self.handle_system_log(log))
+        try:
+            decoded = b64decode(log_str)
+        except binascii.Error:
+            return None, None, False
+        discriminators = self._discriminators
+        if discriminators is not None and decoded[:8] not in discriminators:
+            return None, None, False
+        return self.coder.events.decode(decoded), None, False
+
+
+def _time_per_call(func: Callable[[], object]) -> float:
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def _transaction(program_id: Pubkey, rng: random.Random) -> List[str]:
+    logs = [f"Program {program_id} invoke [1]"]
+    for idx in range(_N_LOGS):
+        roll = rng.random()
+        if roll < _EVENT_RATE:
+            name = rng.choice(["AuthAccountCreated", "Authenticated"])
+            data = _event_discriminator(name) + bytes(Pubkey.new_unique())
+            logs.append(f"{PROGRAM_DATA}{b64encode(data).decode()}")
+        elif roll < 0.3:
+            data = rng.randbytes(rng.randrange(8, 120))
+            logs.append(f"{PROGRAM_DATA}{b64encode(data).decode()}")
+        else:
+            logs.append(f"{PROGRAM_LOG}Step {idx}: moved {rng.randrange(10**9)} units")
+    logs.append(f"Program {program_id} success")
+    return logs
+
+
+def _parse_all(parser: EventParser, transactions: List[List[str]]) -> int:
+    return sum(1 for logs in transactions for _ in parser.iter_events(logs))
+
+
+def main() -> None:
+    rng = random.Random(0)
+    idl = Idl.from_json(Path("tests/idls/jet_auth.json").read_text())
+    program_id = Pubkey.new_unique()
+    coder = Program(idl, program_id).coder
+    transactions = [_transaction(program_id, rng) for _ in range(_N_TRANSACTIONS)]
+    parsers = {
+        "decode all": _DecodeAllParser(program_id, coder),
+        "prefix check": EventParser(program_id, coder),
+        "decode all, one name": _DecodeAllParser(program_id, coder, ["Authenticated"]),
+        "prefix check, one name": EventParser(program_id, coder, ["Authenticated"]),
+    }
+    print(f"{_N_TRANSACTIONS} transactions of {_N_LOGS} logs, in us per transaction.")
+    for label, parser in parsers.items():
+        per_tx = _time_per_call(lambda: _parse_all(parser, transactions))
+        per_tx /= _N_TRANSACTIONS
+        n_events = _parse_all(parser, transactions)
+        print(f"{label:<24} {per_tx * 1e6:9.1f}us {n_events:>6} events")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time the decoding loop of `AccountClient.fetch_multiple`.
+
+The RPC round trip is left out: each client decodes a batch of accounts as
+returned by `get_multiple_accounts`, with a few missing accounts and accounts
+of another type mixed in. "per-call sha256" is the loop as it was before the
+discriminator was precomputed, for comparison.
+
+Usage: python -m benchmarks.fetch_multiple
+"""
+import random
+from pathlib import Path
+from timeit import Timer
+from typing import Any, Callable, List, Optional
+
+from anchorpy import AccountClient, Idl, Program, Provider, Wallet
+from anchorpy.coder.accounts import _account_discriminator
+from anchorpy.coder.common import _account_size
+from anchorpy.utils.rpc import _MultipleAccountsItem
+from solana.rpc.async_api import AsyncClient
+from solders.account import Account
+from solders.pubkey import Pubkey
+
+from tests.samples import sample_typedef_bytes
+
+_BATCH_SIZE = 200
+_MAX_SAMPLE_SIZE = 10_000
+_IDLS = [
+    "tests/idls/switchboard.json",
+    "tests/idls/jet.json",
+    "tests/idls/clientgen_example_program.json",
+]
+
+_Items = List[Optional[_MultipleAccountsItem]]
+
+
+def _time_per_call(func: Callable[[], object]) -> float:
+    timer = Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def _per_call_sha256(client: AccountClient, accounts: _Items) -> List[Any]:
+    discriminator = _account_discriminator(client._idl_account.name)
+    result: List[Any] = []
+    for account in accounts:
+        if account is None:
+            result.append(None)
+        elif discriminator == account.account.data[:8]:
+            result.append(client.coder.accounts.decode(account.account.data))
+        else:
+            result.append(None)
+    return result
+
+
+def _batch(client: AccountClient, idl: Idl, rng: random.Random) -> _Items:
+    disc = client._discriminator
+    items: _Items = []
+    for idx in range(_BATCH_SIZE):
+        if idx % 50 == 0:
+            items.append(None)
+            continue
+        data = sample_typedef_bytes(client._idl_account, idl.types, rng)
+        # every 20th account is of another type
+        data = (bytes(8) if idx % 20 == 0 else disc) + data
+        account = Account(1, data, client.program_id)
+        items.append(_MultipleAccountsItem(Pubkey.new_unique(), account))
+    return items
+
+
+def main() -> None:
+    provider = Provider(AsyncClient("http://localhost:8899"), Wallet.dummy())
+    rng = random.Random(0)
+    print(f"Decoding {_BATCH_SIZE} accounts, in accounts per second.")
+    header = f"{'account':<50} {'per-call sha256':>16} {'default':>12} {'compiled':>12}"
+    print(header)
+    for idl_path in _IDLS:
+        idl = Idl.from_json(Path(idl_path).read_text())
+        program = Program(idl, Pubkey.default(), provider)
+        compiled = Program(idl, Pubkey.default(), provider, compiled=True)
+        for acc in idl.accounts:
+            try:
+                if _account_size(idl, acc) > _MAX_SAMPLE_SIZE:
+                    continue
+            except ValueError:
+                continue
+            client = program.account[acc.name]
+            compiled_client = compiled.account[acc.name]
+            items = _batch(client, idl, rng)
+            times = [
+                _time_per_call(lambda: _per_call_sha256(client, items)),
+                _time_per_call(lambda: client._decode_multiple(items, None)),
+                _time_per_call(lambda: compiled_client._decode_multiple(items, None)),
+            ]
+            label = f"{Path(idl_path).stem}.{acc.name}"
+            print(f"{label:<50}" + "".join(f"{_BATCH_SIZE / t:13.0f}/s" for t in times))
+
+
+if __name__ == "__main__":
+    main()
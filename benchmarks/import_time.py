@@ -0,0 +1,79 @@
+"""Check the time importing anchorpy's entry points takes against a budget.
+
+Each statement runs in a fresh interpreter with `-X importtime`, and the
+cumulative times of its top-level imports are added up, minus those of an
+interpreter that imports nothing (the `site` imports). The best of several
+runs of each statement is compared with its budget, and the script exits with
+status 1 if any goes over, so it can run in CI.
+
+`import anchorpy` itself imports nothing until a name is used, so it is only
+reported. The budgets apply to importing `Coder` and `Program`, which is what
+users pay for. `--scale` multiplies them, for machines slower than the ones
+they were measured on.
+
+Usage: python -m benchmarks.import_time [--scale FACTOR]
+"""
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+_RUNS = 7
+# about 100ms and 300ms were measured; the budgets catch new heavy imports
+_BUDGETS_MS: Dict[str, Optional[float]] = {
+    "import anchorpy": None,
+    "from anchorpy import Coder": 150.0,
+    "from anchorpy import Program": 350.0,
+}
+
+
+def _import_time(statement: str) -> float:
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    # lines look like "import time:   self [us] |  cumulative | imported package"
+    top_level: List[int] = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name[1:].startswith(" "):
+            top_level.append(int(cumulative))
+    return sum(top_level) / 1e3
+
+
+def _best(statement: str) -> float:
+    return min(_import_time(statement) for _ in range(_RUNS))
+
+
+def _best_over_baseline(statement: str, baseline: float) -> float:
+    return max(_best(statement) - baseline, 0.0)
+
+
+def main() -> None:
+    scale = 1.0
+    if "--scale" in sys.argv:
+        scale = float(sys.argv[sys.argv.index("--scale") + 1])
+    print(f"Import time, best of {_RUNS} fresh interpreters.")
+    print(f"{'statement':<40} {'time':>10} {'budget':>10}")
+    baseline = _best("pass")
+    over: List[Tuple[str, float]] = []
+    for statement, budget in _BUDGETS_MS.items():
+        elapsed = _best_over_baseline(statement, baseline)
+        if budget is None:
+            print(f"{statement:<40} {elapsed:8.1f}ms {'-':>10}")
+            continue
+        budget *= scale
+        print(f"{statement:<40} {elapsed:8.1f}ms {budget:8.1f}ms")
+        if elapsed > budget:
+            over.append((statement, elapsed - budget))
+    for statement, excess in over:
+        print(f"`{statement}` over budget by {excess:.1f}ms")
+    if over:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Time `Program` construction in a fresh process, with and without a `CodeCache`.
+
+Each measurement runs in a new interpreter, like a worker starting up:
+"no cache" builds the program without a `CodeCache`, "cold" with an empty one
+and "warm" with the one the cold run filled.
+
+Usage: python -m benchmarks.startup [--compiled]
+"""
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+_RUNS = 5
+_IDLS = [
+    "tests/idls/switchboard_v2.mainnet.06022022.json",
+    "tests/idls/switchboard.json",
+    "tests/idls/jet.json",
+    "tests/idls/clientgen_example_program.json",
+]
+_SCRIPT = """
+import sys
+from pathlib import Path
+from time import perf_counter
+
+from anchorpy import CodeCache, Idl, Program, Provider, Wallet
+from solana.rpc.async_api import AsyncClient
+from solders.pubkey import Pubkey
+
+idl = Idl.from_json(Path(sys.argv[1]).read_text())
+code_cache = CodeCache(sys.argv[2]) if sys.argv[2] else None
+provider = Provider(AsyncClient("http://localhost:8899"), Wallet.dummy())
+start = perf_counter()
+compiled = sys.argv[3] == "1"
+Program(idl, Pubkey.default(), provider, compiled=compiled, code_cache=code_cache)
+print(perf_counter() - start)
+"""
+
+
+def _run(idl_path: str, cache_dir: Optional[str], compiled: bool) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", _SCRIPT, idl_path, cache_dir or "", str(int(compiled))],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return float(out.stdout)
+
+
+def _min_time(idl_path: str, compiled: bool, mode: str) -> float:
+    times: List[float] = []
+    for _ in range(_RUNS):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            if mode == "no cache":
+                times.append(_run(idl_path, None, compiled))
+                continue
+            cold = _run(idl_path, cache_dir, compiled)
+            times.append(
+                cold if mode == "cold" else _run(idl_path, cache_dir, compiled)
+            )
+    return min(times)
+
+
+def main() -> None:
+    compiled = "--compiled" in sys.argv
+    print(f"Program(compiled={compiled}) construction in a fresh process.")
+    print(f"{'IDL':<40} {'no cache':>10} {'cold':>10} {'warm':>10}")
+    for idl_path in _IDLS:
+        times = [
+            _min_time(idl_path, compiled, mode) for mode in ("no cache", "cold", "warm")
+        ]
+        print(
+            f"{Path(idl_path).stem:<40}" + "".join(f"{t * 1e3:8.1f}ms" for t in times)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,68 +1,128 @@
 """The Python Anchor client."""
-from contextlib import suppress as __suppress
+from importlib import import_module
+from importlib.util import find_spec
+from typing import TYPE_CHECKING, Any, Dict, List
 
-from anchorpy_core.idl import Idl
+if TYPE_CHECKING:
+    from anchorpy_core.idl import Idl
 
-from anchorpy import error, utils
-from anchorpy.coder.coder import AccountsCoder, Coder, EventCoder, InstructionCoder
-from anchorpy.idl import IdlProgramAccount
-from anchorpy.program.common import (
-    Event,
-    NamedInstruction,
-    translate_address,
-    validate_accounts,
-)
-from anchorpy.program.context import Context
-from anchorpy.program.core import Program
-from anchorpy.program.event import EventParser
-from anchorpy.program.namespace.account import AccountClient, ProgramAccount
-from anchorpy.program.namespace.simulate import SimulateResponse
-from anchorpy.provider import Provider, Wallet
-from anchorpy.workspace import WorkspaceType, close_workspace, create_workspace
-
-__has_pytest = False
-with __suppress(ImportError):
-    from anchorpy.pytest_plugin import (
-        localnet_fixture,
-        workspace_fixture,
+    from anchorpy import error, utils
+    from anchorpy.coder.cache import (
+        DEFAULT_LAYOUT_CACHE,
+        LayoutCache,
+        LayoutCacheInfo,
     )
+    from anchorpy.coder.code_cache import CodeCache
+    from anchorpy.coder.coder import (
+        AccountsCoder,
+        Coder,
+        EventCoder,
+        InstructionCoder,
+    )
+    from anchorpy.idl import IdlProgramAccount
+    from anchorpy.program.backfill import (
+        BackfillCheckpoint,
+        BackfillEvent,
+        EventBackfill,
+    )
+    from anchorpy.program.cache import AccountCache, AccountCacheInfo
+    from anchorpy.program.common import (
+        Event,
+        NamedInstruction,
+        translate_address,
+        validate_accounts,
+    )
+    from anchorpy.program.context import Context
+    from anchorpy.program.core import Program
+    from anchorpy.program.event import EventParser, MultiProgramEventParser
+    from anchorpy.program.namespace.account import (
+        AccountClient,
+        ProgramAccount,
+        ProgramAccountArray,
+    )
+    from anchorpy.program.namespace.simulate import SimulateResponse
+    from anchorpy.program.subscription import (
+        AccountSubscription,
+        AccountUpdate,
+        EventSubscription,
+    )
+    from anchorpy.provider import Provider, Wallet
+    from anchorpy.pytest_plugin import localnet_fixture, workspace_fixture
+    from anchorpy.workspace import WorkspaceType, close_workspace, create_workspace
 
-    __has_pytest = True
-
-__all_core = [
-    "Program",
-    "Provider",
-    "Context",
-    "create_workspace",
-    "close_workspace",
-    "Idl",
-    "WorkspaceType",
-    "Wallet",
-    "Coder",
-    "InstructionCoder",
-    "EventCoder",
-    "AccountsCoder",
-    "NamedInstruction",
-    "IdlProgramAccount",
-    "Event",
-    "translate_address",
-    "validate_accounts",
-    "AccountClient",
-    "ProgramAccount",
-    "EventParser",
-    "SimulateResponse",
-    "error",
-    "utils",
-]
+# Public names are imported on first access, so `import anchorpy` stays cheap.
+_LAZY_IMPORTS: Dict[str, str] = {
+    "Program": "anchorpy.program.core",
+    "Provider": "anchorpy.provider",
+    "Context": "anchorpy.program.context",
+    "create_workspace": "anchorpy.workspace",
+    "close_workspace": "anchorpy.workspace",
+    "Idl": "anchorpy_core.idl",
+    "WorkspaceType": "anchorpy.workspace",
+    "Wallet": "anchorpy.provider",
+    "Coder": "anchorpy.coder.coder",
+    "InstructionCoder": "anchorpy.coder.coder",
+    "EventCoder": "anchorpy.coder.coder",
+    "AccountsCoder": "anchorpy.coder.coder",
+    "LayoutCache": "anchorpy.coder.cache",
+    "LayoutCacheInfo": "anchorpy.coder.cache",
+    "DEFAULT_LAYOUT_CACHE": "anchorpy.coder.cache",
+    "CodeCache": "anchorpy.coder.code_cache",
+    "NamedInstruction": "anchorpy.program.common",
+    "IdlProgramAccount": "anchorpy.idl",
+    "Event": "anchorpy.program.common",
+    "translate_address": "anchorpy.program.common",
+    "validate_accounts": "anchorpy.program.common",
+    "AccountClient": "anchorpy.program.namespace.account",
+    "ProgramAccount": "anchorpy.program.namespace.account",
+    "ProgramAccountArray": "anchorpy.program.namespace.account",
+    "EventParser": "anchorpy.program.event",
+    "MultiProgramEventParser": "anchorpy.program.event",
+    "SimulateResponse": "anchorpy.program.namespace.simulate",
+    "EventSubscription": "anchorpy.program.subscription",
+    "AccountSubscription": "anchorpy.program.subscription",
+    "AccountUpdate": "anchorpy.program.subscription",
+    "EventBackfill": "anchorpy.program.backfill",
+    "BackfillEvent": "anchorpy.program.backfill",
+    "BackfillCheckpoint": "anchorpy.program.backfill",
+    "AccountCache": "anchorpy.program.cache",
+    "AccountCacheInfo": "anchorpy.program.cache",
+    "error": "anchorpy.error",
+    "utils": "anchorpy.utils",
+}
+_PYTEST_IMPORTS: Dict[str, str] = {
+    "localnet_fixture": "anchorpy.pytest_plugin",
+    "workspace_fixture": "anchorpy.pytest_plugin",
+}
+# the modules anchorpy.pytest_plugin imports, which are only in the pytest extra
+_PYTEST_PLUGIN_DEPS = ("pytest", "pytest_asyncio", "pytest_xprocess", "xprocess")
+if all(find_spec(dep) is not None for dep in _PYTEST_PLUGIN_DEPS):
+    _LAZY_IMPORTS.update(_PYTEST_IMPORTS)
 
-__all__ = (
-    [
-        *__all_core,
-        "localnet_fixture",
-        "workspace_fixture",
-    ]
-    if __has_pytest
-    else __all_core
-)
+__all__ = list(_LAZY_IMPORTS)
 
 __version__ = "0.21.0"
+
+
+def __getattr__(name: str) -> Any:
+    """Import a public name on first access."""
+    try:
+        module_name = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    try:
+        module = import_module(module_name)
+    except ImportError as e:
+        if name not in _PYTEST_IMPORTS:
+            raise
+        raise AttributeError(
+            f"module {__name__!r} has no attribute {name!r}: {e}"
+        ) from e
+    value = module if module_name == f"{__name__}.{name}" else getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    """List the public names, including those not imported yet."""
+    return sorted({*globals(), *__all__})
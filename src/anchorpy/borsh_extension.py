@@ -1,5 +1,5 @@
 """Extensions to the Borsh spec for Solana-specific types."""
-from dataclasses import asdict
+from dataclasses import fields
 from keyword import kwlist
 from typing import Any, Dict, Type, TypeVar, cast
 
@@ -114,7 +114,8 @@ class _DataclassStruct(Adapter):
     def _encode(self, obj: T, context, path) -> Dict[str, Any]:
         if isinstance(obj, dict):
             return obj
-        return asdict(obj)
+        # nested dataclasses are encoded by their own layouts, so don't recurse
+        return {field.name: getattr(obj, field.name) for field in fields(obj)}
 
 
 BorshPubkey = BorshPubkeyAdapter()
@@ -1,11 +1,21 @@
 """This module provides `AccountsCoder` and `_account_discriminator`."""
+from contextlib import suppress
 from hashlib import sha256
-from typing import Any, Tuple
+from typing import Any, Dict, List, Optional, Tuple, cast
 
-from anchorpy_core.idl import Idl
+from anchorpy_core.idl import Idl, IdlTypeDefinitionTyStruct
 from construct import Adapter, Bytes, Container, Sequence, Switch
 
-from anchorpy.coder.idl import _typedef_layout
+from anchorpy.coder.codegen import _DECODE_ERRORS, _Decoder, _IdlDecoders
+from anchorpy.coder.common import _field_offsets, _fixed_type_size, _parse_from
+from anchorpy.coder.idl import (
+    _dataclass_field_names,
+    _type_layout,
+    _typedef_layout,
+    _TypeIndex,
+)
+from anchorpy.coder.view import AccountView, _ViewLayout
+from anchorpy.error import AccountInvalidDiscriminator
 from anchorpy.program.common import NamedInstruction as AccountToSerialize
 
 ACCOUNT_DISCRIMINATOR_SIZE = 8  # bytes
@@ -14,14 +24,28 @@ ACCOUNT_DISCRIMINATOR_SIZE = 8  # bytes
 class AccountsCoder(Adapter):
     """Encodes and decodes account data."""
 
-    def __init__(self, idl: Idl) -> None:
+    def __init__(
+        self,
+        idl: Idl,
+        compiled: bool = False,
+        decoders: Optional[_IdlDecoders] = None,
+        types: Optional[_TypeIndex] = None,
+    ) -> None:
         """Init.
 
         Args:
             idl: The parsed IDL object.
+            compiled: Whether to decode accounts with generated decoders
+                instead of the `construct` layouts.
+            decoders: The generated decoders to use if `compiled` is True.
+                Generated from the IDL if omitted.
+            types: The indexed IDL types, shared with the other coders.
+                Built from the IDL if omitted.
         """
+        self._types = _TypeIndex(idl.types) if types is None else types
         self._accounts_layout = {
-            acc.name: _typedef_layout(acc, idl.types, acc.name) for acc in idl.accounts
+            acc.name: _typedef_layout(acc, self._types, acc.name)
+            for acc in idl.accounts
         }
         self.acc_name_to_discriminator = {
             acc.name: _account_discriminator(acc.name) for acc in idl.accounts
@@ -29,15 +53,28 @@ class AccountsCoder(Adapter):
         self.discriminator_to_acc_name = {
             disc: acc_name for acc_name, disc in self.acc_name_to_discriminator.items()
         }
-        discriminator_to_typedef_layout = {
+        self._discriminator_to_layout = {
             disc: self._accounts_layout[acc_name]
             for acc_name, disc in self.acc_name_to_discriminator.items()
         }
+        discriminator_to_layout = self._discriminator_to_layout
         subcon = Sequence(
             "discriminator" / Bytes(ACCOUNT_DISCRIMINATOR_SIZE),
-            Switch(lambda this: this.discriminator, discriminator_to_typedef_layout),
+            Switch(lambda this: this.discriminator, discriminator_to_layout),
         )
         super().__init__(subcon)  # type: ignore
+        self._idl = idl
+        self._idl_accounts = {acc.name: acc for acc in idl.accounts}
+        self._decoders = decoders
+        self._view_layouts: Dict[str, Optional[_ViewLayout]] = {}
+        self._numpy_dtypes: Dict[str, Any] = {}
+        self._compiled_decoders: Dict[bytes, _Decoder] = {}
+        if compiled:
+            idl_decoders = self._get_decoders()
+            for acc_name, disc in self.acc_name_to_discriminator.items():
+                decoder = idl_decoders.account(acc_name)
+                if decoder is not None:
+                    self._compiled_decoders[disc] = decoder
 
     def decode(self, obj: bytes) -> Container[Any]:
         """Decode account data.
@@ -48,7 +85,229 @@ class AccountsCoder(Adapter):
         Returns:
             Decoded data.
         """
-        return self.parse(obj).data
+        discriminator = bytes(obj[:ACCOUNT_DISCRIMINATOR_SIZE])
+        if self._compiled_decoders:
+            decoder = self._compiled_decoders.get(discriminator)
+            if decoder is not None:
+                # on malformed data, let construct raise its usual error
+                with suppress(*_DECODE_ERRORS):
+                    return decoder(obj, ACCOUNT_DISCRIMINATOR_SIZE)[0]
+        layout = self._discriminator_to_layout.get(discriminator)
+        if layout is None:
+            return self.parse(obj).data
+        # skip the Sequence and Switch around the account layouts
+        return _parse_from(layout, obj, ACCOUNT_DISCRIMINATOR_SIZE)
+
+    def classify(self, buffers: List[bytes]) -> List[Optional[str]]:
+        """Find the account type of each buffer from its discriminator.
+
+        Only the first 8 bytes of each buffer are read, so this is a cheap way to
+        route accounts before decoding them.
+
+        Args:
+            buffers: Account data, including the discriminator.
+
+        Returns:
+            The account name for each buffer, or None if the discriminator
+            doesn't match any account in the IDL.
+        """
+        lookup = self.discriminator_to_acc_name.get
+        return [
+            lookup(bytes(buffer[:ACCOUNT_DISCRIMINATOR_SIZE])) for buffer in buffers
+        ]
+
+    def view(self, data: bytes) -> AccountView:
+        """Create a lazy view of account data.
+
+        Fields are decoded straight from the underlying buffer when first
+        accessed, which is much cheaper than `decode` when reading a few fields
+        of a large account.
+
+        Args:
+            data: Data to view, including the discriminator.
+
+        Raises:
+            AccountInvalidDiscriminator: If the discriminator doesn't match the IDL.
+
+        Returns:
+            The account view.
+        """
+        buffer = memoryview(data)
+        acc_name = self._account_name(buffer)
+        layout = self._view_layout(acc_name)
+        if layout is None:
+            # raise the error the layout failed with
+            layout = _ViewLayout(
+                self._idl_accounts[acc_name], self._types, self._get_decoders()
+            )
+        return AccountView(layout, buffer[ACCOUNT_DISCRIMINATOR_SIZE:])
+
+    def decode_fields(self, data: bytes, fields: List[str]) -> Container[Any]:
+        """Decode only some fields of account data.
+
+        Fields at a fixed offset are decoded straight from the buffer, and the
+        fields before them are skipped without being decoded. The fields
+        following a variable-size field are found by decoding the fields
+        before them.
+
+        Args:
+            data: Data to decode, including the discriminator. If all the
+                requested fields are within the first `fields_prefix_size` bytes,
+                the data can stop there.
+            fields: Names of the fields to decode, as on the object returned
+                by `decode`.
+
+        Raises:
+            AccountInvalidDiscriminator: If the discriminator doesn't match the IDL.
+            ValueError: If the account doesn't have one of the fields.
+
+        Returns:
+            The requested fields, in the requested order.
+        """
+        buffer = memoryview(data)
+        acc_name = self._account_name(buffer)
+        self._field_indices(acc_name, fields)
+        layout = self._view_layout(acc_name)
+        if layout is None:
+            decoded = self.decode(data)
+            return Container((name, getattr(decoded, name)) for name in fields)
+        view = AccountView(layout, buffer[ACCOUNT_DISCRIMINATOR_SIZE:])
+        return Container((name, getattr(view, name)) for name in fields)
+
+    def fields_prefix_size(self, name: str, fields: List[str]) -> Optional[int]:
+        """Return how many bytes of an account `decode_fields` needs.
+
+        Useful to only fetch that many bytes with a `dataSlice`.
+
+        Args:
+            name: The account name.
+            fields: Names of the fields to decode, as on the object returned
+                by `decode`.
+
+        Raises:
+            ValueError: If the account doesn't have one of the fields.
+
+        Returns:
+            The size of the data up to the end of the last requested field,
+            including the discriminator, or None if a requested field isn't at
+            a fixed offset or doesn't have a fixed size.
+        """
+        indices = self._field_indices(name, fields)
+        if self._view_layout(name) is None:
+            return None
+        idl_account = self._idl_accounts[name]
+        idl_fields = cast(IdlTypeDefinitionTyStruct, idl_account.ty).fields
+        offsets = _field_offsets(self._types, idl_account)
+        end = 0
+        for idx in indices:
+            offset = offsets[idx]
+            size = _fixed_type_size(self._types, idl_fields[idx].ty)
+            if offset is None or size is None:
+                return None
+            end = max(end, offset + size)
+        return ACCOUNT_DISCRIMINATOR_SIZE + end
+
+    def decode_many_numpy(self, name: str, buffers: List[bytes]) -> Any:
+        """Decode many accounts of the same fixed-size type into a NumPy array.
+
+        The account layout is mapped to a NumPy structured dtype and all the
+        buffers are decoded at once, which is much faster than calling `decode`
+        on each of them. Public keys are stored as raw 32-byte values, fieldless
+        enums as their variant index and 128-bit integers as `lo` and `hi`
+        64-bit words.
+
+        Requires the `numpy` extra.
+
+        Args:
+            name: The account name.
+            buffers: Data to decode, including the discriminator.
+
+        Raises:
+            ValueError: If the account is not fixed-size, or a buffer doesn't hold
+                an account of this type.
+
+        Returns:
+            A read-only NumPy structured array with one record per buffer.
+        """
+        from anchorpy.coder.arrays import _decode_many, _typedef_dtype
+
+        if name not in self._numpy_dtypes:
+            dtype = _typedef_dtype(self._idl_accounts[name], self._types)
+            if dtype is None:
+                raise ValueError(f"{name} is not a fixed-size account")
+            self._numpy_dtypes[name] = dtype
+        discriminator = self.acc_name_to_discriminator[name]
+        return _decode_many(self._numpy_dtypes[name], discriminator, buffers)
+
+    def field_offset(self, name: str, field: str) -> Optional[int]:
+        """Return where a field starts in the account data.
+
+        Args:
+            name: The account name.
+            field: The field name, as on the object returned by `decode`.
+
+        Raises:
+            ValueError: If the account doesn't have the field.
+
+        Returns:
+            The offset of the field, including the discriminator, or None if
+            it comes after a variable-size field.
+        """
+        (idx,) = self._field_indices(name, [field])
+        offset = _field_offsets(self._types, self._idl_accounts[name])[idx]
+        return None if offset is None else ACCOUNT_DISCRIMINATOR_SIZE + offset
+
+    def encode_field(self, name: str, field: str, value: Any) -> bytes:
+        """Encode a field value the way it is stored in the account data.
+
+        Args:
+            name: The account name.
+            field: The field name, as on the object returned by `decode`.
+            value: The value to encode.
+
+        Raises:
+            ValueError: If the account doesn't have the field.
+
+        Returns:
+            The encoded value.
+        """
+        (idx,) = self._field_indices(name, [field])
+        idl_account_type = cast(IdlTypeDefinitionTyStruct, self._idl_accounts[name].ty)
+        idl_field = idl_account_type.fields[idx]
+        return _type_layout(idl_field.ty, self._types).build(value)
+
+    def _account_name(self, buffer: memoryview) -> str:
+        discriminator = bytes(buffer[:ACCOUNT_DISCRIMINATOR_SIZE])
+        try:
+            return self.discriminator_to_acc_name[discriminator]
+        except KeyError:
+            msg = f"Unknown account discriminator {discriminator!r}"
+            raise AccountInvalidDiscriminator(msg) from None
+
+    def _view_layout(self, acc_name: str) -> Optional[_ViewLayout]:
+        if acc_name not in self._view_layouts:
+            layout = None
+            with suppress(ValueError):
+                layout = _ViewLayout(
+                    self._idl_accounts[acc_name], self._types, self._get_decoders()
+                )
+            self._view_layouts[acc_name] = layout
+        return self._view_layouts[acc_name]
+
+    def _field_indices(self, acc_name: str, fields: List[str]) -> List[int]:
+        idl_account_type = self._idl_accounts[acc_name].ty
+        if not isinstance(idl_account_type, IdlTypeDefinitionTyStruct):
+            raise ValueError(f"{acc_name} is not a struct")
+        field_names = _dataclass_field_names(idl_account_type.fields)
+        unknown = [name for name in fields if name not in field_names]
+        if unknown:
+            raise ValueError(f"{acc_name} has no fields {unknown}")
+        return [field_names.index(name) for name in fields]
+
+    def _get_decoders(self) -> _IdlDecoders:
+        if self._decoders is None:
+            self._decoders = _IdlDecoders(self._idl, self._types)
+        return self._decoders
 
     def _decode(self, obj: Tuple[bytes, Any], context, path) -> AccountToSerialize:
         return AccountToSerialize(
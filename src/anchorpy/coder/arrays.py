@@ -0,0 +1,123 @@
+"""NumPy structured arrays for fixed-size IDL types.
+
+Requires the `numpy` extra: `pip install anchorpy[numpy]`.
+"""
+from dataclasses import fields as dataclass_fields
+from typing import Any, List, Optional, Tuple
+
+from anchorpy_core.idl import (
+    IdlType,
+    IdlTypeArray,
+    IdlTypeDefined,
+    IdlTypeDefinition,
+    IdlTypeDefinitionTyAlias,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
+    IdlTypeSimple,
+)
+
+from anchorpy.coder.idl import (
+    _find_typedef,
+    _idl_typedef_ty_struct_to_dataclass_type,
+)
+from anchorpy.idl import TypeDefs
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError(
+        "NumPy support requires the numpy extra: pip install anchorpy[numpy]"
+    ) from e
+
+_SIMPLE_DTYPES = {
+    IdlTypeSimple.Bool: np.dtype("?"),
+    IdlTypeSimple.U8: np.dtype("u1"),
+    IdlTypeSimple.I8: np.dtype("i1"),
+    IdlTypeSimple.U16: np.dtype("<u2"),
+    IdlTypeSimple.I16: np.dtype("<i2"),
+    IdlTypeSimple.U32: np.dtype("<u4"),
+    IdlTypeSimple.I32: np.dtype("<i4"),
+    IdlTypeSimple.F32: np.dtype("<f4"),
+    IdlTypeSimple.U64: np.dtype("<u8"),
+    IdlTypeSimple.I64: np.dtype("<i8"),
+    IdlTypeSimple.F64: np.dtype("<f8"),
+    # 128-bit integers don't fit in a NumPy scalar, so split them in two words.
+    IdlTypeSimple.U128: np.dtype([("lo", "<u8"), ("hi", "<u8")]),
+    IdlTypeSimple.I128: np.dtype([("lo", "<u8"), ("hi", "<i8")]),
+    IdlTypeSimple.PublicKey: np.dtype("V32"),
+}
+
+
+def _type_dtype(type_: IdlType, types: TypeDefs) -> Optional[np.dtype]:
+    if isinstance(type_, IdlTypeSimple):
+        return _SIMPLE_DTYPES.get(type_)
+    if isinstance(type_, IdlTypeArray):
+        element = _type_dtype(type_.array[0], types)
+        return None if element is None else np.dtype((element, (type_.array[1],)))
+    if isinstance(type_, IdlTypeDefined):
+        typedef = _find_typedef(types, type_.defined)
+        return None if typedef is None else _typedef_dtype(typedef, types)
+    return None
+
+
+def _typedef_dtype(typedef: IdlTypeDefinition, types: TypeDefs) -> Optional[np.dtype]:
+    """Map a fixed-size IDL typedef to a NumPy dtype.
+
+    Structs become structured dtypes with the same field names as the decoded
+    dataclasses, fixed-size arrays become subarrays, fieldless enums are stored
+    as their variant index and public keys as raw 32-byte values.
+
+    Args:
+        typedef: The IDL typedef object.
+        types: IDL type definitions.
+
+    Returns:
+        The dtype, or None if the typedef has no fixed-size NumPy representation.
+    """
+    typedef_type = typedef.ty
+    if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+        datacls = _idl_typedef_ty_struct_to_dataclass_type(
+            typedef_type, typedef.name, types
+        )
+        names = [field.name for field in dataclass_fields(datacls)]
+        field_dtypes: List[Tuple[str, np.dtype]] = []
+        for idx, field in enumerate(typedef_type.fields):
+            dtype = _type_dtype(field.ty, types)
+            if dtype is None:
+                return None
+            field_dtypes.append((names[idx], dtype))
+        return np.dtype(field_dtypes)
+    if isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+        if any(variant.fields is not None for variant in typedef_type.variants):
+            return None
+        return _SIMPLE_DTYPES[IdlTypeSimple.U8]
+    if isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+        return _type_dtype(typedef_type.value, types)
+    return None
+
+
+def _decode_many(dtype: np.dtype, discriminator: bytes, buffers: List[bytes]) -> Any:
+    """Decode many accounts of the same type with a single `np.frombuffer`.
+
+    Args:
+        dtype: The dtype of the account data.
+        discriminator: The account discriminator.
+        buffers: The raw account data, including the discriminator.
+
+    Raises:
+        ValueError: If a buffer is too short or has the wrong discriminator.
+
+    Returns:
+        A read-only structured array with one record per buffer.
+    """
+    record_size = len(discriminator) + dtype.itemsize
+    if any(len(buffer) != record_size for buffer in buffers):
+        if any(len(buffer) < record_size for buffer in buffers):
+            raise ValueError(f"Account data is shorter than {record_size} bytes")
+        # Accounts may be allocated with trailing space.
+        buffers = [buffer[:record_size] for buffer in buffers]
+    record = np.dtype([("discriminator", f"V{len(discriminator)}"), ("data", dtype)])
+    records = np.frombuffer(b"".join(buffers), dtype=record)
+    if (records["discriminator"] != np.void(discriminator)).any():
+        raise ValueError("Account data has the wrong discriminator")
+    return records["data"]
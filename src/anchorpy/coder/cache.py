@@ -0,0 +1,101 @@
+"""This module provides `LayoutCache`, a bounded cache of generated types."""
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable, NamedTuple, Optional, TypeVar
+
+_T = TypeVar("_T")
+
+
+class LayoutCacheInfo(NamedTuple):
+    """Statistics of a `LayoutCache`, like `functools.lru_cache`'s `cache_info()`."""
+
+    hits: int
+    misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+class LayoutCache:
+    """A bounded LRU cache of the enums and dataclasses generated from IDLs.
+
+    Generating these types is the slow part of building a `Coder`, so by default
+    every `Coder` shares `DEFAULT_LAYOUT_CACHE`, and loading the same IDL twice
+    reuses them. Give a `Coder` (or `Program`) its own `LayoutCache` to keep the
+    generated types of its IDL apart from the others, and free them along with
+    the `Coder`.
+
+    Types already handed to a `Coder` stay in use by that `Coder` when they are
+    evicted; they are just no longer shared with new ones.
+    """
+
+    def __init__(self, maxsize: Optional[int] = 4096) -> None:
+        """Init.
+
+        Args:
+            maxsize: The maximum number of entries. None means unbounded.
+        """
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f"maxsize must not be negative, got {maxsize}")
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for an entry without counting a hit or miss."""
+        return key in self._entries
+
+    def get(self, key: Hashable, make: Callable[[], _T]) -> _T:
+        """Get a cached entry, or make and cache it.
+
+        Args:
+            key: The entry key.
+            make: Called to make the entry on a miss.
+
+        Returns:
+            The cached entry.
+        """
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries.move_to_end(key)
+                return value
+        # Made outside the lock because making an enum looks up nested types.
+        value = make()
+        with self._lock:
+            value = self._entries.setdefault(key, value)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return value
+
+    def cache_info(self) -> LayoutCacheInfo:
+        """Report the cache statistics.
+
+        Returns:
+            Hits, misses, maximum size and current size.
+        """
+        with self._lock:
+            return LayoutCacheInfo(
+                self._hits, self._misses, self.maxsize, len(self._entries)
+            )
+
+    def cache_clear(self) -> None:
+        """Remove every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+DEFAULT_LAYOUT_CACHE = LayoutCache()
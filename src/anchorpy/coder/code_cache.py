@@ -0,0 +1,72 @@
+"""This module provides `CodeCache`, an on-disk cache of generated code."""
+import marshal
+import os
+from contextlib import suppress
+from hashlib import sha256
+from importlib.util import MAGIC_NUMBER
+from pathlib import Path
+from types import CodeType
+from typing import Union
+
+
+class CodeCache:
+    """An on-disk cache of the code that coders generate from IDLs.
+
+    Coders generate the methods of the dataclasses of an IDL, and the decoders
+    when `compiled=True`, as Python source and compile it, which is a large part
+    of the cost of building a `Program`. With a `CodeCache`, the compiled code is
+    written to `directory` and loaded from there the next time the same code is
+    generated, for example when another worker starts with the same IDL.
+
+    Entries are keyed by a hash of the generated source, which is derived from
+    the IDL, the anchorpy version and the Python bytecode version, so stale
+    entries are never loaded. Only point this at a directory you trust, like
+    Python's own `__pycache__`.
+    """
+
+    def __init__(self, directory: Union[Path, str]) -> None:
+        """Init.
+
+        Args:
+            directory: Where to store the compiled code. Created if missing.
+        """
+        self.directory = Path(directory)
+
+    def compile(self, source: str, filename: str) -> CodeType:  # noqa: A003
+        """Compile generated source, or load it if it was compiled before.
+
+        Args:
+            source: Python source of a module.
+            filename: The filename to show in tracebacks.
+
+        Returns:
+            The code object of the module.
+        """
+        path = self.directory / f"{self._key(source, filename)}.bin"
+        with suppress(OSError, EOFError, ValueError, TypeError):
+            return marshal.loads(path.read_bytes())
+        code = compile(source, filename, "exec")
+        self._write(path, marshal.dumps(code))
+        return code
+
+    @staticmethod
+    def _key(source: str, filename: str) -> str:
+        from anchorpy import __version__
+
+        digest = sha256()
+        for part in (__version__, MAGIC_NUMBER.hex(), filename, source):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _write(path: Path, data: bytes) -> None:
+        # The cache is best-effort: a read-only or full disk just means no cache.
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        except OSError:
+            with suppress(OSError):
+                tmp.unlink()
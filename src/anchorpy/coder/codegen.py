@@ -0,0 +1,393 @@
+"""Generated-source decoders for IDL types.
+
+For every IDL account and typedef we generate a specialized Python function that
+decodes the type with straight-line offset arithmetic, compile all of them once
+with `exec`, and call those instead of walking the `construct` layouts.
+Runs of fixed-size fields are read with a single precompiled `struct.Struct`.
+"""
+from contextlib import contextmanager
+from struct import Struct, unpack_from
+from struct import error as StructError
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from anchorpy_core.idl import (
+    EnumFieldsNamed,
+    Idl,
+    IdlField,
+    IdlType,
+    IdlTypeArray,
+    IdlTypeDefined,
+    IdlTypeDefinition,
+    IdlTypeDefinitionTyAlias,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
+    IdlTypeOption,
+    IdlTypeSimple,
+    IdlTypeVec,
+)
+from construct import ListContainer
+from solders.pubkey import Pubkey
+
+from anchorpy.coder.compiled import _Plan, _read_plain, _type_plan, _typedef_plan
+from anchorpy.coder.idl import (
+    _handle_enum_variants,
+    _idl_typedef_ty_struct_to_dataclass_type,
+    _TypeIndex,
+)
+from anchorpy.idl import TypeDefs
+
+_Decoder = Callable[[bytes, int], Tuple[Any, int]]
+
+# Errors a generated decoder raises on malformed input. The caller then falls back
+# to the `construct` layout so that the usual `construct` error is raised.
+_DECODE_ERRORS = (StructError, IndexError)
+
+_SIMPLE_VARIABLE_SIZE = {IdlTypeSimple.String, IdlTypeSimple.Bytes}
+
+
+class _UnsupportedTypeError(Exception):
+    """Raised when no decoder can be generated for a type."""
+
+
+class _FunctionBody:
+    """Source lines of one generated function."""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+        self._indent = 1
+        self._counter = 0
+
+    def var(self, prefix: str = "v") -> str:
+        self._counter += 1
+        return f"{prefix}{self._counter}"
+
+    def line(self, text: str) -> None:
+        self.lines.append("    " * self._indent + text)
+
+    @contextmanager
+    def block(self, header: str) -> Iterator[None]:
+        self.line(header)
+        self._indent += 1
+        try:
+            yield
+        finally:
+            self._indent -= 1
+
+
+class _DecoderSourceBuilder:
+    """Generates the decoder source for all the typedefs of an IDL."""
+
+    def __init__(self, types: TypeDefs) -> None:
+        self.types = types if isinstance(types, _TypeIndex) else _TypeIndex(types)
+        self.namespace: Dict[str, Any] = {
+            "_ListContainer": ListContainer,
+            "_Pubkey": Pubkey,
+            "_StructError": StructError,
+            "_unpack_from": unpack_from,
+            "_u32": Struct("<I").unpack_from,
+        }
+        self.chunks: List[str] = []
+        self._functions: Dict[Tuple[str, str], str] = {}
+        self._bound: Dict[int, str] = {}
+
+    def bind(self, obj: Any, prefix: str) -> str:
+        """Make an object available to the generated code under a unique name."""
+        if id(obj) in self._bound:
+            return self._bound[id(obj)]
+        name = f"_{prefix}{len(self.namespace)}"
+        self.namespace[name] = obj
+        self._bound[id(obj)] = name
+        return name
+
+    def generate(self, typedef: IdlTypeDefinition, kind: str) -> Optional[str]:
+        """Generate the decoder of a top-level typedef.
+
+        Returns:
+            The name of the generated function, or None if the typedef can't be
+            decoded. In that case nothing generated along the way is kept, so no
+            function can refer to a missing one.
+        """
+        return self._generate_or_rollback(lambda: self.typedef_function(typedef, kind))
+
+    def generate_value(self, type_: IdlType) -> Optional[str]:
+        """Generate a decoder for a single value of any IDL type.
+
+        Returns:
+            The name of the generated function, or None if the type can't be
+            decoded.
+        """
+        return self._generate_or_rollback(lambda: self._value_function(type_))
+
+    def _generate_or_rollback(self, generate: Callable[[], str]) -> Optional[str]:
+        n_chunks = len(self.chunks)
+        functions = dict(self._functions)
+        try:
+            return generate()
+        except _UnsupportedTypeError:
+            del self.chunks[n_chunks:]
+            self._functions = functions
+            return None
+
+    def _value_function(self, type_: IdlType) -> str:
+        func_name = f"_decode_value_{len(self.chunks)}"
+        body = _FunctionBody()
+        try:
+            value = self._emit_value(type_, body)
+        except (KeyError, ValueError) as e:
+            raise _UnsupportedTypeError(str(type_)) from e
+        body.line(f"return {value}, off")
+        self.chunks.append("\n".join([f"def {func_name}(buf, off):", *body.lines]))
+        return func_name
+
+    def typedef_function(self, typedef: IdlTypeDefinition, kind: str) -> str:
+        """Return the name of the generated decoder for a typedef.
+
+        Raises:
+            _UnsupportedTypeError: If the typedef can't be decoded.
+        """
+        key = (kind, typedef.name)
+        if key in self._functions:
+            return self._functions[key]
+        func_name = f"_decode_{kind}_{len(self._functions)}"
+        # Register before generating the body so recursive types resolve.
+        self._functions[key] = func_name
+        try:
+            source = self._typedef_source(typedef, func_name)
+        except (_UnsupportedTypeError, KeyError, ValueError) as e:
+            del self._functions[key]
+            raise _UnsupportedTypeError(typedef.name) from e
+        self.chunks.append(source)
+        return func_name
+
+    def _lookup(self, name: str) -> IdlTypeDefinition:
+        typedef = self.types.find(name)
+        if typedef is None:
+            raise _UnsupportedTypeError(name)
+        return typedef
+
+    def _typedef_source(self, typedef: IdlTypeDefinition, func_name: str) -> str:
+        body = _FunctionBody()
+        typedef_type = typedef.ty
+        plan = _typedef_plan(typedef, self.types)
+        if plan is not None:
+            unpack = self.bind(Struct("<" + plan.fmt).unpack_from, "s")
+            read = self.bind(plan.read, "r")
+            size = Struct("<" + plan.fmt).size
+            body.line(f"return {read}({unpack}(buf, off), 0), off + {size}")
+        elif isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+            values = self._emit_fields(typedef_type.fields, body)
+            datacls = _idl_typedef_ty_struct_to_dataclass_type(
+                typedef_type, typedef.name, self.types
+            )
+            cls_name = self.bind(datacls, "cls")
+            body.line(f"return {cls_name}({', '.join(values)}), off")
+        elif isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+            self._emit_enum(typedef, typedef_type, body)
+        elif isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+            value = self._emit_value(typedef_type.value, body)
+            body.line(f"return {value}, off")
+        else:
+            raise _UnsupportedTypeError(typedef.name)
+        return "\n".join([f"def {func_name}(buf, off):", *body.lines])
+
+    def _emit_fields(self, fields: List[IdlField], body: _FunctionBody) -> List[str]:
+        values: List[str] = []
+        run: List[_Plan] = []
+        for field in fields:
+            plan = _type_plan(field.ty, self.types)
+            if plan is not None:
+                run.append(plan)
+                continue
+            values.extend(self._emit_fixed_run(run, body))
+            run = []
+            values.append(self._emit_value(field.ty, body))
+        values.extend(self._emit_fixed_run(run, body))
+        return values
+
+    def _emit_fixed_run(self, run: List[_Plan], body: _FunctionBody) -> List[str]:
+        """Read consecutive fixed-size values with a single struct unpack."""
+        if not run:
+            return []
+        struct = Struct("<" + "".join(plan.fmt for plan in run))
+        unpack = self.bind(struct.unpack_from, "s")
+        unpacked = body.var("t")
+        body.line(f"{unpacked} = {unpack}(buf, off)")
+        body.line(f"off += {struct.size}")
+        values = []
+        idx = 0
+        for plan in run:
+            if plan.read is _read_plain:
+                values.append(f"{unpacked}[{idx}]")
+            else:
+                values.append(f"{self.bind(plan.read, 'r')}({unpacked}, {idx})")
+            idx += plan.n_values
+        return values
+
+    def _emit_value(self, type_: IdlType, body: _FunctionBody) -> str:
+        """Emit statements decoding a value and return the variable holding it."""
+        target = body.var()
+        plan = _type_plan(type_, self.types)
+        if plan is not None:
+            (value,) = self._emit_fixed_run([plan], body)
+            body.line(f"{target} = {value}")
+        elif type_ in _SIMPLE_VARIABLE_SIZE:
+            end = body.var("end")
+            body.line(f"{end} = off + 4 + _u32(buf, off)[0]")
+            with body.block(f"if {end} > len(buf):"):
+                body.line('raise _StructError("buffer too short")')
+            if type_ == IdlTypeSimple.String:
+                body.line(f'{target} = str(buf[off + 4:{end}], "utf8")')
+            else:
+                body.line(f"{target} = bytes(buf[off + 4:{end}])")
+            body.line(f"off = {end}")
+        elif isinstance(type_, IdlTypeVec):
+            self._emit_vec(type_.vec, target, body)
+        elif isinstance(type_, IdlTypeOption):
+            body.line(f"{target} = None")
+            body.line("off += 1")
+            with body.block("if buf[off - 1]:"):
+                inner = self._emit_value(type_.option, body)
+                body.line(f"{target} = {inner}")
+        elif isinstance(type_, IdlTypeArray):
+            body.line(f"{target} = _ListContainer()")
+            with body.block(f"for _ in range({type_.array[1]}):"):
+                element = self._emit_value(type_.array[0], body)
+                body.line(f"{target}.append({element})")
+        elif isinstance(type_, IdlTypeDefined):
+            func_name = self.typedef_function(self._lookup(type_.defined), "type")
+            body.line(f"{target}, off = {func_name}(buf, off)")
+        else:
+            raise _UnsupportedTypeError(str(type_))
+        return target
+
+    def _emit_vec(self, element: IdlType, target: str, body: _FunctionBody) -> None:
+        length = body.var("n")
+        body.line(f"{length} = _u32(buf, off)[0]")
+        body.line("off += 4")
+        plan = _type_plan(element, self.types)
+        if plan is None:
+            body.line(f"{target} = _ListContainer()")
+            with body.block(f"for _ in range({length}):"):
+                value = self._emit_value(element, body)
+                body.line(f"{target}.append({value})")
+            return
+        size = Struct("<" + plan.fmt).size
+        if plan.n_values == 1 and not plan.fmt.endswith("s"):
+            unpacked = f"_unpack_from('<%d{plan.fmt}' % {length}, buf, off)"
+        else:
+            unpacked = f"_unpack_from('<' + {plan.fmt!r} * {length}, buf, off)"
+        if plan.read is _read_plain:
+            body.line(f"{target} = _ListContainer({unpacked})")
+        else:
+            read = self.bind(plan.read, "r")
+            values = body.var("t")
+            body.line(f"{values} = {unpacked}")
+            body.line(
+                f"{target} = _ListContainer([{read}({values}, i * {plan.n_values}) "
+                f"for i in range({length})])"
+            )
+        body.line(f"off += {size} * {length}")
+
+    def _emit_enum(
+        self,
+        typedef: IdlTypeDefinition,
+        typedef_type: IdlTypeDefinitionTyEnum,
+        body: _FunctionBody,
+    ) -> None:
+        enum = _handle_enum_variants(typedef_type, self.types, typedef.name).enum
+        tag = body.var("tag")
+        body.line(f"{tag} = buf[off]")
+        body.line("off += 1")
+        for idx, variant in enumerate(typedef_type.variants):
+            constructor = self.bind(enum.getitem(idx), "variant")
+            with body.block(f"if {tag} == {idx}:"):
+                if variant.fields is None:
+                    body.line(f"return {constructor}(), off")
+                elif isinstance(variant.fields, EnumFieldsNamed):
+                    values = self._emit_fields(variant.fields.fields, body)
+                    body.line(f"return {constructor}({', '.join(values)}), off")
+                else:
+                    values = [
+                        self._emit_value(ty, body) for ty in variant.fields.fields
+                    ]
+                    body.line(
+                        f"return {constructor}(_ListContainer(({', '.join(values)},)))"
+                        ", off"
+                    )
+        body.line(f"raise IndexError({tag})")
+
+
+class _IdlDecoders:
+    """Generated decoders for the accounts and types of an IDL."""
+
+    def __init__(self, idl: Idl, types: Optional[_TypeIndex] = None) -> None:
+        """Generate and compile the decoders.
+
+        Args:
+            idl: The parsed IDL object.
+            types: The indexed IDL types. Built from the IDL if omitted.
+        """
+        self._name = idl.name
+        builder = _DecoderSourceBuilder(
+            _TypeIndex(idl.types) if types is None else types
+        )
+        account_names: Dict[str, str] = {}
+        type_names: Dict[str, str] = {}
+        for acc in idl.accounts:
+            func_name = builder.generate(acc, "account")
+            if func_name is not None:
+                account_names[acc.name] = func_name
+        for typedef in builder.types:
+            func_name = builder.generate(typedef, "type")
+            if func_name is not None:
+                type_names[typedef.name] = func_name
+        self._builder = builder
+        self.source = ""
+        self._n_compiled = 0
+        namespace = self._compile_new_chunks()
+        self.accounts: Dict[str, _Decoder] = {
+            name: namespace[func_name] for name, func_name in account_names.items()
+        }
+        self.types: Dict[str, _Decoder] = {
+            name: namespace[func_name] for name, func_name in type_names.items()
+        }
+
+    def account(self, name: str) -> Optional[_Decoder]:
+        """Get the decoder of an account, if one could be generated."""
+        return self.accounts.get(name)
+
+    def type(self, name: str) -> Optional[_Decoder]:  # noqa: A003
+        """Get the decoder of a user-defined type, if one could be generated."""
+        return self.types.get(name)
+
+    def value(self, type_: IdlType) -> Optional[_Decoder]:
+        """Generate a decoder for a single value of an IDL type.
+
+        Unlike the account and type decoders, these are generated on demand.
+
+        Args:
+            type_: The IDL type.
+
+        Returns:
+            The decoder, or None if one could not be generated.
+        """
+        func_name = self._builder.generate_value(type_)
+        if func_name is None:
+            return None
+        return self._compile_new_chunks()[func_name]
+
+    def _compile_new_chunks(self) -> Dict[str, Any]:
+        chunks = self._builder.chunks[self._n_compiled :]
+        self._n_compiled += len(chunks)
+        source = "\n\n\n".join(chunks)
+        self.source = f"{self.source}\n\n\n{source}" if self.source else source
+        namespace = self._builder.namespace
+        filename = f"<anchorpy decoders: {self._name}>"
+        code_cache = self._builder.types.code_cache
+        code = (
+            compile(source, filename, "exec")
+            if code_cache is None
+            else code_cache.compile(source, filename)
+        )
+        exec(code, namespace)
+        return namespace
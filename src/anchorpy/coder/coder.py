@@ -1,8 +1,14 @@
 """Provides the Coder class."""
+from typing import Optional
+
 from anchorpy_core.idl import Idl
 
 from anchorpy.coder.accounts import AccountsCoder
+from anchorpy.coder.cache import LayoutCache
+from anchorpy.coder.code_cache import CodeCache
+from anchorpy.coder.codegen import _IdlDecoders
 from anchorpy.coder.event import EventCoder
+from anchorpy.coder.idl import _prepare_idl_dataclasses, _TypeIndex
 from anchorpy.coder.instruction import InstructionCoder
 from anchorpy.coder.types import TypesCoder
 
@@ -10,13 +16,38 @@ from anchorpy.coder.types import TypesCoder
 class Coder:
     """Coder provides a facade for encoding and decoding all IDL related objects."""
 
-    def __init__(self, idl: Idl):
+    def __init__(
+        self,
+        idl: Idl,
+        compiled: bool = False,
+        layout_cache: Optional[LayoutCache] = None,
+        code_cache: Optional[CodeCache] = None,
+    ):
         """Initialize the coder.
 
         Args:
             idl: a parsed Idl instance.
+            compiled: Whether to decode accounts and types with decoders generated
+                from the IDL and compiled once, instead of the `construct` layouts.
+                The decoded objects are the same either way.
+            layout_cache: The cache of the enums and dataclasses generated from
+                the IDL. Defaults to `DEFAULT_LAYOUT_CACHE`, which is shared by
+                all coders. Pass a new `LayoutCache()` to scope it to this coder.
+            code_cache: An on-disk cache of the code generated from the IDL, to
+                build coders for the same IDL faster in other processes.
         """
+        _prepare_idl_dataclasses(idl, code_cache)
+        # One index of the IDL types, so the coders share lookups and layouts.
+        types = _TypeIndex(idl.types, layout_cache, code_cache)
+        self.layout_cache: LayoutCache = types.cache
+        self._types = types
+        decoders = _IdlDecoders(idl, types) if compiled else None
+        self.decoders: Optional[_IdlDecoders] = decoders
         self.instruction: InstructionCoder = InstructionCoder(idl)
-        self.accounts: AccountsCoder = AccountsCoder(idl)
-        self.events: EventCoder = EventCoder(idl)
-        self.types: TypesCoder = TypesCoder(idl)
+        self.accounts: AccountsCoder = AccountsCoder(
+            idl, compiled=compiled, decoders=decoders, types=types
+        )
+        self.events: EventCoder = EventCoder(idl, types=types)
+        self.types: TypesCoder = TypesCoder(
+            idl, compiled=compiled, decoders=decoders, types=types
+        )
@@ -1,6 +1,7 @@
 """Common utilities for encoding and decoding."""
 from hashlib import sha256
-from typing import Dict, Union
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence, Union
 
 from anchorpy_core.idl import (
     Idl,
@@ -13,10 +14,35 @@ from anchorpy_core.idl import (
     IdlTypeDefinition,
     IdlTypeDefinitionTyAlias,
     IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
     IdlTypeOption,
     IdlTypeSimple,
     IdlTypeVec,
 )
+from construct import Construct
+
+from anchorpy.coder.idl import _find_typedef, _TypeIndex
+from anchorpy.idl import TypeDefs
+
+_SIMPLE_TYPE_SIZES: Dict[IdlTypeSimple, int] = {
+    IdlTypeSimple.Bool: 1,
+    IdlTypeSimple.U8: 1,
+    IdlTypeSimple.I8: 1,
+    IdlTypeSimple.Bytes: 1,
+    IdlTypeSimple.String: 1,
+    IdlTypeSimple.I16: 2,
+    IdlTypeSimple.U16: 2,
+    IdlTypeSimple.U32: 4,
+    IdlTypeSimple.I32: 4,
+    IdlTypeSimple.F32: 4,
+    IdlTypeSimple.U64: 8,
+    IdlTypeSimple.I64: 8,
+    IdlTypeSimple.F64: 8,
+    IdlTypeSimple.U128: 16,
+    IdlTypeSimple.I128: 16,
+    IdlTypeSimple.PublicKey: 32,
+}
+_VARIABLE_SIZE_SIMPLE_TYPES = {IdlTypeSimple.Bytes, IdlTypeSimple.String}
 
 
 def _sighash(ix_name: str) -> bytes:
@@ -34,22 +60,39 @@ def _sighash(ix_name: str) -> bytes:
     return sha256(formatted_str.encode()).digest()[:8]
 
 
-def _type_size_compound_type(idl: Idl, ty: IdlTypeCompound) -> int:
+def _parse_from(layout: Construct, data: bytes, offset: int) -> Any:
+    """Parse data with a layout, starting at an offset.
+
+    Unlike `layout.parse(data[offset:])` this doesn't copy the data, since
+    `BytesIO` shares the buffer of a `bytes` object until it is written to.
+
+    Args:
+        layout: The layout to parse with.
+        data: The data to parse.
+        offset: Where to start parsing.
+
+    Returns:
+        The parsed object.
+    """
+    stream = BytesIO(data)
+    stream.seek(offset)
+    return layout.parse_stream(stream)
+
+
+def _type_size_compound_type(types: TypeDefs, ty: IdlTypeCompound) -> int:
     if isinstance(ty, IdlTypeVec):
         return 1
     if isinstance(ty, IdlTypeOption):
-        return 1 + _type_size(idl, ty.option)
+        return 1 + _type_size_in(types, ty.option)
     if isinstance(ty, IdlTypeDefined):
-        defined = ty.defined
-        filtered = [t for t in idl.types if t.name == defined]
-        if len(filtered) != 1:
+        type_def = _find_typedef(types, ty.defined)
+        if type_def is None:
             raise ValueError(f"Type not found {ty}")
-        type_def = filtered[0]
-        return _account_size(idl, type_def)
+        return _typedef_size(types, type_def)
     if isinstance(ty, IdlTypeArray):
         element_type = ty.array[0]
         array_size = ty.array[1]
-        return _type_size(idl, element_type) * array_size
+        return _type_size_in(types, element_type) * array_size
     raise ValueError(f"type_size not implemented for {ty}")
 
 
@@ -66,42 +109,28 @@ def _type_size(idl: Idl, ty: IdlType) -> int:
     Returns:
         The size of the object in bytes.
     """
-    sizes: Dict[IdlTypeSimple, int] = {
-        IdlTypeSimple.Bool: 1,
-        IdlTypeSimple.U8: 1,
-        IdlTypeSimple.I8: 1,
-        IdlTypeSimple.Bytes: 1,
-        IdlTypeSimple.String: 1,
-        IdlTypeSimple.I16: 2,
-        IdlTypeSimple.U16: 2,
-        IdlTypeSimple.U32: 4,
-        IdlTypeSimple.I32: 4,
-        IdlTypeSimple.F32: 4,
-        IdlTypeSimple.U64: 8,
-        IdlTypeSimple.I64: 8,
-        IdlTypeSimple.F64: 8,
-        IdlTypeSimple.U128: 16,
-        IdlTypeSimple.I128: 16,
-        IdlTypeSimple.PublicKey: 32,
-    }
+    return _type_size_in(_TypeIndex(idl.types), ty)
+
+
+def _type_size_in(types: TypeDefs, ty: IdlType) -> int:
     if isinstance(ty, IdlTypeSimple):
-        return sizes[ty]
-    return _type_size_compound_type(idl, ty)
+        return _SIMPLE_TYPE_SIZES[ty]
+    return _type_size_compound_type(types, ty)
 
 
-def _variant_field_size(idl: Idl, field: Union[IdlField, IdlType]) -> int:
+def _variant_field_size(types: TypeDefs, field: Union[IdlField, IdlType]) -> int:
     if isinstance(field, IdlField):
-        return _type_size(idl, field.ty)
-    return _type_size(idl, field)
+        return _type_size_in(types, field.ty)
+    return _type_size_in(types, field)
 
 
-def _variant_size(idl: Idl, variant: IdlEnumVariant) -> int:
+def _variant_size(types: TypeDefs, variant: IdlEnumVariant) -> int:
     if variant.fields is None:
         return 0
     field_sizes = []
     field: Union[IdlField, IdlType]
     for field in variant.fields.fields:
-        field_sizes.append(_variant_field_size(idl, field))
+        field_sizes.append(_variant_field_size(types, field))
     return sum(field_sizes)
 
 
@@ -115,14 +144,108 @@ def _account_size(idl: Idl, idl_account: IdlTypeDefinition) -> int:
     Returns:
         Account size.
     """
-    idl_account_type = idl_account.ty
-    if isinstance(idl_account_type, IdlTypeDefinitionTyEnum):
+    return _typedef_size(_TypeIndex(idl.types), idl_account)
+
+
+def _typedef_size(types: TypeDefs, typedef: IdlTypeDefinition) -> int:
+    typedef_type = typedef.ty
+    if isinstance(typedef_type, IdlTypeDefinitionTyEnum):
         variant_sizes = (
-            _variant_size(idl, variant) for variant in idl_account_type.variants
+            _variant_size(types, variant) for variant in typedef_type.variants
         )
         return max(variant_sizes) + 1
-    if isinstance(idl_account_type, IdlTypeDefinitionTyAlias):
-        return _type_size(idl, idl_account_type.value)
-    if idl_account_type.fields is None:
+    if isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+        return _type_size_in(types, typedef_type.value)
+    if typedef_type.fields is None:
         return 0
-    return sum(_type_size(idl, f.ty) for f in idl_account_type.fields)
+    return sum(_type_size_in(types, f.ty) for f in typedef_type.fields)
+
+
+def _fixed_type_size(types: TypeDefs, ty: IdlType) -> Optional[int]:
+    """Return the exact size of the type in bytes.
+
+    Unlike `_type_size`, this does not guess the size of variable length types.
+
+    Args:
+        types: IDL type definitions.
+        ty: The type object from the IDL.
+
+    Returns:
+        The size of the object in bytes, or None if it depends on the data.
+    """
+    if isinstance(ty, IdlTypeSimple):
+        if ty in _VARIABLE_SIZE_SIMPLE_TYPES:
+            return None
+        return _SIMPLE_TYPE_SIZES[ty]
+    if isinstance(ty, IdlTypeArray):
+        element_size = _fixed_type_size(types, ty.array[0])
+        return None if element_size is None else element_size * ty.array[1]
+    if isinstance(ty, IdlTypeDefined):
+        typedef = _find_typedef(types, ty.defined)
+        if typedef is None:
+            raise ValueError(f"Type not found {ty}")
+        return _fixed_typedef_size(types, typedef)
+    return None
+
+
+def _fixed_field_sizes(
+    types: TypeDefs, fields: Sequence[Union[IdlField, IdlType]]
+) -> Optional[int]:
+    total = 0
+    for field in fields:
+        size = _fixed_type_size(
+            types, field.ty if isinstance(field, IdlField) else field
+        )
+        if size is None:
+            return None
+        total += size
+    return total
+
+
+def _fixed_typedef_size(types: TypeDefs, typedef: IdlTypeDefinition) -> Optional[int]:
+    typedef_type = typedef.ty
+    if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+        return _fixed_field_sizes(types, typedef_type.fields)
+    if isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+        return _fixed_type_size(types, typedef_type.value)
+    variant_sizes = {
+        0
+        if variant.fields is None
+        else _fixed_field_sizes(types, variant.fields.fields)
+        for variant in typedef_type.variants
+    }
+    if len(variant_sizes) != 1:
+        return None
+    variant_size = variant_sizes.pop()
+    return None if variant_size is None else 1 + variant_size
+
+
+def _field_offsets(
+    types: TypeDefs, idl_account: IdlTypeDefinition
+) -> List[Optional[int]]:
+    """Calculate the offset of each field of a struct account.
+
+    The offsets are relative to the start of the account data, after the
+    discriminator. Fields that come after a variable-size field don't have a
+    fixed offset.
+
+    Args:
+        types: IDL type definitions.
+        idl_account: An item from `idl.accounts`.
+
+    Returns:
+        The offset of each field, or None where it depends on the data.
+    """
+    idl_account_type = idl_account.ty
+    if not isinstance(idl_account_type, IdlTypeDefinitionTyStruct):
+        raise ValueError(f"{idl_account.name} is not a struct")
+    if not isinstance(types, _TypeIndex):
+        types = _TypeIndex(types)
+    offsets: List[Optional[int]] = []
+    offset: Optional[int] = 0
+    for field in idl_account_type.fields:
+        offsets.append(offset)
+        if offset is not None:
+            size = _fixed_type_size(types, field.ty)
+            offset = None if size is None else offset + size
+    return offsets
@@ -0,0 +1,222 @@
+"""Compiled decoders for fixed-size IDL types.
+
+Types whose borsh layout has a fixed size (primitives, public keys, fixed-size
+arrays, fieldless enums and structs made only of those) are compiled once into a
+single `struct.Struct` plus a small post-processing plan, which is much cheaper
+than walking the equivalent `construct` tree on every parse.
+"""
+from math import isnan
+from struct import Struct
+from types import MappingProxyType
+from typing import Any, Callable, Mapping, NamedTuple, Optional, Sequence
+
+from anchorpy_core.idl import (
+    IdlType,
+    IdlTypeArray,
+    IdlTypeDefined,
+    IdlTypeDefinition,
+    IdlTypeDefinitionTyAlias,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
+    IdlTypeSimple,
+)
+from construct import FormatFieldError, ListContainer
+from solders.pubkey import Pubkey
+
+from anchorpy.coder.idl import (
+    _find_typedef,
+    _handle_enum_variants,
+    _idl_typedef_ty_struct_to_dataclass_type,
+)
+from anchorpy.idl import TypeDefs
+
+_FORMAT_CODES: Mapping[IdlTypeSimple, str] = MappingProxyType(
+    {
+        IdlTypeSimple.Bool: "?",
+        IdlTypeSimple.U8: "B",
+        IdlTypeSimple.I8: "b",
+        IdlTypeSimple.U16: "H",
+        IdlTypeSimple.I16: "h",
+        IdlTypeSimple.U32: "I",
+        IdlTypeSimple.I32: "i",
+        IdlTypeSimple.F32: "f",
+        IdlTypeSimple.U64: "Q",
+        IdlTypeSimple.I64: "q",
+        IdlTypeSimple.F64: "d",
+        IdlTypeSimple.U128: "16s",
+        IdlTypeSimple.I128: "16s",
+        IdlTypeSimple.PublicKey: "32s",
+    },
+)
+
+_Reader = Callable[[Sequence[Any], int], Any]
+
+
+def _read_plain(values: Sequence[Any], idx: int) -> Any:
+    return values[idx]
+
+
+def _read_u128(values: Sequence[Any], idx: int) -> int:
+    return int.from_bytes(values[idx], "little")
+
+
+def _read_i128(values: Sequence[Any], idx: int) -> int:
+    return int.from_bytes(values[idx], "little", signed=True)
+
+
+def _read_pubkey(values: Sequence[Any], idx: int) -> Pubkey:
+    return Pubkey(values[idx])
+
+
+def _read_float(values: Sequence[Any], idx: int) -> float:
+    val = values[idx]
+    if isnan(val):
+        raise FormatFieldError("Borsh does not support nan.")
+    return val
+
+
+_SIMPLE_READERS: Mapping[IdlTypeSimple, _Reader] = MappingProxyType(
+    {
+        IdlTypeSimple.U128: _read_u128,
+        IdlTypeSimple.I128: _read_i128,
+        IdlTypeSimple.PublicKey: _read_pubkey,
+        IdlTypeSimple.F32: _read_float,
+        IdlTypeSimple.F64: _read_float,
+    },
+)
+
+
+class _Plan(NamedTuple):
+    """How to decode one IDL type from a flat tuple of unpacked values.
+
+    Attributes:
+        fmt: The `struct` format string of the type, without byte order.
+        n_values: The number of values the type consumes from the unpacked tuple.
+        read: Builds the Python value starting at a given index of the tuple.
+    """
+
+    fmt: str
+    n_values: int
+    read: _Reader
+
+
+class _FixedLayout:
+    """A fixed-size IDL type compiled to a `struct.Struct`."""
+
+    def __init__(self, plan: _Plan) -> None:
+        """Init.
+
+        Args:
+            plan: The decoding plan of the type.
+        """
+        self.struct = Struct("<" + plan.fmt)
+        self.size = self.struct.size
+        self._unpack_from = self.struct.unpack_from
+        self._read = plan.read
+
+    def unpack(self, buffer: bytes, offset: int = 0) -> Any:
+        """Decode the type from a buffer.
+
+        Args:
+            buffer: The raw bytes.
+            offset: Where the type starts in the buffer.
+
+        Returns:
+            The same object the `construct` layout of the type would return.
+        """
+        return self._read(self._unpack_from(buffer, offset), 0)
+
+
+def _sequence_reader(children: Sequence[_Plan], build: Callable[..., Any]) -> _Reader:
+    if all(child.read is _read_plain for child in children):
+        count = len(children)
+
+        def read_plain_fields(values: Sequence[Any], idx: int) -> Any:
+            return build(*values[idx : idx + count])
+
+        return read_plain_fields
+
+    readers = [(child.read, child.n_values) for child in children]
+
+    def read_fields(values: Sequence[Any], idx: int) -> Any:
+        args = []
+        for reader, count in readers:
+            args.append(reader(values, idx))
+            idx += count
+        return build(*args)
+
+    return read_fields
+
+
+def _array_plan(element: _Plan, length: int) -> _Plan:
+    if element.n_values == 1 and not element.fmt.endswith("s"):
+        fmt = f"{length}{element.fmt}"
+    else:
+        fmt = element.fmt * length
+    reader = _sequence_reader([element] * length, lambda *items: ListContainer(items))
+    return _Plan(fmt, element.n_values * length, reader)
+
+
+def _type_plan(type_: IdlType, types: TypeDefs) -> Optional[_Plan]:
+    if isinstance(type_, IdlTypeSimple):
+        try:
+            fmt = _FORMAT_CODES[type_]
+        except KeyError:
+            return None
+        return _Plan(fmt, 1, _SIMPLE_READERS.get(type_, _read_plain))
+    if isinstance(type_, IdlTypeArray):
+        element = _type_plan(type_.array[0], types)
+        if element is None:
+            return None
+        return _array_plan(element, type_.array[1])
+    if isinstance(type_, IdlTypeDefined):
+        typedef = _find_typedef(types, type_.defined)
+        return None if typedef is None else _typedef_plan(typedef, types)
+    return None
+
+
+def _typedef_plan(typedef: IdlTypeDefinition, types: TypeDefs) -> Optional[_Plan]:
+    typedef_type = typedef.ty
+    if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+        children = []
+        for field in typedef_type.fields:
+            child = _type_plan(field.ty, types)
+            if child is None:
+                return None
+            children.append(child)
+        datacls = _idl_typedef_ty_struct_to_dataclass_type(
+            typedef_type, typedef.name, types
+        )
+        return _Plan(
+            "".join(child.fmt for child in children),
+            sum(child.n_values for child in children),
+            _sequence_reader(children, datacls),
+        )
+    if isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+        if any(variant.fields is not None for variant in typedef_type.variants):
+            return None
+        enum = _handle_enum_variants(typedef_type, types, typedef.name).enum
+
+        def read_variant(values: Sequence[Any], idx: int) -> Any:
+            return enum.getitem(values[idx])()
+
+        return _Plan("B", 1, read_variant)
+    if isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+        return _type_plan(typedef_type.value, types)
+    return None
+
+
+def _compile_typedef(
+    typedef: IdlTypeDefinition, types: TypeDefs
+) -> Optional[_FixedLayout]:
+    """Compile an IDL typedef to a `struct.Struct` decoder.
+
+    Args:
+        typedef: The IDL typedef object.
+        types: IDL type definitions.
+
+    Returns:
+        The compiled layout, or None if the type is not fixed-size.
+    """
+    plan = _typedef_plan(typedef, types)
+    return None if plan is None else _FixedLayout(plan)
@@ -0,0 +1,137 @@
+"""Batched creation of the dataclasses generated from IDLs.
+
+`dataclasses.make_dataclass` compiles the source of `__init__`, `__repr__` and
+`__eq__` separately for every class, which dominates the cost of building a
+`Coder`. Here the methods of many classes are generated as one module and
+compiled once, optionally through a `CodeCache`, and the classes are then made
+with `make_dataclass` around those methods, passing `init`, `repr` and `eq` as
+False so that it keeps them. The classes behave the same as those made by
+`make_dataclass` alone, but their `__dataclass_params__` records that the three
+methods weren't generated by `dataclasses`.
+"""
+from dataclasses import make_dataclass
+from keyword import iskeyword
+from reprlib import recursive_repr
+from types import FunctionType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from anchorpy.coder.cache import LayoutCache
+from anchorpy.coder.code_cache import CodeCache
+
+_FieldNames = Tuple[str, ...]
+_Methods = Tuple[FunctionType, FunctionType, FunctionType]
+
+# Compiled methods by field names. Classes with the same field names share code.
+_METHODS = LayoutCache(maxsize=4096)
+_ANY = "'typing.Any'"
+
+
+def _can_generate(names: Sequence[str]) -> bool:
+    return len(set(names)) == len(names) and all(
+        name.isidentifier() and not iskeyword(name) for name in names
+    )
+
+
+def _methods_source(names: _FieldNames, suffix: int) -> str:
+    self_name = "__dataclass_self__" if "self" in names else "self"
+    params = "".join(f", {name}: {_ANY}" for name in names)
+    body = (
+        "".join(f"\n    {self_name}.{name} = {name}" for name in names) or "\n    pass"
+    )
+    fields_repr = ", ".join(f"{name}={{self.{name}!r}}" for name in names)
+    self_fields = "".join(f"self.{name}," for name in names)
+    other_fields = "".join(f"other.{name}," for name in names)
+    return (
+        f"def _init_{suffix}({self_name}{params}) -> None:{body}\n\n\n"
+        f"def _repr_{suffix}(self):\n"
+        f'    return f"{{self.__class__.__qualname__}}({fields_repr})"\n\n\n'
+        f"def _eq_{suffix}(self, other):\n"
+        "    if other.__class__ is self.__class__:\n"
+        f"        return ({self_fields}) == ({other_fields})\n"
+        "    return NotImplemented\n"
+    )
+
+
+def _compile_methods(
+    field_names: Sequence[_FieldNames], code_cache: Optional[CodeCache] = None
+) -> Dict[_FieldNames, _Methods]:
+    source = "\n\n".join(
+        _methods_source(names, suffix) for suffix, names in enumerate(field_names)
+    )
+    filename = "<anchorpy dataclasses>"
+    code = (
+        compile(source, filename, "exec")
+        if code_cache is None
+        else code_cache.compile(source, filename)
+    )
+    namespace: Dict[str, Any] = {}
+    exec(code, namespace)
+    return {
+        names: (
+            namespace[f"_init_{suffix}"],
+            namespace[f"_repr_{suffix}"],
+            namespace[f"_eq_{suffix}"],
+        )
+        for suffix, names in enumerate(field_names)
+    }
+
+
+def _prepare_dataclasses(
+    field_names: Iterable[_FieldNames], code_cache: Optional[CodeCache] = None
+) -> None:
+    """Compile the methods of many dataclasses at once, ahead of `_make_datacls`.
+
+    Args:
+        field_names: The field names of each dataclass.
+        code_cache: Where to load the compiled code from, or save it to.
+    """
+    missing = list(
+        dict.fromkeys(
+            names
+            for names in field_names
+            if names not in _METHODS and _can_generate(names)
+        )
+    )
+    if not missing:
+        return
+    for names, methods in _compile_methods(missing, code_cache).items():
+        _METHODS.get(names, _returning(methods))
+
+
+def _returning(methods: _Methods) -> Callable[[], _Methods]:
+    return lambda: methods
+
+
+def _copy_function(func: FunctionType, qualname: str) -> FunctionType:
+    copy = FunctionType(func.__code__, func.__globals__, func.__name__)
+    copy.__annotations__ = dict(func.__annotations__)
+    copy.__qualname__ = qualname
+    return copy
+
+
+def _make_datacls(name: str, fields: List[str]) -> type:
+    """Make a dataclass with the given fields, all of type `typing.Any`.
+
+    Args:
+        name: The class name.
+        fields: The field names.
+
+    Returns:
+        A class that behaves like `make_dataclass(name, fields)`.
+    """
+    names = tuple(fields)
+    if not _can_generate(names):
+        # let make_dataclass raise its usual error
+        return make_dataclass(name, fields)
+    init, repr_, eq = _METHODS.get(names, lambda: _compile_methods([names])[names])
+    signature = ", ".join(f"{field}: {_ANY}" for field in names)
+    namespace = {
+        "__init__": _copy_function(init, f"{name}.__init__"),
+        "__repr__": recursive_repr()(_copy_function(repr_, f"{name}.__repr__")),
+        "__eq__": _copy_function(eq, f"{name}.__eq__"),
+        "__hash__": None,
+        "__doc__": f"{name}({signature})",
+    }
+    return make_dataclass(
+        name, fields, namespace=namespace, init=False, repr=False, eq=False
+    )
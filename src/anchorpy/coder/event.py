@@ -1,4 +1,6 @@
 """This module deals with (de)serializing Anchor events."""
+import binascii
+from base64 import b64decode, b64encode
 from hashlib import sha256
 from typing import Any, Dict, Optional, Tuple
 
@@ -12,9 +14,15 @@ from anchorpy_core.idl import (
 from construct import Adapter, Bytes, Construct, Sequence, Switch
 from pyheck import snake
 
-from anchorpy.coder.idl import _typedef_layout
+from anchorpy.coder.common import _parse_from
+from anchorpy.coder.idl import _typedef_layout, _TypeIndex
+from anchorpy.idl import TypeDefs
 from anchorpy.program.common import Event
 
+# Base64 packs 6 bits per character, so the first 10 characters of an encoded
+# event only depend on its 8 byte discriminator. The 11th also holds data bits.
+_B64_PREFIX_LEN = 10
+
 
 def _event_discriminator(name: str) -> bytes:
     """Get 8-byte discriminator from event name.
@@ -28,7 +36,19 @@ def _event_discriminator(name: str) -> bytes:
     return sha256(f"event:{name}".encode()).digest()[:8]
 
 
-def _event_layout(event: IdlEvent, idl: Idl) -> Construct:
+def _b64_prefix(discriminator: bytes) -> str:
+    """Get the start of the base64 encoding of every event with this discriminator.
+
+    Args:
+        discriminator: The event discriminator.
+
+    Returns:
+        The first `_B64_PREFIX_LEN` base64 characters.
+    """
+    return b64encode(discriminator).decode()[:_B64_PREFIX_LEN]
+
+
+def _event_layout(event: IdlEvent, types: TypeDefs) -> Construct:
     event_type_def = IdlTypeDefinition(
         name=event.name,
         docs=None,
@@ -38,23 +58,28 @@ def _event_layout(event: IdlEvent, idl: Idl) -> Construct:
             ],
         ),
     )
-    return _typedef_layout(event_type_def, idl.types, event.name)
+    return _typedef_layout(event_type_def, types, event.name)
 
 
 class EventCoder(Adapter):
     """Encodes and decodes Anchor events."""
 
-    def __init__(self, idl: Idl):
+    def __init__(self, idl: Idl, types: Optional[_TypeIndex] = None):
         """Initialize the EventCoder.
 
         Args:
             idl: The parsed Idl object.
+            types: The indexed IDL types, shared with the other coders.
+                Built from the IDL if omitted.
         """
         self.idl = idl
         idl_events = idl.events
         layouts: Dict[str, Construct]
         if idl_events:
-            layouts = {event.name: _event_layout(event, idl) for event in idl_events}
+            event_types = _TypeIndex(idl.types) if types is None else types
+            layouts = {
+                event.name: _event_layout(event, event_types) for event in idl_events
+            }
         else:
             layouts = {}
         self.layouts = layouts
@@ -67,12 +92,57 @@ class EventCoder(Adapter):
             disc: self.layouts[event_name]
             for disc, event_name in self.discriminators.items()
         }
+        self.b64_prefixes: Dict[str, str] = {
+            _b64_prefix(disc): event_name
+            for disc, event_name in self.discriminators.items()
+        }
         subcon = Sequence(
             "discriminator" / Bytes(8),  # not base64-encoded here
             Switch(lambda this: this.discriminator, self.discriminator_to_layout),
         )
         super().__init__(subcon)  # type: ignore
 
+    def decode(self, data: bytes) -> Optional[Event]:
+        """Decode an event.
+
+        Same as `parse`, but looks up the event layout directly instead of going
+        through the `Sequence` and `Switch` around them.
+
+        Args:
+            data: The event data, including the discriminator.
+
+        Returns:
+            The decoded event, or None if the discriminator doesn't match any
+            event in the IDL.
+        """
+        disc = bytes(data[:8])
+        try:
+            event_name = self.discriminators[disc]
+        except KeyError:
+            return None
+        layout = self.discriminator_to_layout[disc]
+        return Event(data=_parse_from(layout, data, 8), name=event_name)
+
+    def decode_b64(self, data: str) -> Optional[Event]:
+        """Decode a base64-encoded event, as found in program logs.
+
+        Data that doesn't start like the encoding of any event in the IDL, such
+        as the text of most `msg!` logs, is rejected without being decoded.
+
+        Args:
+            data: The base64-encoded event data, including the discriminator.
+
+        Returns:
+            The decoded event, or None if the data isn't an event of the IDL.
+        """
+        if data[:_B64_PREFIX_LEN] not in self.b64_prefixes:
+            return None
+        try:
+            decoded = b64decode(data)
+        except binascii.Error:
+            return None
+        return self.decode(decoded)
+
     def _decode(self, obj: Tuple[bytes, Any], context, path) -> Optional[Event]:
         disc = obj[0]
         try:
@@ -1,11 +1,27 @@
 """IDL coding."""
 from dataclasses import fields as dc_fields
-from dataclasses import make_dataclass
 from keyword import kwlist
 from types import MappingProxyType
-from typing import Mapping, Type, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Hashable,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from anchorpy_core.idl import (
+    Idl,
+    IdlEventField,
     IdlField,
     IdlType,
     IdlTypeArray,
@@ -44,6 +60,9 @@ from construct import Construct
 from pyheck import snake
 
 from anchorpy.borsh_extension import BorshPubkey, _DataclassStruct
+from anchorpy.coder.cache import DEFAULT_LAYOUT_CACHE, LayoutCache
+from anchorpy.coder.code_cache import CodeCache
+from anchorpy.coder.datacls import _make_datacls, _prepare_dataclasses
 from anchorpy.idl import TypeDefs
 
 FIELD_TYPE_MAP: Mapping[IdlTypeSimple, Construct] = MappingProxyType(
@@ -68,7 +87,196 @@ FIELD_TYPE_MAP: Mapping[IdlTypeSimple, Construct] = MappingProxyType(
 )
 
 
-_enums_cache: dict[tuple[str, str], Enum] = {}
+_T = TypeVar("_T")
+
+
+class _TypeIndex(Sequence[IdlTypeDefinition]):
+    """The typedefs of an IDL, indexed by name.
+
+    Can be passed anywhere `TypeDefs` are expected. Lookups by name are O(1) and
+    the layouts of the user-defined types are built once and memoized on the index,
+    so coders sharing an index share the layouts too.
+
+    Generated enums and dataclasses come from `cache`, and are pinned on the index
+    so that they don't change for its lifetime even if `cache` evicts them.
+    Generated code is compiled through `code_cache` if there is one.
+    """
+
+    def __init__(
+        self,
+        types: TypeDefs,
+        cache: Optional[LayoutCache] = None,
+        code_cache: Optional[CodeCache] = None,
+    ) -> None:
+        """Init.
+
+        Args:
+            types: IDL type definitions.
+            cache: The cache of generated types. Defaults to `DEFAULT_LAYOUT_CACHE`.
+            code_cache: The on-disk cache of generated code, if any.
+        """
+        self._types = tuple(types)
+        self._by_name: Dict[str, List[IdlTypeDefinition]] = {}
+        for typedef in self._types:
+            self._by_name.setdefault(typedef.name, []).append(typedef)
+        self.layouts: Dict[str, Construct] = {}
+        # the structural keys of the defined types, see `_type_key`
+        self.keys: Dict[str, Hashable] = {}
+        self.recursive: Set[str] = set()
+        self.cache = DEFAULT_LAYOUT_CACHE if cache is None else cache
+        self.code_cache = code_cache
+        self._pinned: Dict[Hashable, Any] = {}
+
+    def __getitem__(self, idx: Any) -> Any:
+        """Get a typedef by position, like a list."""
+        return self._types[idx]
+
+    def __len__(self) -> int:
+        """Return the number of typedefs."""
+        return len(self._types)
+
+    def find(self, name: str) -> Optional[IdlTypeDefinition]:
+        """Find a typedef by name.
+
+        Args:
+            name: The type name.
+
+        Returns:
+            The typedef, or None if there isn't exactly one typedef with this name.
+        """
+        found = self._by_name.get(name, [])
+        return found[0] if len(found) == 1 else None
+
+    def cached(self, key: Hashable, make: Callable[[], _T]) -> _T:
+        """Get a generated type from the cache, or make it.
+
+        Args:
+            key: The structural key of the type.
+            make: Called to make the type if it isn't cached.
+
+        Returns:
+            The generated type.
+        """
+        try:
+            return self._pinned[key]
+        except KeyError:
+            value = self.cache.get(key, make)
+            self._pinned[key] = value
+            return value
+
+
+def _find_typedef(types: TypeDefs, name: str) -> Optional[IdlTypeDefinition]:
+    """Find a typedef by name, in O(1) if `types` is a `_TypeIndex`.
+
+    Args:
+        types: IDL type definitions.
+        name: The type name.
+
+    Returns:
+        The typedef, or None if there isn't exactly one typedef with this name.
+    """
+    if isinstance(types, _TypeIndex):
+        return types.find(name)
+    filtered = [t for t in types if t.name == name]
+    return filtered[0] if len(filtered) == 1 else None
+
+
+def _cached(types: Optional[TypeDefs], key: Hashable, make: Callable[[], _T]) -> _T:
+    if isinstance(types, _TypeIndex):
+        return types.cached(key, make)
+    return DEFAULT_LAYOUT_CACHE.get(key, make)
+
+
+def _type_key(
+    type_: IdlType, types: Optional[TypeDefs], seen: FrozenSet[str] = frozenset()
+) -> Hashable:
+    """Return a hashable key that is equal for structurally equal types.
+
+    Only simple types compare by value, so compound types are turned into
+    tuples. Defined types are keyed by the structure of their typedef in
+    `types`, so that IDLs defining the same type name differently don't share
+    layouts.
+
+    Args:
+        type_: The type object from the IDL.
+        types: IDL type definitions.
+        seen: The defined types being keyed, to stop at recursive types.
+
+    Returns:
+        The key.
+    """
+    if isinstance(type_, IdlTypeSimple):
+        return type_
+    if isinstance(type_, IdlTypeDefined):
+        return _defined_key(type_.defined, types, seen)
+    if isinstance(type_, IdlTypeVec):
+        return ("vec", _type_key(type_.vec, types, seen))
+    if isinstance(type_, IdlTypeOption):
+        return ("option", _type_key(type_.option, types, seen))
+    if isinstance(type_, IdlTypeArray):
+        return ("array", _type_key(type_.array[0], types, seen), type_.array[1])
+    return str(type_)
+
+
+def _defined_key(
+    name: str, types: Optional[TypeDefs], seen: FrozenSet[str]
+) -> Hashable:
+    index = types if isinstance(types, _TypeIndex) else None
+    if index is not None and name in index.keys:
+        return index.keys[name]
+    if name in seen:
+        # a recursive type: the keys of the types being keyed depend on where
+        # the recursion was entered, so they aren't memoized
+        if index is not None:
+            index.recursive.update(seen)
+        return ("defined", name)
+    typedef = None if types is None else _find_typedef(types, name)
+    if typedef is None:
+        return ("defined", name)
+    seen = seen | {name}
+    typedef_type = typedef.ty
+    if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+        structure: Hashable = ("struct", _fields_key(typedef_type.fields, types, seen))
+    elif isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+        structure = _variants_key(typedef_type, types, seen)
+    elif isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+        structure = ("alias", _type_key(typedef_type.value, types, seen))
+    else:
+        structure = str(typedef_type)
+    key = ("defined", name, structure)
+    if index is not None and name not in index.recursive:
+        index.keys[name] = key
+    return key
+
+
+def _fields_key(
+    fields: Sequence[Union[IdlField, IdlType]],
+    types: Optional[TypeDefs],
+    seen: FrozenSet[str],
+) -> Hashable:
+    return tuple(
+        (field.name, _type_key(field.ty, types, seen))
+        if isinstance(field, IdlField)
+        else _type_key(field, types, seen)
+        for field in fields
+    )
+
+
+def _variants_key(
+    idl_enum: IdlTypeDefinitionTyEnum, types: Optional[TypeDefs], seen: FrozenSet[str]
+) -> Hashable:
+    return (
+        "enum",
+        tuple(
+            (
+                variant.name,
+                None
+                if variant.fields is None
+                else _fields_key(variant.fields.fields, types, seen),
+            )
+            for variant in idl_enum.variants
+        ),
+    )
 
 
 def _handle_enum_variants(
@@ -76,13 +284,12 @@ def _handle_enum_variants(
     types: TypeDefs,
     name: str,
 ) -> Enum:
-    dict_key = (name, str(idl_enum))
-    try:
-        return _enums_cache[dict_key]
-    except KeyError:
-        result = _handle_enum_variants_no_cache(idl_enum, types, name)
-        _enums_cache[dict_key] = result
-        return result
+    # the layouts of the variant fields are built into the enum, so the key
+    # includes the structure of the types they use
+    key = ("enum", name, _variants_key(idl_enum, types, frozenset({name})))
+    return _cached(
+        types, key, lambda: _handle_enum_variants_no_cache(idl_enum, types, name)
+    )
 
 
 def _handle_enum_variants_no_cache(
@@ -108,6 +315,7 @@ def _handle_enum_variants_no_cache(
                 datacls = _idl_enum_fields_named_to_dataclass_type(
                     named_fields,
                     variant_name,
+                    types,
                 )
                 dclasses[variant_name] = datacls
                 renamed = variant_name / cstruct
@@ -145,7 +353,7 @@ def _typedef_layout_without_field_name(
     if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
         field_layouts = [_field_layout(field, types) for field in typedef_type.fields]
         cstruct = CStruct(*field_layouts)
-        datacls = _idl_typedef_ty_struct_to_dataclass_type(typedef_type, name)
+        datacls = _idl_typedef_ty_struct_to_dataclass_type(typedef_type, name, types)
         return _DataclassStruct(cstruct, datacls=datacls)
     elif isinstance(typedef_type, IdlTypeDefinitionTyEnum):
         return _handle_enum_variants(typedef_type, types, name)
@@ -157,7 +365,7 @@ def _typedef_layout_without_field_name(
 
 def _typedef_layout(
     typedef: IdlTypeDefinition,
-    types: list[IdlTypeDefinition],
+    types: TypeDefs,
     field_name: str,
 ) -> Construct:
     """Map an IDL typedef to a `Construct` object.
@@ -184,13 +392,9 @@ def _type_layout(type_: IdlType, types: TypeDefs) -> Construct:
     elif isinstance(type_, IdlTypeOption):
         return Option(_type_layout(type_.option, types))
     elif isinstance(type_, IdlTypeDefined):
-        defined = type_.defined
         if not types:
             raise ValueError("User defined types not provided")
-        filtered = [t for t in types if t.name == defined]
-        if len(filtered) != 1:
-            raise ValueError(f"Type not found {defined}")
-        return _typedef_layout_without_field_name(filtered[0], types)
+        return _defined_layout(type_.defined, types)
     elif isinstance(type_, IdlTypeArray):
         array_ty = type_.array[0]
         array_len = type_.array[1]
@@ -199,6 +403,33 @@ def _type_layout(type_: IdlType, types: TypeDefs) -> Construct:
     raise ValueError(f"Type {type_} not implemented yet")
 
 
+def _defined_layout(name: str, types: TypeDefs) -> Construct:
+    """Map a user-defined type to a `Construct` object.
+
+    The layout is memoized if `types` is a `_TypeIndex`.
+
+    Args:
+        name: The type name.
+        types: IDL type definitions.
+
+    Raises:
+        ValueError: If the type is not found.
+
+    Returns:
+        `Construct` object from `borsh-construct`.
+    """
+    memo = types.layouts if isinstance(types, _TypeIndex) else None
+    if memo is not None and name in memo:
+        return memo[name]
+    typedef = _find_typedef(types, name)
+    if typedef is None:
+        raise ValueError(f"Type not found {name}")
+    layout = _typedef_layout_without_field_name(typedef, types)
+    if memo is not None:
+        memo[name] = layout
+    return layout
+
+
 def _field_layout(field: IdlField, types: TypeDefs) -> Construct:
     """Map IDL spec to `borsh-construct` types.
 
@@ -218,24 +449,56 @@ def _field_layout(field: IdlField, types: TypeDefs) -> Construct:
     return field_name / _type_layout(field.ty, types)
 
 
-def _make_datacls(name: str, fields: list[str]) -> type:
-    return make_dataclass(name, fields)
+def _dataclass_field_names(
+    fields: Sequence[Union[IdlField, IdlEventField]]
+) -> List[str]:
+    names = []
+    for field in fields:
+        field_name = snake(field.name)
+        names.append(f"{field_name}_" if field_name in kwlist else field_name)
+    return names
+
+
+def _prepare_idl_dataclasses(idl: Idl, code_cache: Optional[CodeCache] = None) -> None:
+    """Compile the methods of all the dataclasses of an IDL at once.
 
+    Covers the structs, the enum variants with named fields and the events.
+    Dataclasses that aren't covered are still made on demand.
 
-_idl_typedef_ty_struct_to_dataclass_type_cache: dict[tuple[str, str], Type] = {}
+    Args:
+        idl: The parsed `Idl` instance.
+        code_cache: Where to load the compiled code from, or save it to.
+    """
+    field_names = []
+    for typedef in [*idl.accounts, *idl.types]:
+        typedef_type = typedef.ty
+        if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+            field_names.append(tuple(_dataclass_field_names(typedef_type.fields)))
+        elif isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+            for variant in typedef_type.variants:
+                variant_fields: Sequence[Union[IdlField, IdlType]] = (
+                    [] if variant.fields is None else variant.fields.fields
+                )
+                if variant_fields and isinstance(variant_fields[0], IdlField):
+                    named_fields = cast(List[IdlField], variant_fields)
+                    field_names.append(tuple(_dataclass_field_names(named_fields)))
+    for event in idl.events or []:
+        field_names.append(tuple(_dataclass_field_names(event.fields)))
+    _prepare_dataclasses(field_names, code_cache)
 
 
 def _idl_typedef_ty_struct_to_dataclass_type(
     typedef_type: IdlTypeDefinitionTyStruct,
     name: str,
+    types: Optional[TypeDefs] = None,
 ) -> Type:
-    dict_key = (name, str(typedef_type))
-    try:
-        return _idl_typedef_ty_struct_to_dataclass_type_cache[dict_key]
-    except KeyError:
-        result = _idl_typedef_ty_struct_to_dataclass_type_no_cache(typedef_type, name)
-        _idl_typedef_ty_struct_to_dataclass_type_cache[dict_key] = result
-        return result
+    # The dataclass only depends on the field names.
+    key = ("struct", name, tuple(field.name for field in typedef_type.fields))
+    return _cached(
+        types,
+        key,
+        lambda: _idl_typedef_ty_struct_to_dataclass_type_no_cache(typedef_type, name),
+    )
 
 
 def _idl_typedef_ty_struct_to_dataclass_type_no_cache(
@@ -251,30 +514,20 @@ def _idl_typedef_ty_struct_to_dataclass_type_no_cache(
     Returns:
         Dataclass definition.
     """
-    dataclass_fields = []
-    for field in typedef_type.fields:
-        field_name = snake(field.name)
-        field_name_to_use = f"{field_name}_" if field_name in kwlist else field_name
-        dataclass_fields.append(
-            field_name_to_use,
-        )
-    return _make_datacls(name, dataclass_fields)
-
-
-_idl_enum_fields_named_to_dataclass_type_cache: dict[tuple[str, str], Type] = {}
+    return _make_datacls(name, _dataclass_field_names(typedef_type.fields))
 
 
 def _idl_enum_fields_named_to_dataclass_type(
     fields: list[IdlField],
     name: str,
+    types: Optional[TypeDefs] = None,
 ) -> Type:
-    dict_key = (name, str(fields))
-    try:
-        return _idl_enum_fields_named_to_dataclass_type_cache[dict_key]
-    except KeyError:
-        result = _idl_enum_fields_named_to_dataclass_type_no_cache(fields, name)
-        _idl_enum_fields_named_to_dataclass_type_cache[dict_key] = result
-        return result
+    key = ("variant", name, tuple(field.name for field in fields))
+    return _cached(
+        types,
+        key,
+        lambda: _idl_enum_fields_named_to_dataclass_type_no_cache(fields, name),
+    )
 
 
 def _idl_enum_fields_named_to_dataclass_type_no_cache(
@@ -290,14 +543,7 @@ def _idl_enum_fields_named_to_dataclass_type_no_cache(
     Returns:
         Dataclass type definition.
     """
-    dataclass_fields = []
-    for field in fields:
-        field_name = snake(field.name)
-        field_name_to_use = f"{field_name}_" if field_name in kwlist else field_name
-        dataclass_fields.append(
-            field_name_to_use,
-        )
-    return _make_datacls(name, dataclass_fields)
+    return _make_datacls(name, _dataclass_field_names(fields))
 
 
 def _idl_typedef_to_python_type(
@@ -321,6 +567,7 @@ def _idl_typedef_to_python_type(
         return _idl_typedef_ty_struct_to_dataclass_type(
             typedef_type,
             typedef.name,
+            types,
         )
     elif isinstance(typedef_type, IdlTypeDefinitionTyEnum):
         return _handle_enum_variants(typedef_type, types, typedef.name).enum
@@ -6,8 +6,8 @@ from borsh_construct import CStruct
 from construct import Adapter, Bytes, Construct, Container, Sequence, Switch
 from pyheck import snake
 
-from anchorpy.coder.common import _sighash
-from anchorpy.coder.idl import _field_layout
+from anchorpy.coder.common import _parse_from, _sighash
+from anchorpy.coder.idl import _field_layout, _TypeIndex
 from anchorpy.idl import TypeDefs
 from anchorpy.program.common import NamedInstruction
 
@@ -67,6 +67,26 @@ class InstructionCoder(Adapter):
         """
         return self.build(NamedInstruction(name=ix_name, data=ix))
 
+    def decode(self, data: bytes) -> NamedInstruction:
+        """Decode a program instruction.
+
+        Same as `parse`, but looks up the instruction layout directly instead of
+        going through the `Sequence` and `Switch` around them.
+
+        Args:
+            data: The instruction data.
+
+        Returns:
+            The decoded instruction.
+        """
+        sighash = bytes(data[:8])
+        layout = self.sighash_layouts.get(sighash)
+        if layout is None:
+            return self.parse(data)
+        return NamedInstruction(
+            data=_parse_from(layout, data, 8), name=self.sighash_to_name[sighash]
+        )
+
     def _decode(self, obj: Tuple[bytes, Any], context, path) -> NamedInstruction:
         return NamedInstruction(data=obj[1], name=self.sighash_to_name[obj[0]])
 
@@ -88,11 +108,10 @@ class _SupportsAdd(Protocol):
 
 def _parse_ix_layout(idl: Idl) -> Dict[str, Construct]:
     ix_layout: Dict[str, Construct] = {}
+    typedefs = cast(_SupportsAdd, idl.accounts) + cast(_SupportsAdd, idl.types)
+    types = _TypeIndex(cast(TypeDefs, typedefs))
     for ix in idl.instructions:
-        typedefs = cast(_SupportsAdd, idl.accounts) + cast(_SupportsAdd, idl.types)
-        field_layouts = [
-            _field_layout(arg, cast(TypeDefs, typedefs)) for arg in ix.args
-        ]
+        field_layouts = [_field_layout(arg, types) for arg in ix.args]
         ix_name = snake(ix.name)
         ix_layout[ix_name] = ix_name / CStruct(*field_layouts)
     return ix_layout
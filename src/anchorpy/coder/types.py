@@ -1,29 +1,49 @@
 """The TypesCoder class is for encoding and decoding user-defined types."""
 
-from typing import Any, Dict
+from contextlib import suppress
+from typing import Any, Dict, Optional
 
 from anchorpy_core.idl import Idl
 from construct import Construct, Container
 
-from anchorpy.coder.idl import _typedef_layout_without_field_name
+from anchorpy.coder.codegen import _DECODE_ERRORS, _IdlDecoders
+from anchorpy.coder.idl import _defined_layout, _TypeIndex
 
 
 class TypesCoder:
     """Encodes and decodes user-defined types in Anchor programs."""
 
-    def __init__(self, idl: Idl) -> None:
+    def __init__(
+        self,
+        idl: Idl,
+        compiled: bool = False,
+        decoders: Optional[_IdlDecoders] = None,
+        types: Optional[_TypeIndex] = None,
+    ) -> None:
         """Initialize the TypesCoder.
 
         Args:
             idl: The parsed IDL object.
+            compiled: Whether to decode types with generated decoders
+                instead of the `construct` layouts.
+            decoders: The generated decoders to use if `compiled` is True.
+                Generated from the IDL if omitted.
+            types: The indexed IDL types, shared with the other coders.
+                Built from the IDL if omitted.
         """
         self.idl = idl
+        self._types = _TypeIndex(idl.types) if types is None else types
         self.types_layouts: Dict[str, Construct] = {}
+        self._decoders: Optional[_IdlDecoders] = None
+        if compiled:
+            self._decoders = (
+                _IdlDecoders(idl, self._types) if decoders is None else decoders
+            )
 
         self.filtered_types = []
-        if idl.types:
+        if self._types:
             self.filtered_types = [
-                ty for ty in idl.types if not getattr(ty, "generics", None)
+                ty for ty in self._types if not getattr(ty, "generics", None)
             ]
 
     def _get_layout(self, name: str) -> Construct:
@@ -41,11 +61,11 @@ class TypesCoder:
         if name in self.types_layouts:
             return self.types_layouts[name]
 
-        type_defs = [t for t in self.filtered_types if t.name == name]
-        if not type_defs:
+        typedef = self._types.find(name)
+        if typedef is None or getattr(typedef, "generics", None):
             raise ValueError(f"Unknown type: {name}")
 
-        layout = _typedef_layout_without_field_name(type_defs[0], self.idl.types)
+        layout = _defined_layout(name, self._types)
         self.types_layouts[name] = layout
         return layout
 
@@ -79,4 +99,10 @@ class TypesCoder:
             ValueError: If the type is not found.
         """
         layout = self._get_layout(name)
+        if self._decoders is not None:
+            decoder = self._decoders.type(name)
+            if decoder is not None:
+                # on malformed data, let construct raise its usual error
+                with suppress(*_DECODE_ERRORS):
+                    return decoder(buffer, 0)[0]
         return layout.parse(buffer)
@@ -0,0 +1,107 @@
+"""This module provides `AccountView`, a lazy view of account data."""
+from dataclasses import fields as dataclass_fields
+from typing import Any, Dict, List, Optional, cast
+
+from anchorpy_core.idl import IdlTypeDefinition, IdlTypeDefinitionTyStruct
+
+from anchorpy.coder.codegen import _Decoder, _IdlDecoders
+from anchorpy.coder.common import _field_offsets
+from anchorpy.coder.idl import _idl_typedef_ty_struct_to_dataclass_type, _TypeIndex
+
+
+class _ViewLayout:
+    """Field names, offsets and decoders of a struct account."""
+
+    def __init__(
+        self, idl_account: IdlTypeDefinition, types: _TypeIndex, decoders: _IdlDecoders
+    ) -> None:
+        typedef_type = idl_account.ty
+        if not isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+            raise ValueError(f"{idl_account.name} is not a struct")
+        self.offsets = _field_offsets(types, idl_account)
+        self.datacls = _idl_typedef_ty_struct_to_dataclass_type(
+            typedef_type, idl_account.name, types
+        )
+        self.field_index = {
+            field.name: idx for idx, field in enumerate(dataclass_fields(self.datacls))
+        }
+        self.decoders: List[_Decoder] = []
+        for field in typedef_type.fields:
+            decoder = decoders.value(field.ty)
+            if decoder is None:
+                raise ValueError(
+                    f"Can't decode field {field.name} of {idl_account.name}"
+                )
+            self.decoders.append(decoder)
+
+
+class AccountView:
+    """A lazy, read-only view of account data.
+
+    Fields are read as attributes, like on the object returned by
+    `AccountsCoder.decode`, but each field is only decoded from the underlying
+    buffer on first access and then cached. Offsets of fields that follow a
+    variable-size field are resolved when first needed and cached too.
+    """
+
+    __slots__ = ("_layout", "_buffer", "_offsets", "_values")
+
+    def __init__(self, layout: _ViewLayout, buffer: memoryview) -> None:
+        """Init.
+
+        Args:
+            layout: The layout of the account.
+            buffer: The account data, without the discriminator.
+        """
+        self._layout = layout
+        self._buffer = buffer
+        self._offsets: List[Optional[int]] = list(layout.offsets)
+        self._values: Dict[int, Any] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        """Decode a field on first access."""
+        # private names are never fields, and `_layout` itself is missing while
+        # copy and pickle probe a view that wasn't initialised
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            idx = self._layout.field_index[name]
+        except KeyError:
+            raise AttributeError(name) from None
+        return self._field(idx)
+
+    def __dir__(self) -> List[str]:
+        """List the field names."""
+        return list(self._layout.field_index)
+
+    def __repr__(self) -> str:
+        """Show the account type without decoding anything."""
+        return f"AccountView({self._layout.datacls.__name__})"
+
+    def materialize(self) -> Any:
+        """Decode every field.
+
+        Returns:
+            The same object `AccountsCoder.decode` would return.
+        """
+        return self._layout.datacls(
+            *(self._field(idx) for idx in range(len(self._offsets)))
+        )
+
+    def _field(self, idx: int) -> Any:
+        if idx in self._values:
+            return self._values[idx]
+        value, end = self._layout.decoders[idx](self._buffer, self._offset(idx))
+        self._values[idx] = value
+        if idx + 1 < len(self._offsets) and self._offsets[idx + 1] is None:
+            self._offsets[idx + 1] = end
+        return value
+
+    def _offset(self, idx: int) -> int:
+        known = idx
+        while self._offsets[known] is None:
+            known -= 1
+        # decoding a field records where the next one starts
+        for previous in range(known, idx):
+            self._field(previous)
+        return cast(int, self._offsets[idx])
@@ -3,8 +3,9 @@ from __future__ import annotations
 
 import re
 from enum import IntEnum
-from typing import Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+from solana.rpc.core import RPCException
 from solders.pubkey import Pubkey
 from solders.rpc.errors import SendTransactionPreflightFailureMessage
 from solders.rpc.responses import RPCError
@@ -31,6 +32,39 @@ class ArgsError(Exception):
     """Raise when the incorrect number of args is passed to the RPC function."""
 
 
+class SubscriptionOverflowError(Exception):
+    """Raise when a subscription receives items faster than they are read."""
+
+
+class BackfillCheckpointError(Exception):
+    """Raise when a backfill checkpoint file can't be read."""
+
+
+class GetMultipleAccountsError(RPCException):
+    """Raise when some of the accounts requested could not be fetched."""
+
+    def __init__(
+        self,
+        accounts: List[Optional[Any]],
+        failed: List[Pubkey],
+        errors: List[Exception],
+    ) -> None:
+        """Init.
+
+        Args:
+            accounts: The result for every requested pubkey, with None for the
+                ones that failed.
+            failed: The pubkeys that could not be fetched.
+            errors: The last error of each failed request.
+        """
+        self.accounts = accounts
+        self.failed = failed
+        self.errors = errors
+        super().__init__(
+            f"Failed to get info about {len(failed)} accounts: {errors[0]!r}"
+        )
+
+
 class _LangErrorCode(IntEnum):
     """Enumerates Anchor error codes."""
 
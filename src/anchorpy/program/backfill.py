@@ -0,0 +1,400 @@
+"""This module provides a resumable backfill of a program's past events."""
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import (
+    AsyncIterator,
+    Deque,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import httpx
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Commitment
+from solders.rpc.config import RpcTransactionConfig
+from solders.rpc.requests import GetTransaction
+from solders.rpc.responses import GetTransactionResp, batch_from_json
+from solders.signature import Signature
+from solders.transaction_status import UiTransactionEncoding
+from toolz import partition_all
+
+from anchorpy.error import BackfillCheckpointError
+from anchorpy.program.common import Event
+from anchorpy.program.event import EventParser
+from anchorpy.utils.rpc import (
+    _COMMITMENT_TO_SOLDERS,
+    _MAX_BACKOFF,
+    _MIN_BACKOFF,
+    _backoff,
+    _is_retryable,
+)
+
+
+class _SignatureInfo(NamedTuple):
+    signature: Signature
+    slot: int
+    failed: bool
+
+
+class BackfillEvent(NamedTuple):
+    """An event found by `EventBackfill`.
+
+    Attributes:
+        event: The event.
+        signature: The signature of the transaction that emitted it.
+        slot: The slot of the transaction.
+    """
+
+    event: Event
+    signature: Signature
+    slot: int
+
+
+@dataclass(frozen=True)
+class BackfillCheckpoint:
+    """The newest transaction whose events `EventBackfill` has returned.
+
+    Attributes:
+        signature: The signature of the transaction.
+        slot: The slot of the transaction.
+    """
+
+    signature: Signature
+    slot: int
+
+
+class EventBackfill:
+    """An async iterator over the past events of a program, oldest first.
+
+    The signatures of the program's transactions are paged with
+    `getSignaturesForAddress` back to the checkpoint, keeping only every
+    `window_size`-th one, which splits the history into windows. Then, oldest
+    window first, the signatures of each window are paged again and its
+    transactions are fetched in batched `getTransaction` requests, with at most
+    `max_concurrency` requests in flight, and their logs are parsed in
+    `executor`. So at most one window of signatures is held in memory. Events are
+    returned in slot order, and in order within a slot. Failed transactions are
+    skipped without being fetched. Transactions the RPC node doesn't return,
+    e.g. because it pruned them or hasn't indexed them yet, are requested again
+    up to `max_retries` times, then skipped and listed in `skipped`. HTTP
+    requests that fail with a 429 or 5xx status, or a connection error, are
+    retried up to `max_retries` times too, waiting longer after each attempt or
+    as long as the `Retry-After` header says.
+
+    After the events of each batch have been read, the newest transaction of the
+    batch is saved as the checkpoint. The window boundaries are saved with it,
+    after each page of signatures. A backfill that stopped part way, e.g.
+    because the process crashed, starts after the checkpoint when run again
+    with the same `checkpoint_path`, without paging the windows already found
+    again, so the events of at most one batch are returned twice. Running it
+    again once it has finished returns the events emitted since.
+    """
+
+    def __init__(
+        self,
+        connection: AsyncClient,
+        parser: EventParser,
+        checkpoint_path: Optional[Union[str, Path]] = None,
+        until: Optional[Signature] = None,
+        batch_size: int = 50,
+        max_concurrency: int = 4,
+        page_size: int = 1000,
+        window_size: int = 10_000,
+        commitment: Optional[Commitment] = None,
+        executor: Optional[Executor] = None,
+        max_retries: int = 3,
+    ) -> None:
+        """Init.
+
+        Args:
+            connection: The `solana-py` client object.
+            parser: The parser of the program's events.
+            checkpoint_path: The file the checkpoint is loaded from and saved to.
+                The checkpoint is only kept in memory if omitted.
+            until: Only return the events of transactions newer than this one,
+                if there is no checkpoint yet.
+            batch_size: The number of `getTransaction` requests sent in each
+                HTTP request.
+            max_concurrency: The most HTTP requests in flight at once.
+            page_size: The number of signatures in each
+                `getSignaturesForAddress` request, at most 1000.
+            window_size: The number of transactions in each window.
+            commitment: Bank state to query. Must be confirmed or finalized.
+            executor: Where the transactions are parsed. Defaults to the event
+                loop's default executor. The parsed events hold the dataclasses
+                generated from the IDL, so they don't pickle and a process pool
+                can't be used.
+            max_retries: How many times to request a transaction again when
+                the RPC node doesn't return it, and to retry a failed HTTP
+                request.
+
+        Raises:
+            ValueError: If `batch_size`, `max_concurrency`, `page_size` or
+                `window_size` is less than 1.
+            BackfillCheckpointError: If the checkpoint file can't be read.
+        """
+        if min(batch_size, max_concurrency, page_size, window_size) < 1:
+            raise ValueError(
+                "batch_size, max_concurrency, page_size and window_size must be at "
+                "least 1"
+            )
+        self.connection = connection
+        self.parser = parser
+        self.checkpoint_path = (
+            None if checkpoint_path is None else Path(checkpoint_path)
+        )
+        self.until = until
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.page_size = page_size
+        self.window_size = window_size
+        self.commitment = commitment
+        self.executor = executor
+        self.max_retries = max_retries
+        self.skipped: List[Signature] = []
+        # the newest transaction of each window not read yet, oldest first
+        self._windows: List[_SignatureInfo] = []
+        # whether the windows go all the way back to the checkpoint
+        self._walked = False
+        self.checkpoint = self._load_checkpoint()
+        commitment_to_use = connection._commitment if commitment is None else commitment
+        self._tx_config = RpcTransactionConfig(
+            encoding=UiTransactionEncoding.Base64,
+            commitment=_COMMITMENT_TO_SOLDERS[commitment_to_use],
+            max_supported_transaction_version=0,
+        )
+
+    async def __aiter__(self) -> AsyncIterator[BackfillEvent]:
+        """Fetch the transactions after the checkpoint and yield their events."""
+        await self._find_windows()
+        after = self._until()
+        while self._windows:
+            end = self._windows[0]
+            window = await self._signatures(end.signature, after)
+            window.append(end)
+            async for newest, events in self._batches(window):
+                for event in events:
+                    yield event
+                if newest.signature == end.signature:
+                    self._windows.pop(0)
+                self._save_checkpoint(newest)
+            after = end.signature
+        # the next run looks for transactions newer than the checkpoint
+        self._walked = False
+
+    def _until(self) -> Optional[Signature]:
+        return self.until if self.checkpoint is None else self.checkpoint.signature
+
+    async def _find_windows(self) -> None:
+        if not self._walked:
+            # resume from the oldest window found before stopping, if any
+            before = self._windows[0].signature if self._windows else None
+            async for boundaries in self._walk(before, self._until()):
+                self._windows[:0] = boundaries
+                self._save_state()
+            self._walked = True
+            self._save_state()
+        if self._windows:
+            # the transactions since the windows were found
+            newer: List[_SignatureInfo] = []
+            async for boundaries in self._walk(None, self._windows[-1].signature):
+                newer[:0] = boundaries
+            if newer:
+                self._windows += newer
+                self._save_state()
+
+    async def _walk(
+        self, before: Optional[Signature], until: Optional[Signature]
+    ) -> AsyncIterator[List[_SignatureInfo]]:
+        """Page back from `before` to `until`, keeping every `window_size`-th one.
+
+        Yields the signatures kept from each page, oldest first.
+        """
+        position = 0
+        while True:
+            page = await self._signature_page(before, until)
+            boundaries = []
+            for info in page:
+                if position % self.window_size == 0:
+                    boundaries.append(info)
+                position += 1
+            boundaries.reverse()
+            yield boundaries
+            if len(page) < self.page_size:
+                return
+            before = page[-1].signature
+
+    async def _signatures(
+        self, before: Optional[Signature], until: Optional[Signature]
+    ) -> List[_SignatureInfo]:
+        """Page all the signatures between `before` and `until`, oldest first."""
+        newest_first: List[_SignatureInfo] = []
+        while True:
+            page = await self._signature_page(before, until)
+            newest_first.extend(page)
+            if len(page) < self.page_size:
+                break
+            before = page[-1].signature
+        newest_first.reverse()
+        return newest_first
+
+    async def _signature_page(
+        self, before: Optional[Signature], until: Optional[Signature]
+    ) -> List[_SignatureInfo]:
+        resp = await self.connection.get_signatures_for_address(
+            self.parser.program_id,
+            before=before,
+            until=until,
+            limit=self.page_size,
+            commitment=self.commitment,
+        )
+        return [
+            _SignatureInfo(info.signature, info.slot, info.err is not None)
+            for info in resp.value
+        ]
+
+    async def _batches(
+        self, signatures: List[_SignatureInfo]
+    ) -> AsyncIterator[Tuple[_SignatureInfo, List[BackfillEvent]]]:
+        loop = asyncio.get_running_loop()
+        pending: Deque[Tuple[_SignatureInfo, "asyncio.Task[List[BackfillEvent]]"]]
+        pending = deque()
+        try:
+            for batch in partition_all(self.batch_size, signatures):
+                task = loop.create_task(self._fetch(batch))
+                pending.append((batch[-1], task))
+                if len(pending) == self.max_concurrency:
+                    newest, task = pending.popleft()
+                    yield newest, await task
+            while pending:
+                newest, task = pending.popleft()
+                yield newest, await task
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def _fetch(self, batch: Sequence[_SignatureInfo]) -> List[BackfillEvent]:
+        signatures = [info.signature for info in batch if not info.failed]
+        if not signatures:
+            return []
+        found: Dict[Signature, List[BackfillEvent]] = {}
+        missing = signatures
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(
+                    min(_MIN_BACKOFF * 2 ** (attempt - 1), _MAX_BACKOFF)
+                )
+            parsed = await self._request(missing)
+            for idx, events in enumerate(parsed):
+                if events is not None:
+                    found[missing[idx]] = events
+            missing = [sig for idx, sig in enumerate(missing) if parsed[idx] is None]
+            if not missing:
+                break
+        self.skipped.extend(missing)
+        return [event for sig in signatures for event in found.get(sig, [])]
+
+    async def _request(
+        self, signatures: List[Signature]
+    ) -> List[Optional[List[BackfillEvent]]]:
+        reqs = tuple(
+            GetTransaction(signature, self._tx_config, id=idx)
+            for idx, signature in enumerate(signatures)
+        )
+        attempt = 0
+        while True:
+            try:
+                raw = await self.connection._provider.make_batch_request_unparsed(reqs)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(_backoff(e, attempt))
+                attempt += 1
+                continue
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self.executor, self._parse, raw, signatures
+            )
+
+    def _parse(
+        self, raw: str, signatures: List[Signature]
+    ) -> List[Optional[List[BackfillEvent]]]:
+        """Parse the events of each transaction, or None if it wasn't returned."""
+        resps = batch_from_json(raw, [GetTransactionResp for _ in signatures])
+        result: List[Optional[List[BackfillEvent]]] = []
+        for idx, resp in enumerate(resps):
+            if not isinstance(resp, GetTransactionResp) or resp.value is None:
+                result.append(None)
+                continue
+            tx = resp.value
+            meta = tx.transaction.meta
+            logs = (
+                [] if meta is None or meta.log_messages is None else meta.log_messages
+            )
+            result.append(
+                [
+                    BackfillEvent(event, signatures[idx], tx.slot)
+                    for event in self.parser.iter_events(logs)
+                ]
+            )
+        return result
+
+    def _load_checkpoint(self) -> Optional[BackfillCheckpoint]:
+        path = self.checkpoint_path
+        if path is None or not path.exists():
+            return None
+        try:
+            raw = json.loads(path.read_text())
+            self._windows = [
+                _SignatureInfo(Signature.from_string(sig), int(slot), bool(failed))
+                for sig, slot, failed in raw.get("windows", [])
+            ]
+            self._walked = bool(self._windows) and bool(raw.get("walked", False))
+            if raw["signature"] is None:
+                return None
+            return BackfillCheckpoint(
+                Signature.from_string(raw["signature"]), int(raw["slot"])
+            )
+        except (ValueError, KeyError, TypeError) as e:
+            raise BackfillCheckpointError(
+                f"Invalid backfill checkpoint {path}: {e!r}. Delete it to backfill "
+                "from the start, or restore it from a backup."
+            ) from e
+
+    def _save_checkpoint(self, newest: _SignatureInfo) -> None:
+        self.checkpoint = BackfillCheckpoint(newest.signature, newest.slot)
+        self._save_state()
+
+    def _save_state(self) -> None:
+        if self.checkpoint_path is None:
+            return
+        checkpoint = self.checkpoint
+        raw = json.dumps(
+            {
+                "signature": None if checkpoint is None else str(checkpoint.signature),
+                "slot": None if checkpoint is None else checkpoint.slot,
+                "windows": [
+                    [str(info.signature), info.slot, info.failed]
+                    for info in self._windows
+                ],
+                "walked": self._walked,
+            }
+        )
+        # write, flush to disk, then rename, so that neither a crash nor a power
+        # loss leaves a truncated checkpoint
+        tmp_path = self.checkpoint_path.with_name(f"{self.checkpoint_path.name}.tmp")
+        with tmp_path.open("w") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.checkpoint_path)
@@ -0,0 +1,226 @@
+"""This module provides `AccountCache`, a slot-aware cache of fetched accounts."""
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from threading import Lock
+from time import monotonic
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from solana.rpc.commitment import Commitment
+from solders.instruction import Instruction
+from solders.pubkey import Pubkey
+
+_T = TypeVar("_T")
+# The address, commitment and length of the data slice, if any.
+_Key = Tuple[Pubkey, Optional[Commitment], Optional[int]]
+
+
+class AccountCacheInfo(NamedTuple):
+    """Statistics of an `AccountCache`.
+
+    Attributes:
+        hits: Reads served from the cache.
+        misses: Reads that went to the RPC node.
+        decode_hits: Decoded accounts reused because the data didn't change.
+        decode_misses: Accounts decoded.
+        maxsize: The maximum number of entries.
+        currsize: The current number of entries.
+    """
+
+    hits: int
+    misses: int
+    decode_hits: int
+    decode_misses: int
+    maxsize: Optional[int]
+    currsize: int
+
+
+@dataclass
+class _Entry:
+    data: bytes
+    slot: int
+    fetched_at: float
+    decoded: Dict[Hashable, Any] = field(default_factory=dict)
+
+
+class AccountCache:
+    """A cache of the accounts fetched by `AccountClient.fetch` and `fetch_multiple`.
+
+    Pass one to `Program` to serve repeated reads of the same accounts from
+    memory. An account is read again from the RPC node once its entry is older
+    than `max_age_ms` milliseconds, or more than `max_age_slots` slots behind
+    the newest slot the cache has seen in a response.
+
+    The cache also keeps the decoded accounts. When a read returns the same
+    data as the cached entry, whether the entry was fresh or not, the decoded
+    account is reused instead of decoding the data again. Decoded accounts are
+    shared between reads, so don't modify them.
+
+    Call `invalidate` after sending a transaction that writes to cached
+    accounts.
+    """
+
+    def __init__(
+        self,
+        max_age_ms: Optional[float] = 400,
+        max_age_slots: Optional[int] = None,
+        maxsize: Optional[int] = 10_000,
+    ) -> None:
+        """Init.
+
+        Args:
+            max_age_ms: How long an entry is served for, in milliseconds. None
+                means no limit.
+            max_age_slots: How many slots behind the newest slot seen an entry is
+                still served. None means no limit.
+            maxsize: The maximum number of entries. The least recently used
+                entries are evicted first. None means unbounded.
+        """
+        if maxsize is not None and maxsize < 0:
+            raise ValueError(f"maxsize must not be negative, got {maxsize}")
+        self.max_age_ms = max_age_ms
+        self.max_age_slots = max_age_slots
+        self.maxsize = maxsize
+        self.latest_slot = 0
+        self._entries: OrderedDict[_Key, _Entry] = OrderedDict()
+        # responses from before these slots are not cached
+        self._min_slots: Dict[Pubkey, int] = {}
+        self._lock = Lock()
+        self._hits = 0
+        self._misses = 0
+        self._decode_hits = 0
+        self._decode_misses = 0
+
+    def __len__(self) -> int:
+        """Return the number of entries."""
+        return len(self._entries)
+
+    def invalidate(
+        self, addresses: Iterable[Pubkey], slot: Optional[int] = None
+    ) -> None:
+        """Drop the entries of these accounts, so the next reads fetch them.
+
+        Args:
+            addresses: The accounts to drop.
+            slot: If given, don't cache the data of these accounts from
+                responses older than this slot, such as reads that were in
+                flight when a transaction landed at this slot.
+        """
+        addresses = set(addresses)
+        with self._lock:
+            for key in [key for key in self._entries if key[0] in addresses]:
+                del self._entries[key]
+            if slot is not None:
+                for address in addresses:
+                    self._min_slots[address] = max(
+                        slot, self._min_slots.get(address, slot)
+                    )
+
+    def invalidate_instructions(
+        self, instructions: Iterable[Instruction], slot: Optional[int] = None
+    ) -> None:
+        """Drop the entries of the accounts that these instructions write to.
+
+        Args:
+            instructions: The instructions of a transaction that was sent.
+            slot: See `invalidate`.
+        """
+        self.invalidate(
+            (
+                meta.pubkey
+                for ix in instructions
+                for meta in ix.accounts
+                if meta.is_writable
+            ),
+            slot,
+        )
+
+    def cache_info(self) -> AccountCacheInfo:
+        """Report the cache statistics.
+
+        Returns:
+            Hits, misses, decode hits, decode misses, maximum size and current size.
+        """
+        with self._lock:
+            return AccountCacheInfo(
+                self._hits,
+                self._misses,
+                self._decode_hits,
+                self._decode_misses,
+                self.maxsize,
+                len(self._entries),
+            )
+
+    def cache_clear(self) -> None:
+        """Remove every entry and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self._min_slots.clear()
+            self.latest_slot = 0
+            self._hits = 0
+            self._misses = 0
+            self._decode_hits = 0
+            self._decode_misses = 0
+
+    def _get(self, key: _Key) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not self._is_fresh(entry):
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: _Key, data: bytes, slot: int) -> _Entry:
+        with self._lock:
+            self.latest_slot = max(self.latest_slot, slot)
+            old = self._entries.get(key)
+            entry = _Entry(data, slot, monotonic())
+            if old is not None and old.data == data:
+                entry.decoded = old.decoded
+            if slot < self._min_slots.get(key[0], 0):
+                return entry
+            if old is not None and old.slot > slot:
+                # a newer read landed first
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+            return entry
+
+    def _decode(
+        self, entry: _Entry, decoded_key: Hashable, decode: Callable[[bytes], _T]
+    ) -> _T:
+        with self._lock:
+            try:
+                value = entry.decoded[decoded_key]
+            except KeyError:
+                self._decode_misses += 1
+            else:
+                self._decode_hits += 1
+                return value
+        value = decode(entry.data)
+        with self._lock:
+            return entry.decoded.setdefault(decoded_key, value)
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        max_age_ms = self.max_age_ms
+        if (
+            max_age_ms is not None
+            and (monotonic() - entry.fetched_at) * 1000 > max_age_ms
+        ):
+            return False
+        max_age_slots = self.max_age_slots
+        return max_age_slots is None or self.latest_slot - entry.slot <= max_age_slots
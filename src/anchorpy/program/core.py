@@ -2,21 +2,31 @@
 from __future__ import annotations
 
 import zlib
-from typing import Any, Optional
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any, Collection, List, Optional, Tuple, Union
 
 from anchorpy_core.idl import Idl
 from pyheck import snake
+from solana.rpc.commitment import Commitment
 from solders.pubkey import Pubkey
+from solders.signature import Signature
 
 from anchorpy.coder.accounts import ACCOUNT_DISCRIMINATOR_SIZE
+from anchorpy.coder.cache import LayoutCache
+from anchorpy.coder.code_cache import CodeCache
 from anchorpy.coder.coder import Coder
 from anchorpy.error import IdlNotFoundError
 from anchorpy.idl import _decode_idl_account, _idl_address
+from anchorpy.program.backfill import EventBackfill
+from anchorpy.program.cache import AccountCache
 from anchorpy.program.common import AddressType, translate_address
+from anchorpy.program.event import EventParser
 from anchorpy.program.namespace.account import AccountClient, _build_account
 from anchorpy.program.namespace.instruction import (
     _InstructionFn,
 )
+from anchorpy.program.namespace.lazy import LazyNamespace
 from anchorpy.program.namespace.methods import (
     IdlFuncs,
     MethodsBuilder,
@@ -35,7 +45,13 @@ from anchorpy.program.namespace.transaction import (
     _TransactionFn,
 )
 from anchorpy.program.namespace.types import _build_types
+from anchorpy.program.subscription import (
+    EventSubscription,
+    OverflowPolicy,
+    _websocket_url,
+)
 from anchorpy.provider import Provider
+from anchorpy.utils.rpc import get_multiple_accounts
 
 
 def _parse_idl_errors(idl: Idl) -> dict[int, str]:
@@ -61,62 +77,72 @@ def _build_namespace(
     coder: Coder,
     program_id: Pubkey,
     provider: Provider,
+    account_cache: Optional[AccountCache] = None,
 ) -> tuple[
-    dict[str, _RpcFn],
-    dict[str, _InstructionFn],
-    dict[str, _TransactionFn],
-    dict[str, AccountClient],
-    dict[str, _SimulateFn],
-    dict[str, Any],
-    dict[str, MethodsBuilder],
+    LazyNamespace[_RpcFn],
+    LazyNamespace[_InstructionFn],
+    LazyNamespace[_TransactionFn],
+    LazyNamespace[AccountClient],
+    LazyNamespace[_SimulateFn],
+    LazyNamespace[Any],
+    LazyNamespace[MethodsBuilder],
 ]:
     """Generate all namespaces for a given program.
 
+    The entries of the namespaces are built on first access.
+
     Args:
         idl: The parsed IDL object.
         coder: The program's Coder object .
         program_id: The Program ID.
         provider: The program's provider.
+        account_cache: The cache of the accounts fetched by the account clients.
 
     Returns:
         The program namespaces.
     """
     idl_errors = _parse_idl_errors(idl)
-
-    rpc = {}
-    instruction = {}
-    transaction = {}
-    simulate = {}
-    methods = {}
-
-    for idl_ix in idl.instructions:
-
-        ix_item = _InstructionFn(idl_ix, coder.instruction.build, program_id)
-        tx_item = _build_transaction_fn(idl_ix, ix_item)
-        rpc_item = _build_rpc_item(idl_ix, tx_item, idl_errors, provider, program_id)
-        simulate_item = _build_simulate_item(
-            idl_ix,
-            tx_item,
+    idl_ixs = {snake(idl_ix.name): idl_ix for idl_ix in idl.instructions}
+
+    instruction: LazyNamespace[_InstructionFn] = LazyNamespace(
+        idl_ixs,
+        lambda name: _InstructionFn(idl_ixs[name], coder.instruction.build, program_id),
+    )
+    transaction: LazyNamespace[_TransactionFn] = LazyNamespace(
+        idl_ixs,
+        lambda name: _build_transaction_fn(idl_ixs[name], instruction[name]),
+    )
+    rpc: LazyNamespace[_RpcFn] = LazyNamespace(
+        idl_ixs,
+        lambda name: _build_rpc_item(
+            idl_ixs[name], transaction[name], idl_errors, provider, program_id
+        ),
+    )
+    simulate: LazyNamespace[_SimulateFn] = LazyNamespace(
+        idl_ixs,
+        lambda name: _build_simulate_item(
+            idl_ixs[name],
+            transaction[name],
             idl_errors,
             provider,
             coder,
             program_id,
             idl,
-        )
-        idl_funcs = IdlFuncs(
-            ix_fn=ix_item, tx_fn=tx_item, rpc_fn=rpc_item, simulate_fn=simulate_item
-        )
-        methods_item = _build_methods_item(idl_funcs)
-
-        name = snake(idl_ix.name)
-        instruction[name] = ix_item
-        transaction[name] = tx_item
-        rpc[name] = rpc_item
-        simulate[name] = simulate_item
-        methods[name] = methods_item
-
-    account = _build_account(idl, coder, program_id, provider) if idl.accounts else {}
-    types = _build_types(idl)
+        ),
+    )
+    methods: LazyNamespace[MethodsBuilder] = LazyNamespace(
+        idl_ixs,
+        lambda name: _build_methods_item(
+            IdlFuncs(
+                ix_fn=instruction[name],
+                tx_fn=transaction[name],
+                rpc_fn=rpc[name],
+                simulate_fn=simulate[name],
+            )
+        ),
+    )
+    account = _build_account(idl, coder, program_id, provider, account_cache)
+    types = _build_types(idl, coder._types)
     return rpc, instruction, transaction, account, simulate, types, methods
 
 
@@ -143,7 +169,14 @@ class Program(object):
     """
 
     def __init__(
-        self, idl: Idl, program_id: Pubkey, provider: Optional[Provider] = None
+        self,
+        idl: Idl,
+        program_id: Pubkey,
+        provider: Optional[Provider] = None,
+        compiled: bool = False,
+        layout_cache: Optional[LayoutCache] = None,
+        code_cache: Optional[CodeCache] = None,
+        account_cache: Optional[AccountCache] = None,
     ):
         """Initialize the Program object.
 
@@ -151,11 +184,24 @@ class Program(object):
             idl: The parsed IDL object.
             program_id: The program ID.
             provider: The Provider object for the Program. Defaults to Provider.local().
+            compiled: Whether the program's `Coder` should decode accounts and
+                types with decoders generated from the IDL.
+            layout_cache: The cache of the enums and dataclasses generated from
+                the IDL. Defaults to the cache shared by all programs. Pass a new
+                `LayoutCache()` to free them along with this program.
+            code_cache: An on-disk cache of the code generated from the IDL, to
+                start faster when the same IDL was loaded before, for example by
+                another worker.
+            account_cache: If given, `program.account[...].fetch` and
+                `fetch_multiple` serve repeated reads of the same accounts from
+                this cache. See `AccountCache`.
         """
         self.idl = idl
         self.program_id = program_id
         self.provider = provider if provider is not None else Provider.local()
-        self.coder = Coder(idl)
+        self.coder = Coder(
+            idl, compiled=compiled, layout_cache=layout_cache, code_cache=code_cache
+        )
 
         (
             rpc,
@@ -170,6 +216,7 @@ class Program(object):
             self.coder,
             program_id,
             self.provider,
+            account_cache,
         )
 
         self.rpc = rpc
@@ -193,6 +240,143 @@ class Program(object):
         """Use this when you are done with the client."""
         await self.provider.close()
 
+    async def fetch_any(
+        self,
+        addresses: List[Pubkey],
+        batch_size: int = 300,
+        commitment: Optional[Commitment] = None,
+    ) -> List[Optional[Tuple[str, Any]]]:
+        """Fetch and decode accounts of any of the program's account types.
+
+        All the accounts are fetched through batched `getMultipleAccounts`
+        requests, and each one is decoded with the layout its discriminator
+        points to.
+
+        Args:
+            addresses: The addresses of the accounts to fetch.
+            batch_size: The number of `getMultipleAccounts` objects to send
+                in each HTTP request.
+            commitment: Bank state to query.
+
+        Returns:
+            The account name and decoded account for each address, or None if
+            the account doesn't exist or isn't one of the program's accounts.
+        """
+        accounts = await get_multiple_accounts(
+            self.provider.connection,
+            addresses,
+            batch_size=batch_size,
+            commitment=commitment,
+        )
+        accounts_coder = self.coder.accounts
+        buffers = [
+            b"" if account is None else account.account.data for account in accounts
+        ]
+        result: List[Optional[Tuple[str, Any]]] = []
+        for idx, name in enumerate(accounts_coder.classify(buffers)):
+            if name is None:
+                result.append(None)
+            else:
+                result.append((name, accounts_coder.decode(buffers[idx])))
+        return result
+
+    def subscribe_events(
+        self,
+        names: Optional[Collection[str]] = None,
+        commitment: Optional[Commitment] = None,
+        max_queue_size: int = 1024,
+        overflow: OverflowPolicy = "drop_oldest",
+        reconnect: bool = True,
+        max_reconnect_delay: float = 30.0,
+        ws_url: Optional[str] = None,
+    ) -> EventSubscription:
+        """Subscribe to the program's events over a websocket.
+
+        Example:
+            ```python
+            async with program.subscribe_events(["MyEvent"]) as events:
+                async for event in events:
+                    print(event.data)
+            ```
+
+        Args:
+            names: Only return the events with these names. Other events are
+                skipped by their discriminator, without being decoded.
+            commitment: Bank state to subscribe to.
+            max_queue_size: How many events can wait to be read.
+            overflow: What to do when `max_queue_size` events are waiting:
+                `"drop_oldest"`, `"block"` or `"error"`. See `EventSubscription`.
+            reconnect: Whether to reconnect when the connection drops.
+            max_reconnect_delay: The longest time to wait between two attempts
+                to reconnect, in seconds.
+            ws_url: The websocket URL of the RPC node. Derived from the HTTP URL
+                of the provider's connection if omitted.
+
+        Returns:
+            An async iterator over the events.
+        """
+        parser = EventParser(self.program_id, self.coder, names)
+        if ws_url is None:
+            ws_url = _websocket_url(self.provider.connection._provider.endpoint_uri)
+        return EventSubscription(
+            parser,
+            ws_url,
+            commitment=commitment,
+            max_queue_size=max_queue_size,
+            overflow=overflow,
+            reconnect=reconnect,
+            max_reconnect_delay=max_reconnect_delay,
+        )
+
+    def backfill_events(
+        self,
+        names: Optional[Collection[str]] = None,
+        checkpoint_path: Optional[Union[str, Path]] = None,
+        until: Optional[Signature] = None,
+        batch_size: int = 50,
+        max_concurrency: int = 4,
+        commitment: Optional[Commitment] = None,
+        executor: Optional[Executor] = None,
+        max_retries: int = 3,
+    ) -> EventBackfill:
+        """Fetch the program's past events, oldest first.
+
+        Example:
+            ```python
+            backfill = program.backfill_events(checkpoint_path="events.json")
+            async for item in backfill:
+                print(item.slot, item.event.data)
+            ```
+
+        Args:
+            names: Only return the events with these names.
+            checkpoint_path: The file that records how far the backfill got, so
+                that it resumes from there when run again.
+            until: Only return the events of transactions newer than this one,
+                if there is no checkpoint yet.
+            batch_size: The number of transactions fetched in each HTTP request.
+            max_concurrency: The most HTTP requests in flight at once.
+            commitment: Bank state to query. Must be confirmed or finalized.
+            executor: Where the transactions are parsed. Defaults to the event
+                loop's default executor.
+            max_retries: How many times to request a transaction again when the
+                RPC node doesn't return it, before skipping it.
+
+        Returns:
+            An async iterator over the events. See `EventBackfill`.
+        """
+        return EventBackfill(
+            self.provider.connection,
+            EventParser(self.program_id, self.coder, names),
+            checkpoint_path=checkpoint_path,
+            until=until,
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+            commitment=commitment,
+            executor=executor,
+            max_retries=max_retries,
+        )
+
     @staticmethod
     async def fetch_raw_idl(
         address: AddressType,
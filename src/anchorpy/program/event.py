@@ -1,18 +1,36 @@
 """This module contains code for handling Anchor events."""
 import binascii
+import re
 from base64 import b64decode
-from dataclasses import dataclass
-from typing import Callable, List, Optional, cast
+from dataclasses import dataclass, field
+from typing import (
+    Callable,
+    Collection,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
 from solders.pubkey import Pubkey
 
 from anchorpy.coder.coder import Coder
+from anchorpy.coder.event import _B64_PREFIX_LEN, _b64_prefix, _event_discriminator
 from anchorpy.program.common import Event
 
 PROGRAM_LOG = "Program log: "
 PROGRAM_DATA = "Program data: "
 PROGRAM_LOG_START_INDEX = len(PROGRAM_LOG)
 PROGRAM_DATA_START_INDEX = len(PROGRAM_DATA)
+# The checks `handle_system_log` makes on the part of a log before its first colon.
+_SUCCESS_LOG = re.compile(r"Program [^ :]* success(?::|\Z)")
+_INVOKE_LOG = re.compile("[^:]*invoke")
+# The invoke and exit logs the runtime writes for every (cross-)program invocation.
+_PROGRAM_INVOKE_LOG = re.compile(r"Program ([^ :]+) invoke \[")
+_PROGRAM_EXIT_LOG = re.compile(r"Program [^ :]+ (?:success\Z|failed)")
 
 
 class _ExecutionContext:
@@ -56,10 +74,41 @@ class _ExecutionContext:
 
 @dataclass
 class EventParser:
-    """Parser to handle on_logs callbacks."""
+    """Parser to handle on_logs callbacks.
+
+    Log lines that don't start like the base64 encoding of an event are
+    skipped without being decoded. If `names` is given, only the events with
+    these names are decoded.
+    """
 
     program_id: Pubkey
     coder: Coder
+    names: Optional[Collection[str]] = None
+    _program_id_str: str = field(init=False, repr=False, compare=False)
+    _invoke_prefix: str = field(init=False, repr=False, compare=False)
+    _discriminators: Optional[FrozenSet[bytes]] = field(
+        init=False, repr=False, compare=False
+    )
+    _b64_prefixes: FrozenSet[str] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        """Precompute the strings the log handlers compare log lines with."""
+        self._program_id_str = str(self.program_id)
+        self._invoke_prefix = f"Program {self._program_id_str} invoke"
+        self._discriminators = None
+        self._b64_prefixes = frozenset(self.coder.events.b64_prefixes)
+        if self.names is not None:
+            unknown = [
+                name for name in self.names if name not in self.coder.events.layouts
+            ]
+            if unknown:
+                raise ValueError(f"Unknown events {unknown}")
+            self._discriminators = frozenset(
+                _event_discriminator(name) for name in self.names
+            )
+            self._b64_prefixes = frozenset(
+                _b64_prefix(disc) for disc in self._discriminators
+            )
 
     def parse_logs(self, logs: List[str], callback: Callable[[Event], None]) -> None:
         """Parse a list of logs using a provided callback.
@@ -68,13 +117,28 @@ class EventParser:
             logs: The logs to parse.
             callback: The function to handle the parsed log.
         """
+        for event in self.iter_events(logs):
+            callback(event)
+
+    def iter_events(self, logs: List[str]) -> Iterator[Event]:
+        """Parse a list of logs, yielding the events as they are found.
+
+        Args:
+            logs: The logs to parse.
+
+        Yields:
+            The events emitted by this program, in order.
+        """
         log_scanner = _LogScanner(logs)
-        execution = _ExecutionContext(cast(str, log_scanner.to_next()))
+        first_log = log_scanner.to_next()
+        if first_log is None:
+            return
+        execution = _ExecutionContext(first_log)
         log = log_scanner.to_next()
         while log is not None:
             event, new_program, did_pop = self.handle_log(execution, log)
             if event is not None:
-                callback(event)
+                yield event
             if new_program is not None:
                 execution.push(new_program)
             if did_pop:
@@ -99,7 +163,7 @@ class EventParser:
             execution stack).
         """
         # Executing program is this program.
-        if execution.stack and execution.program() == str(self.program_id):
+        if execution.stack and execution.program() == self._program_id_str:
             return self.handle_program_log(log)
         # Executing program is not this program.
         return (None, *self.handle_system_log(log))
@@ -114,19 +178,22 @@ class EventParser:
 
         """
         # This is a `msg!` log or a `sol_log_data!` log.
-        if log.startswith(PROGRAM_LOG) or log.startswith(PROGRAM_DATA):
-            log_str = (
-                log[PROGRAM_LOG_START_INDEX:]
-                if log.startswith(PROGRAM_LOG)
-                else log[PROGRAM_DATA_START_INDEX:]
-            )
-            try:
-                decoded = b64decode(log_str)
-            except binascii.Error:
-                return None, None, False
-            event = self.coder.events.parse(decoded)
-            return event, None, False
-        return (None, *self.handle_system_log(log))
+        if log.startswith(PROGRAM_LOG):
+            log_str = log[PROGRAM_LOG_START_INDEX:]
+        elif log.startswith(PROGRAM_DATA):
+            log_str = log[PROGRAM_DATA_START_INDEX:]
+        else:
+            return (None, *self.handle_system_log(log))
+        if log_str[:_B64_PREFIX_LEN] not in self._b64_prefixes:
+            return None, None, False
+        try:
+            decoded = b64decode(log_str)
+        except binascii.Error:
+            return None, None, False
+        discriminators = self._discriminators
+        if discriminators is not None and decoded[:8] not in discriminators:
+            return None, None, False
+        return self.coder.events.decode(decoded), None, False
 
     def handle_system_log(self, log: str) -> tuple[Optional[str], bool]:
         """Handle logs when the current program being executing is *not* this.
@@ -135,23 +202,83 @@ class EventParser:
             log: log string from the RPC node.
 
         """
-        log_start = log.split(":")[0]
-        splitted = log_start.split(" ")
-        invoke_msg = f"Program {str(self.program_id)} invoke"
-        if len(splitted) == 3 and splitted[0] == "Program" and splitted[2] == "success":
+        if _SUCCESS_LOG.match(log):
             return None, True
-        if log_start.startswith(invoke_msg):
-            return str(self.program_id), False
-        if "invoke" in log_start:
+        if log.startswith(self._invoke_prefix):
+            return self._program_id_str, False
+        if _INVOKE_LOG.match(log):
             return "cpi", False
         return None, False
 
 
+class MultiProgramEventParser:
+    """Parser for the events of many programs, walking the logs once.
+
+    Unlike `EventParser`, it tracks the program IDs of cross-program invocations,
+    so an event emitted by a program called through CPI is attributed to that
+    program.
+    """
+
+    def __init__(self, programs: Iterable[Tuple[Pubkey, Coder]]) -> None:
+        """Init.
+
+        Args:
+            programs: The ID and coder of each program to parse the events of.
+        """
+        self.programs: Dict[str, Tuple[Pubkey, Coder]] = {
+            str(program_id): (program_id, coder) for program_id, coder in programs
+        }
+
+    def parse_logs(
+        self, logs: List[str], callback: Callable[[Pubkey, Event], None]
+    ) -> None:
+        """Parse a list of logs using a provided callback.
+
+        Args:
+            logs: The logs to parse.
+            callback: The function to handle the program ID and event of each
+                parsed log.
+        """
+        for program_id, event in self.iter_events(logs):
+            callback(program_id, event)
+
+    def iter_events(self, logs: List[str]) -> Iterator[Tuple[Pubkey, Event]]:
+        """Parse a list of logs, yielding the events as they are found.
+
+        Args:
+            logs: The logs to parse.
+
+        Yields:
+            The ID of the program that emitted each event, and the event.
+        """
+        stack: List[Optional[Tuple[Pubkey, Coder]]] = []
+        programs = self.programs
+        for log in logs:
+            if log.startswith(PROGRAM_DATA):
+                payload = log[PROGRAM_DATA_START_INDEX:]
+            elif log.startswith(PROGRAM_LOG):
+                payload = log[PROGRAM_LOG_START_INDEX:]
+            else:
+                invoke = _PROGRAM_INVOKE_LOG.match(log)
+                if invoke is not None:
+                    stack.append(programs.get(invoke.group(1)))
+                elif stack and _PROGRAM_EXIT_LOG.match(log):
+                    stack.pop()
+                continue
+            program = stack[-1] if stack else None
+            if program is None:
+                continue
+            event = program[1].events.decode_b64(payload)
+            if event is not None:
+                yield program[0], event
+
+
 @dataclass
 class _LogScanner:
     """Object that iterates over logs."""
 
     logs: list[str]
+    idx: int = 0
 
     def to_next(self) -> Optional[str]:
         """Move to the next log item.
@@ -159,8 +286,8 @@ class _LogScanner:
         Returns:
             The next log line, or None if there's nothing to return.
         """
-        if self.logs:
-            log = self.logs[0]
-            self.logs = self.logs[1:]
+        if self.idx < len(self.logs):
+            log = self.logs[self.idx]
+            self.idx += 1
             return log
         return None
@@ -1,26 +1,52 @@
 """Provides the `AccountClient` class."""
+import warnings
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Union
+from functools import partial
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+    overload,
+)
 
 from anchorpy_core.idl import Idl, IdlTypeDefinition
 from based58 import b58encode
 from construct import Container
 from solana.rpc.commitment import Commitment
-from solana.rpc.types import MemcmpOpts
+from solana.rpc.types import DataSliceOpts, MemcmpOpts
+from solders.account_decoder import UiDataSliceConfig
 from solders.instruction import Instruction
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
 from solders.system_program import CreateAccountParams, create_account
 
-from anchorpy.coder.accounts import (
-    ACCOUNT_DISCRIMINATOR_SIZE,
-    _account_discriminator,
-)
+from anchorpy.coder.accounts import ACCOUNT_DISCRIMINATOR_SIZE
 from anchorpy.coder.coder import Coder
 from anchorpy.coder.common import _account_size
 from anchorpy.error import AccountDoesNotExistError, AccountInvalidDiscriminator
+from anchorpy.program.cache import AccountCache, _Entry
+from anchorpy.program.namespace.lazy import LazyNamespace
+from anchorpy.program.subscription import (
+    AccountSubscription,
+    OverflowPolicy,
+    _websocket_url,
+)
 from anchorpy.provider import Provider
-from anchorpy.utils.rpc import get_multiple_accounts
+from anchorpy.utils.rpc import _MultipleAccountsItem, get_multiple_accounts
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# The largest value the RPC node accepts in a memcmp filter.
+_MAX_MEMCMP_BYTES = 128
 
 
 def _build_account(
@@ -28,7 +54,8 @@ def _build_account(
     coder: Coder,
     program_id: Pubkey,
     provider: Provider,
-) -> Dict[str, "AccountClient"]:
+    cache: Optional[AccountCache] = None,
+) -> LazyNamespace["AccountClient"]:
     """Generate the `.account` namespace.
 
     Args:
@@ -36,15 +63,18 @@ def _build_account(
         coder: The program's coder object.
         program_id: The program ID.
         provider: The Provider instance.
+        cache: The cache of the fetched accounts, if any.
 
     Returns:
-        Mapping of account name to `AccountClient` instance.
+        Mapping of account name to `AccountClient` instance, built on first access.
     """
-    accounts_fns = {}
-    for idl_account in idl.accounts:
-        account_client = AccountClient(idl, idl_account, coder, program_id, provider)
-        accounts_fns[idl_account.name] = account_client
-    return accounts_fns
+    idl_accounts = {idl_account.name: idl_account for idl_account in idl.accounts}
+    return LazyNamespace(
+        idl_accounts,
+        lambda name: AccountClient(
+            idl, idl_accounts[name], coder, program_id, provider, cache
+        ),
+    )
 
 
 @dataclass
@@ -55,6 +85,17 @@ class ProgramAccount:
     account: Container
 
 
+@dataclass
+class ProgramAccountArray:
+    """Accounts owned by a program, decoded into a NumPy structured array.
+
+    See `AccountsCoder.decode_many_numpy` for the layout of the array.
+    """
+
+    public_keys: List[Pubkey]
+    accounts: "np.ndarray"
+
+
 class AccountClient(object):
     """Provides methods for fetching and creating accounts."""
 
@@ -65,6 +106,7 @@ class AccountClient(object):
         coder: Coder,
         program_id: Pubkey,
         provider: Provider,
+        cache: Optional[AccountCache] = None,
     ):
         """Init.
 
@@ -74,46 +116,86 @@ class AccountClient(object):
             coder: The program's Coder object.
             program_id: the program ID.
             provider: The Provider object for the Program.
+            cache: If given, `fetch` and `fetch_multiple` read accounts through
+                this cache.
         """
         self._idl_account = idl_account
         self._program_id = program_id
         self._provider = provider
         self._coder = coder
         self._size = ACCOUNT_DISCRIMINATOR_SIZE + _account_size(idl, idl_account)
+        self._discriminator = coder.accounts.acc_name_to_discriminator[idl_account.name]
+        self._discriminator_b58 = b58encode(self._discriminator).decode("ascii")
+        self._cache = cache
 
     async def fetch(
-        self, address: Pubkey, commitment: Optional[Commitment] = None
+        self,
+        address: Pubkey,
+        commitment: Optional[Commitment] = None,
+        fields: Optional[List[str]] = None,
     ) -> Container[Any]:
         """Return a deserialized account.
 
+        If the provider has an `account_loader`, the read is sent together with
+        the other fetches made at the same time.
+
         Args:
             address: The address of the account to fetch.
             commitment: Bank state to query.
+            fields: If given, only decode these fields. If they all are at a
+                fixed offset, only the bytes up to the last of them are fetched.
 
 
         Raises:
             AccountDoesNotExistError: If the account doesn't exist.
             AccountInvalidDiscriminator: If the discriminator doesn't match the IDL.
         """
+        length = self._fields_prefix_size(fields)
+        cache = self._cache
+        key = (address, commitment, length)
+        entry = None if cache is None else cache._get(key)
+        if entry is None:
+            data, slot = await self._fetch_data(address, commitment, length)
+            if cache is not None:
+                entry = cache._put(key, data, slot)
+        else:
+            data = entry.data
+        if not data.startswith(self._discriminator):
+            msg = f"Account {address} has an invalid discriminator"
+            raise AccountInvalidDiscriminator(msg)
+        if entry is None:
+            return self._decode(data, fields)
+        return self._decode_cached(entry, fields)
+
+    async def _fetch_data(
+        self, address: Pubkey, commitment: Optional[Commitment], length: Optional[int]
+    ) -> tuple[bytes, int]:
+        loader = self._provider.account_loader
+        if loader is not None:
+            item = await loader.load(
+                address,
+                commitment,
+                None if length is None else UiDataSliceConfig(0, length),
+            )
+            if item is None:
+                raise AccountDoesNotExistError(f"Account {address} does not exist")
+            return item.account.data, 0 if item.slot is None else item.slot
         account_info = await self._provider.connection.get_account_info(
             address,
-            encoding="base64",
+            encoding="base64+zstd",
             commitment=commitment,
+            data_slice=None if length is None else DataSliceOpts(0, length),
         )
         if not account_info.value:
             raise AccountDoesNotExistError(f"Account {address} does not exist")
-        data = account_info.value.data
-        discriminator = _account_discriminator(self._idl_account.name)
-        if discriminator != data[:ACCOUNT_DISCRIMINATOR_SIZE]:
-            msg = f"Account {address} has an invalid discriminator"
-            raise AccountInvalidDiscriminator(msg)
-        return self._coder.accounts.decode(data)
+        return account_info.value.data, account_info.context.slot
 
     async def fetch_multiple(
         self,
         addresses: List[Pubkey],
         batch_size: int = 300,
         commitment: Optional[Commitment] = None,
+        fields: Optional[List[str]] = None,
     ) -> list[Optional[Container[Any]]]:
         """Return multiple deserialized accounts.
 
@@ -124,23 +206,43 @@ class AccountClient(object):
             batch_size: The number of `getMultipleAccounts` objects to send
                 in each HTTP request.
             commitment: Bank state to query.
+            fields: If given, only decode these fields. If they all are at a
+                fixed offset, only the bytes up to the last of them are fetched.
         """
-        accounts = await get_multiple_accounts(
-            self._provider.connection,
-            addresses,
-            batch_size=batch_size,
-            commitment=commitment,
-        )
-        discriminator = _account_discriminator(self._idl_account.name)
-        result: list[Optional[Container[Any]]] = []
-        for account in accounts:
-            if account is None:
-                result.append(None)
-            elif discriminator == account.account.data[:8]:
-                result.append(self._coder.accounts.decode(account.account.data))
-            else:
-                result.append(None)
-        return result
+        length = self._fields_prefix_size(fields)
+        cache = self._cache
+        if cache is None:
+            accounts = await get_multiple_accounts(
+                self._provider.connection,
+                addresses,
+                batch_size=batch_size,
+                commitment=commitment,
+                data_slice=None if length is None else UiDataSliceConfig(0, length),
+            )
+            return self._decode_multiple(accounts, fields)
+        entries = [cache._get((address, commitment, length)) for address in addresses]
+        missing = [idx for idx, entry in enumerate(entries) if entry is None]
+        if missing:
+            accounts = await get_multiple_accounts(
+                self._provider.connection,
+                [addresses[idx] for idx in missing],
+                batch_size=batch_size,
+                commitment=commitment,
+                data_slice=None if length is None else UiDataSliceConfig(0, length),
+            )
+            for account_idx, account in enumerate(accounts):
+                if account is not None:
+                    idx = missing[account_idx]
+                    key = (addresses[idx], commitment, length)
+                    slot = 0 if account.slot is None else account.slot
+                    entries[idx] = cache._put(key, account.account.data, slot)
+        discriminator = self._discriminator
+        return [
+            self._decode_cached(entry, fields)
+            if entry is not None and entry.data.startswith(discriminator)
+            else None
+            for entry in entries
+        ]
 
     async def create_instruction(
         self,
@@ -172,11 +274,37 @@ class AccountClient(object):
             )
         )
 
+    @overload
     async def all(  # noqa: A003
         self,
         buffer: Optional[bytes] = None,
         filters: Optional[List[Union[int, MemcmpOpts]]] = None,
+        as_array: Literal[False] = False,
+        fields: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
     ) -> list[ProgramAccount]:
+        ...
+
+    @overload
+    async def all(  # noqa: A003
+        self,
+        buffer: Optional[bytes] = None,
+        filters: Optional[List[Union[int, MemcmpOpts]]] = None,
+        *,
+        as_array: Literal[True],
+        fields: None = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> ProgramAccountArray:
+        ...
+
+    async def all(  # noqa: A003
+        self,
+        buffer: Optional[bytes] = None,
+        filters: Optional[List[Union[int, MemcmpOpts]]] = None,
+        as_array: bool = False,
+        fields: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+    ) -> Union[list[ProgramAccount], ProgramAccountArray]:
         """Return all instances of this account type for the program.
 
         Args:
@@ -184,32 +312,240 @@ class AccountClient(object):
             filters: (optional) Options to compare a provided series of bytes with
                 program account data at a particular offset.
                 Note: an int entry is converted to a `dataSize` filter.
+            as_array: If True, decode all the accounts at once into a NumPy
+                structured array. Only works for fixed-size accounts and
+                requires the `numpy` extra.
+            fields: If given, only decode these fields. If they all are at a
+                fixed offset, only the bytes up to the last of them are fetched.
+                Can't be combined with `as_array`.
+            where: Only return the accounts whose fields equal these values,
+                e.g. `{"authority": pubkey}`. Fields at a fixed offset are
+                turned into `memcmp` filters, so that the RPC node does the
+                filtering. Other fields are compared after fetching the
+                accounts, with a warning.
         """
+        if as_array and fields is not None:
+            raise ValueError("fields can't be combined with as_array")
+        where_filters, client_side = self._where_filters({} if where is None else where)
+        length = self._fields_prefix_size(
+            None if fields is None else fields + list(client_side)
+        )
         all_accounts = []
-        discriminator = _account_discriminator(self._idl_account.name)
-        to_encode = discriminator if buffer is None else discriminator + buffer
-        bytes_arg = b58encode(to_encode).decode("ascii")
+        bytes_arg = (
+            self._discriminator_b58
+            if buffer is None
+            else b58encode(self._discriminator + buffer).decode("ascii")
+        )
         base_memcmp_opt = MemcmpOpts(
             offset=0,
             bytes=bytes_arg,
         )
-        filters_to_use = [base_memcmp_opt] + ([] if filters is None else filters)
+        filters_to_use: List[Union[int, MemcmpOpts]] = [base_memcmp_opt]
+        filters_to_use += where_filters
+        filters_to_use += [] if filters is None else filters
         resp = await self._provider.connection.get_program_accounts(
             self._program_id,
-            encoding="base64",
+            encoding="base64+zstd",
             commitment=self.provider.connection._commitment,
+            data_slice=None if length is None else DataSliceOpts(0, length),
             filters=filters_to_use,
         )
-        for r in resp.value:
+        matches = [r for r in resp.value if self._matches(r.account.data, client_side)]
+        if as_array:
+            return ProgramAccountArray(
+                public_keys=[r.pubkey for r in matches],
+                accounts=self._coder.accounts.decode_many_numpy(
+                    self._idl_account.name, [r.account.data for r in matches]
+                ),
+            )
+        for r in matches:
             account_data = r.account.data
             all_accounts.append(
                 ProgramAccount(
                     public_key=r.pubkey,
-                    account=self._coder.accounts.decode(account_data),
+                    account=self._decode(account_data, fields),
                 ),
             )
         return all_accounts
 
+    def subscribe(
+        self,
+        address: Union[Pubkey, Sequence[Pubkey]],
+        commitment: Optional[Commitment] = None,
+        max_queue_size: int = 1024,
+        overflow: OverflowPolicy = "drop_oldest",
+        reconnect: bool = True,
+        max_reconnect_delay: float = 30.0,
+        ws_url: Optional[str] = None,
+    ) -> AccountSubscription:
+        """Watch accounts over a websocket, yielding them decoded when they change.
+
+        All the accounts share one websocket. Updates that don't change the
+        account data are skipped without being decoded.
+
+        Example:
+            ```python
+            async with program.account["MyAccount"].subscribe(address) as updates:
+                async for update in updates:
+                    print(update.slot, update.account)
+            ```
+
+        Args:
+            address: The account or accounts to watch.
+            commitment: Bank state to subscribe to.
+            max_queue_size: How many updates can wait to be read.
+            overflow: What to do when `max_queue_size` updates are waiting:
+                `"drop_oldest"`, `"block"` or `"error"`. See `EventSubscription`.
+            reconnect: Whether to reconnect when the connection drops.
+            max_reconnect_delay: The longest time to wait between two attempts
+                to reconnect, in seconds.
+            ws_url: The websocket URL of the RPC node. Derived from the HTTP URL
+                of the provider's connection if omitted.
+
+        Returns:
+            An async iterator over the `AccountUpdate`s.
+        """
+        addresses = [address] if isinstance(address, Pubkey) else list(address)
+        return AccountSubscription(
+            self._coder.accounts,
+            self._idl_account.name,
+            self._ws_url(ws_url),
+            addresses=addresses,
+            commitment=commitment,
+            max_queue_size=max_queue_size,
+            overflow=overflow,
+            reconnect=reconnect,
+            max_reconnect_delay=max_reconnect_delay,
+        )
+
+    def subscribe_all(
+        self,
+        filters: Optional[List[Union[int, MemcmpOpts]]] = None,
+        commitment: Optional[Commitment] = None,
+        max_queue_size: int = 1024,
+        overflow: OverflowPolicy = "drop_oldest",
+        reconnect: bool = True,
+        max_reconnect_delay: float = 30.0,
+        ws_url: Optional[str] = None,
+        max_tracked_accounts: int = 100_000,
+    ) -> AccountSubscription:
+        """Watch all instances of this account type for the program.
+
+        Like `subscribe`, but with one `programSubscribe` to the accounts of the
+        program that start with this account type's discriminator.
+
+        Args:
+            filters: (optional) Options to compare a provided series of bytes with
+                program account data at a particular offset.
+                Note: an int entry is converted to a `dataSize` filter.
+            commitment: Bank state to subscribe to.
+            max_queue_size: How many updates can wait to be read.
+            overflow: What to do when `max_queue_size` updates are waiting.
+            reconnect: Whether to reconnect when the connection drops.
+            max_reconnect_delay: The longest time to wait between two attempts
+                to reconnect, in seconds.
+            ws_url: The websocket URL of the RPC node. Derived from the HTTP URL
+                of the provider's connection if omitted.
+            max_tracked_accounts: How many accounts to remember the last data
+                of, to skip updates that don't change it.
+
+        Returns:
+            An async iterator over the `AccountUpdate`s.
+        """
+        filters_to_use: List[Union[int, MemcmpOpts]] = [
+            MemcmpOpts(offset=0, bytes=self._discriminator_b58)
+        ]
+        filters_to_use += [] if filters is None else filters
+        return AccountSubscription(
+            self._coder.accounts,
+            self._idl_account.name,
+            self._ws_url(ws_url),
+            program_id=self._program_id,
+            filters=filters_to_use,
+            commitment=commitment,
+            max_queue_size=max_queue_size,
+            overflow=overflow,
+            reconnect=reconnect,
+            max_reconnect_delay=max_reconnect_delay,
+            max_tracked_accounts=max_tracked_accounts,
+        )
+
+    def _ws_url(self, ws_url: Optional[str]) -> str:
+        if ws_url is not None:
+            return ws_url
+        return _websocket_url(self._provider.connection._provider.endpoint_uri)
+
+    def _where_filters(
+        self, where: Dict[str, Any]
+    ) -> Tuple[List[MemcmpOpts], Dict[str, Any]]:
+        accounts_coder = self._coder.accounts
+        name = self._idl_account.name
+        memcmp_filters: List[MemcmpOpts] = []
+        client_side: Dict[str, Any] = {}
+        for field, value in where.items():
+            offset = accounts_coder.field_offset(name, field)
+            encoded = accounts_coder.encode_field(name, field, value)
+            if offset is None or len(encoded) > _MAX_MEMCMP_BYTES:
+                client_side[field] = value
+            else:
+                bytes_arg = b58encode(encoded).decode("ascii")
+                memcmp_filters.append(MemcmpOpts(offset=offset, bytes=bytes_arg))
+        if client_side:
+            warnings.warn(
+                f"Filtering {name} accounts on {list(client_side)} after fetching "
+                "them, because these fields don't have a fixed offset or are too "
+                "large for a memcmp filter",
+                stacklevel=3,
+            )
+        return memcmp_filters, client_side
+
+    def _matches(self, data: bytes, client_side: Dict[str, Any]) -> bool:
+        if not client_side:
+            return True
+        decoded = self._coder.accounts.decode_fields(data, list(client_side))
+        return all(decoded[field] == value for field, value in client_side.items())
+
+    def _fields_prefix_size(self, fields: Optional[List[str]]) -> Optional[int]:
+        if fields is None:
+            return None
+        return self._coder.accounts.fields_prefix_size(self._idl_account.name, fields)
+
+    def _decode_multiple(
+        self,
+        accounts: Sequence[Optional[_MultipleAccountsItem]],
+        fields: Optional[List[str]],
+    ) -> list[Optional[Container[Any]]]:
+        discriminator = self._discriminator
+        decode: Callable[[bytes], Container[Any]] = self._coder.accounts.decode
+        if fields is not None:
+            decode = partial(self._coder.accounts.decode_fields, fields=fields)
+        result: list[Optional[Container[Any]]] = []
+        append = result.append
+        for account in accounts:
+            if account is None:
+                append(None)
+                continue
+            # each access to `Account.data` copies the data
+            data = account.account.data
+            append(decode(data) if data.startswith(discriminator) else None)
+        return result
+
+    def _decode(self, data: bytes, fields: Optional[List[str]]) -> Container[Any]:
+        if fields is None:
+            return self._coder.accounts.decode(data)
+        return self._coder.accounts.decode_fields(data, fields)
+
+    def _decode_cached(
+        self, entry: _Entry, fields: Optional[List[str]]
+    ) -> Container[Any]:
+        decoded_key = (
+            self._idl_account.name,
+            None if fields is None else tuple(fields),
+        )
+        return cast(AccountCache, self._cache)._decode(
+            entry, decoded_key, partial(self._decode, fields=fields)
+        )
+
     @property
     def size(self) -> int:
         """Return the number of bytes in this account."""
@@ -229,3 +565,8 @@ class AccountClient(object):
     def coder(self) -> Coder:
         """Return the coder."""
         return self._coder
+
+    @property
+    def cache(self) -> Optional[AccountCache]:
+        """Return the cache `fetch` and `fetch_multiple` read accounts through."""
+        return self._cache
@@ -0,0 +1,62 @@
+"""This module provides the mapping type of the Program namespaces."""
+from typing import Callable, Dict, Iterable, Iterator, MutableMapping, TypeVar
+
+_V = TypeVar("_V")
+
+
+class LazyNamespace(MutableMapping[str, _V]):
+    """A dict-like namespace that builds its entries on first access.
+
+    The names are known up front, so iterating over the namespace, checking
+    membership or taking its length doesn't build anything. Built entries are
+    cached, and can be replaced or deleted like in a dict.
+    """
+
+    def __init__(self, names: Iterable[str], build: Callable[[str], _V]) -> None:
+        """Init.
+
+        Args:
+            names: The names in the namespace.
+            build: Builds the entry of a name.
+        """
+        self._names = dict.fromkeys(names)
+        self._build = build
+        self._built: Dict[str, _V] = {}
+
+    def __getitem__(self, name: str) -> _V:
+        """Get an entry, building it on first access."""
+        try:
+            return self._built[name]
+        except KeyError:
+            if name not in self._names:
+                raise
+        value = self._build(name)
+        self._built[name] = value
+        return value
+
+    def __setitem__(self, name: str, value: _V) -> None:
+        """Add or replace an entry."""
+        self._names[name] = None
+        self._built[name] = value
+
+    def __delitem__(self, name: str) -> None:
+        """Remove an entry."""
+        del self._names[name]
+        if name in self._built:
+            del self._built[name]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the names."""
+        return iter(self._names)
+
+    def __len__(self) -> int:
+        """Return the number of names."""
+        return len(self._names)
+
+    def __contains__(self, name: object) -> bool:
+        """Check for a name without building its entry."""
+        return name in self._names
+
+    def __repr__(self) -> str:
+        """Show the names without building the entries."""
+        return f"{type(self).__name__}({list(self._names)})"
@@ -1,27 +1,39 @@
 """This module contains code for handling user-defined types."""
-from typing import Any, Type
+from typing import Any, Optional, Type
 
-from anchorpy_core.idl import Idl
+from anchorpy_core.idl import (
+    Idl,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
+)
 
 from anchorpy.coder.idl import _idl_typedef_to_python_type
+from anchorpy.idl import TypeDefs
+from anchorpy.program.namespace.lazy import LazyNamespace
 
 
 def _build_types(
     idl: Idl,
-) -> dict[str, Type[Any]]:
+    types: Optional[TypeDefs] = None,
+) -> LazyNamespace[Type[Any]]:
     """Generate the `.type` namespace.
 
     Args:
         idl: A parsed `Idl` instance.
+        types: The IDL type definitions to use instead of `idl.types`, such as
+            the index shared by the program's `Coder`.
 
     Returns:
-        Mapping of type name to Python object.
+        Mapping of type name to Python object, built on first access.
     """
-    result = {}
-    for idl_type in idl.types:
-        try:
-            python_type = _idl_typedef_to_python_type(idl_type, idl.types)
-        except ValueError:
-            continue
-        result[idl_type.name] = python_type
-    return result
+    typedefs = idl.types if types is None else types
+    # Only structs and enums have a Python type.
+    python_typedefs = {
+        idl_type.name: idl_type
+        for idl_type in typedefs
+        if isinstance(idl_type.ty, (IdlTypeDefinitionTyStruct, IdlTypeDefinitionTyEnum))
+    }
+    return LazyNamespace(
+        python_typedefs,
+        lambda name: _idl_typedef_to_python_type(python_typedefs[name], typedefs),
+    )
@@ -0,0 +1,452 @@
+"""This module provides async iterators over websocket subscriptions."""
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import suppress
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Generic,
+    List,
+    Literal,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+    Union,
+)
+from urllib.parse import urlsplit, urlunsplit
+
+from construct import Container
+from solana.rpc.commitment import Commitment
+from solana.rpc.types import MemcmpOpts
+from solana.rpc.websocket_api import SolanaWsClientProtocol, connect
+from solders.account_decoder import UiAccountEncoding
+from solders.errors import SerdeJSONError
+from solders.pubkey import Pubkey
+from solders.rpc.config import RpcAccountInfoConfig, RpcTransactionLogsFilterMentions
+from solders.rpc.requests import AccountSubscribe, Body
+from solders.rpc.responses import (
+    AccountNotification,
+    LogsNotification,
+    Notification,
+    ProgramNotification,
+    RpcKeyedAccount,
+    RpcLogsResponse,
+    SubscriptionResult,
+)
+from websockets.exceptions import WebSocketException
+
+from anchorpy.coder.accounts import AccountsCoder, _account_discriminator
+from anchorpy.error import SubscriptionOverflowError
+from anchorpy.program.common import Event
+from anchorpy.program.event import EventParser
+from anchorpy.utils.rpc import _COMMITMENT_TO_SOLDERS
+
+OverflowPolicy = Literal["drop_oldest", "block", "error"]
+
+_T = TypeVar("_T")
+_MIN_RECONNECT_DELAY = 0.1
+_END = object()
+
+
+def _websocket_url(endpoint: str) -> str:
+    """Derive the websocket URL of an RPC node from its HTTP URL.
+
+    Like `@solana/web3.js`, an explicit port is incremented, since
+    `solana-test-validator` serves websockets on the port after the HTTP one.
+
+    Args:
+        endpoint: The HTTP URL.
+
+    Returns:
+        The websocket URL.
+    """
+    parts = urlsplit(endpoint)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    netloc = parts.netloc
+    if parts.port is not None:
+        host = parts.hostname or ""
+        host = f"[{host}]" if ":" in host else host
+        netloc = f"{host}:{parts.port + 1}"
+    return urlunsplit((scheme, netloc, parts.path, parts.query, parts.fragment))
+
+
+class _Subscription(ABC, Generic[_T], AsyncIterator[_T]):
+    """Bounded queue between a websocket listener task and an async iterator.
+
+    Subclasses send their subscription requests in `_subscribe` and turn
+    notifications into items in `_handle`. A notification that `_handle` fails
+    on is skipped and counted in `skipped`; only connection errors and
+    `SubscriptionOverflowError` end or restart the stream.
+    """
+
+    def __init__(
+        self,
+        ws_url: str,
+        max_queue_size: int,
+        overflow: OverflowPolicy,
+        reconnect: bool,
+        max_reconnect_delay: float,
+    ) -> None:
+        if max_queue_size < 1:
+            raise ValueError("max_queue_size must be at least 1")
+        if overflow not in {"drop_oldest", "block", "error"}:
+            raise ValueError(f"Unknown overflow policy {overflow!r}")
+        self.ws_url = ws_url
+        self.max_queue_size = max_queue_size
+        self.overflow = overflow
+        self.reconnect = reconnect
+        self.max_reconnect_delay = max_reconnect_delay
+        self.dropped = 0
+        self.skipped = 0
+        self.last_skipped_error: Optional[Exception] = None
+        # made on first use, so that they belong to the running event loop
+        self._queue_: "Optional[asyncio.Queue[object]]" = None
+        self._space_: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._error: Optional[Exception] = None
+        self._closed = False
+
+    def __aiter__(self) -> "_Subscription[_T]":
+        """Start listening, if not started yet."""
+        self._start()
+        return self
+
+    async def __anext__(self) -> _T:
+        """Wait for the next item."""
+        self._start()
+        item = await self._queue.get()
+        self._space.set()
+        if item is _END:
+            # keep the end marker for later calls
+            self._queue.put_nowait(_END)
+            if self._error is not None:
+                raise self._error
+            raise StopAsyncIteration
+        return item  # type: ignore
+
+    async def __aenter__(self) -> "_Subscription[_T]":
+        """Start listening, if not started yet."""
+        self._start()
+        return self
+
+    async def __aexit__(self, _exc_type, _exc, _tb) -> None:
+        """Stop listening."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Stop listening and close the websocket.
+
+        Items already received can still be iterated over.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        task = self._task
+        if task is not None and not task.done():
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        self._queue.put_nowait(_END)
+
+    @property
+    def _queue(self) -> "asyncio.Queue[object]":
+        if self._queue_ is None:
+            self._queue_ = asyncio.Queue()
+        return self._queue_
+
+    @property
+    def _space(self) -> asyncio.Event:
+        if self._space_ is None:
+            self._space_ = asyncio.Event()
+        return self._space_
+
+    def _start(self) -> None:
+        if self._task is None and not self._closed:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            await self._listen()
+        except Exception as e:  # noqa: BLE001
+            self._error = e
+            self._queue.put_nowait(_END)
+
+    async def _listen(self) -> None:
+        delay = _MIN_RECONNECT_DELAY
+        while True:
+            try:
+                async with connect(self.ws_url) as ws:
+                    await self._subscribe(ws)
+                    while True:
+                        try:
+                            msgs = await ws.recv()
+                        except SerdeJSONError as e:
+                            # a notification of an unexpected shape
+                            self._skip(e)
+                            continue
+                        for msg in msgs:
+                            if isinstance(msg, SubscriptionResult):
+                                delay = _MIN_RECONNECT_DELAY
+                            else:
+                                await self._handle_one(msg)
+            except (WebSocketException, OSError):
+                if not self.reconnect:
+                    raise
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _put(self, item: _T) -> None:
+        queue = self._queue
+        if queue.qsize() >= self.max_queue_size:
+            if self.overflow == "drop_oldest":
+                queue.get_nowait()
+                self.dropped += 1
+            elif self.overflow == "error":
+                raise SubscriptionOverflowError(
+                    f"More than {self.max_queue_size} items are waiting to be read"
+                )
+            else:
+                while queue.qsize() >= self.max_queue_size:
+                    self._space.clear()
+                    await self._space.wait()
+        queue.put_nowait(item)
+
+    async def _handle_one(self, msg: Notification) -> None:
+        try:
+            await self._handle(msg)
+        except SubscriptionOverflowError:
+            raise
+        except Exception as e:  # noqa: BLE001
+            # e.g. a log line that looks like an event but doesn't decode
+            self._skip(e)
+
+    def _skip(self, error: Exception) -> None:
+        self.skipped += 1
+        self.last_skipped_error = error
+
+    @abstractmethod
+    async def _subscribe(self, ws: SolanaWsClientProtocol) -> None:
+        ...
+
+    @abstractmethod
+    async def _handle(self, msg: Notification) -> None:
+        ...
+
+
+class EventSubscription(_Subscription[Event]):
+    """An async iterator over the events of a program, streamed over a websocket.
+
+    The events come from a `logsSubscribe` subscription to the transactions that
+    mention the program. Transactions that failed are skipped. Events are read
+    from the websocket in the background and wait in a bounded queue until they
+    are iterated over. When the queue is full, the `overflow` policy decides
+    what happens:
+
+    - `"drop_oldest"`: the oldest event is dropped, and counted in `dropped`.
+    - `"block"`: reading from the websocket pauses until there is room.
+    - `"error"`: the iterator raises `SubscriptionOverflowError` after the events
+      already queued.
+
+    If the connection drops, it is reopened and the subscription is sent again,
+    waiting longer after each failed attempt. Events emitted while disconnected
+    are missed. A transaction whose logs fail to decode is skipped, counted in
+    `skipped`, and its error kept in `last_skipped_error`.
+
+    Use it as an async context manager, or call `close` when done.
+    """
+
+    def __init__(
+        self,
+        parser: EventParser,
+        ws_url: str,
+        commitment: Optional[Commitment] = None,
+        max_queue_size: int = 1024,
+        overflow: OverflowPolicy = "drop_oldest",
+        reconnect: bool = True,
+        max_reconnect_delay: float = 30.0,
+    ) -> None:
+        """Init.
+
+        Args:
+            parser: The parser of the program's events.
+            ws_url: The websocket URL of the RPC node.
+            commitment: Bank state to subscribe to.
+            max_queue_size: How many events can wait to be read.
+            overflow: What to do when the queue is full.
+            reconnect: Whether to reconnect when the connection drops.
+            max_reconnect_delay: The longest time to wait between two attempts
+                to reconnect, in seconds.
+
+        Raises:
+            ValueError: If `max_queue_size` is less than 1 or `overflow` is not a
+                known policy.
+        """
+        super().__init__(
+            ws_url, max_queue_size, overflow, reconnect, max_reconnect_delay
+        )
+        self.parser = parser
+        self.commitment = commitment
+
+    async def _subscribe(self, ws: SolanaWsClientProtocol) -> None:
+        mentions = RpcTransactionLogsFilterMentions(self.parser.program_id)
+        await ws.logs_subscribe(mentions, commitment=self.commitment)
+
+    async def _handle(self, msg: Notification) -> None:
+        if not isinstance(msg, LogsNotification):
+            return
+        value: RpcLogsResponse = msg.result.value
+        if value.err is not None:
+            return
+        for event in self.parser.iter_events(value.logs):
+            await self._put(event)
+
+
+class AccountUpdate(NamedTuple):
+    """A new state of an account, from an `AccountSubscription`.
+
+    Attributes:
+        public_key: The address of the account.
+        account: The decoded account.
+        slot: The slot the account was updated at.
+    """
+
+    public_key: Pubkey
+    account: Container[Any]
+    slot: int
+
+
+class AccountSubscription(_Subscription[AccountUpdate]):
+    """An async iterator over the updates of accounts, streamed over a websocket.
+
+    Either watches the given `addresses`, with one `accountSubscribe` for each of
+    them sent over the same websocket, or, if `addresses` is None, every account
+    of `name` owned by `program_id`, with one `programSubscribe`.
+
+    An update is only decoded and returned when the account data changed since
+    the last update of that account, so notifications that only change the
+    lamports are skipped. Accounts of other types, or closed accounts, are
+    skipped too. Only a 16-byte digest of the last data of each account is
+    kept, for at most `max_tracked_accounts` accounts; an account whose digest
+    was evicted has its next update returned even if the data didn't change.
+
+    The queue, overflow policy and reconnection work as in `EventSubscription`.
+    Updates made while disconnected are missed, but the next update of each
+    account has its full data.
+
+    Use it as an async context manager, or call `close` when done.
+    """
+
+    def __init__(
+        self,
+        coder: AccountsCoder,
+        name: str,
+        ws_url: str,
+        addresses: Optional[Sequence[Pubkey]] = None,
+        program_id: Optional[Pubkey] = None,
+        filters: Optional[List[Union[int, MemcmpOpts]]] = None,
+        commitment: Optional[Commitment] = None,
+        max_queue_size: int = 1024,
+        overflow: OverflowPolicy = "drop_oldest",
+        reconnect: bool = True,
+        max_reconnect_delay: float = 30.0,
+        max_tracked_accounts: int = 100_000,
+    ) -> None:
+        """Init.
+
+        Args:
+            coder: The program's accounts coder.
+            name: The name of the account type in the IDL.
+            ws_url: The websocket URL of the RPC node.
+            addresses: The accounts to watch.
+            program_id: The program whose accounts to watch, if `addresses` is
+                None.
+            filters: The `programSubscribe` filters, if `addresses` is None.
+            commitment: Bank state to subscribe to.
+            max_queue_size: How many updates can wait to be read.
+            overflow: What to do when the queue is full.
+            reconnect: Whether to reconnect when the connection drops.
+            max_reconnect_delay: The longest time to wait between two attempts
+                to reconnect, in seconds.
+            max_tracked_accounts: How many accounts to remember the last data
+                of. The least recently updated account is forgotten first.
+
+        Raises:
+            ValueError: If neither `addresses` nor `program_id` is given, if
+                `max_queue_size` or `max_tracked_accounts` is less than 1 or if
+                `overflow` is not a known policy.
+        """
+        if addresses is None and program_id is None:
+            raise ValueError("Either addresses or program_id is required")
+        if max_tracked_accounts < 1:
+            raise ValueError(
+                f"max_tracked_accounts must be at least 1, got {max_tracked_accounts}"
+            )
+        super().__init__(
+            ws_url, max_queue_size, overflow, reconnect, max_reconnect_delay
+        )
+        self.coder = coder
+        self.name = name
+        self.addresses = None if addresses is None else list(addresses)
+        self.program_id = program_id
+        self.filters = filters
+        self.commitment = commitment
+        self._discriminator = _account_discriminator(name)
+        self._subscriptions: Dict[int, Body] = {}
+        self.max_tracked_accounts = max_tracked_accounts
+        # digests of the last data of each account, least recently updated first
+        self._last_data: OrderedDict[Pubkey, bytes] = OrderedDict()
+
+    async def _subscribe(self, ws: SolanaWsClientProtocol) -> None:
+        # filled in by the websocket as the subscriptions are confirmed
+        self._subscriptions = ws.subscriptions
+        if self.addresses is None:
+            await ws.program_subscribe(
+                self.program_id,  # type: ignore
+                commitment=self.commitment,
+                encoding="base64+zstd",
+                filters=self.filters,
+            )
+            return
+        commitment = self.commitment
+        config = RpcAccountInfoConfig(
+            encoding=UiAccountEncoding.Base64Zstd,
+            commitment=None
+            if commitment is None
+            else _COMMITMENT_TO_SOLDERS[commitment],
+        )
+        reqs: List[Body] = [
+            AccountSubscribe(address, config, ws.increment_counter_and_get_id())
+            for address in self.addresses
+        ]
+        await ws.send_data(reqs)
+
+    async def _handle(self, msg: Notification) -> None:
+        if isinstance(msg, AccountNotification):
+            req = self._subscriptions.get(msg.subscription)
+            if not isinstance(req, AccountSubscribe):
+                return
+            address, account = req.account, msg.result.value
+        elif isinstance(msg, ProgramNotification):
+            value = msg.result.value
+            if not isinstance(value, RpcKeyedAccount):
+                return
+            address, account = value.pubkey, value.account
+        else:
+            return
+        data = account.data
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        last = self._last_data.get(address)
+        self._last_data[address] = digest
+        self._last_data.move_to_end(address)
+        if last == digest:
+            return
+        if len(self._last_data) > self.max_tracked_accounts:
+            self._last_data.popitem(last=False)
+        if not data.startswith(self._discriminator):
+            return
+        decoded = self.coder.decode(data)
+        await self._put(AccountUpdate(address, decoded, msg.result.context.slot))
@@ -5,7 +5,7 @@ import json
 from os import environ, getenv
 from pathlib import Path
 from types import MappingProxyType
-from typing import List, Optional, Sequence, Union
+from typing import TYPE_CHECKING, List, Optional, Sequence, Union
 
 from solana.rpc import types
 from solana.rpc.async_api import AsyncClient
@@ -16,6 +16,9 @@ from solders.rpc.responses import SimulateTransactionResp
 from solders.signature import Signature
 from solders.transaction import Transaction, VersionedTransaction
 
+if TYPE_CHECKING:
+    from anchorpy.utils.rpc import AccountLoader
+
 DEFAULT_OPTIONS = types.TxOpts(skip_confirmation=False, preflight_commitment=Processed)
 COMMITMENT_RANKS = MappingProxyType({Processed: 0, Confirmed: 1, Finalized: 2})
 
@@ -28,6 +31,7 @@ class Provider:
         connection: AsyncClient,
         wallet: Wallet,
         opts: types.TxOpts = DEFAULT_OPTIONS,
+        account_loader: Optional[AccountLoader] = None,
     ) -> None:
         """Initialize the Provider.
 
@@ -35,10 +39,15 @@ class Provider:
             connection: The cluster connection where the program is deployed.
             wallet: The wallet used to pay for and sign all transactions.
             opts: Transaction confirmation options to use by default.
+            account_loader: If given, the concurrent `AccountClient.fetch` calls
+                of the programs using this provider are coalesced into
+                `getMultipleAccounts` requests. See
+                `anchorpy.utils.rpc.AccountLoader`.
         """
         self.connection = connection
         self.wallet = wallet
         self.opts = opts
+        self.account_loader = account_loader
 
     @classmethod
     def local(
@@ -1,4 +1,15 @@
 """Various utility functions."""
-from anchorpy.utils import rpc, token
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from anchorpy.utils import rpc, token
 
 __all__ = ["rpc", "token"]
+
+
+def __getattr__(name: str) -> Any:
+    """Import a submodule on first access, so spl isn't imported until needed."""
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return import_module(f"{__name__}.{name}")
@@ -0,0 +1,440 @@
+"""Export decoded program accounts to Apache Arrow and Parquet.
+
+Requires the `arrow` extra: `pip install anchorpy[arrow]`.
+
+IDL types map to Arrow types as follows:
+
+- Integers, floats and bools map to the Arrow type of the same width.
+  `u128` and `i128` map to `decimal256(39, 0)`.
+- Public keys map to base58 strings, `string` to `string` and `bytes` to
+  `binary`.
+- `Vec<T>` maps to a list, `[T; N]` to a fixed-size list and `Option<T>` to a
+  nullable `T`.
+- Structs map to structs. Fieldless enums map to the variant name. Other enums map
+  to a struct with a `kind` field holding the variant name and one nullable
+  field per variant with fields. Tuple variant fields are named `_0`, `_1` etc.
+"""
+import gc
+from contextlib import contextmanager, nullcontext
+from dataclasses import fields as dataclass_fields
+from itertools import islice
+from operator import attrgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from anchorpy_core.idl import (
+    EnumFieldsNamed,
+    Idl,
+    IdlField,
+    IdlType,
+    IdlTypeArray,
+    IdlTypeDefined,
+    IdlTypeDefinition,
+    IdlTypeDefinitionTyAlias,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
+    IdlTypeOption,
+    IdlTypeSimple,
+    IdlTypeVec,
+)
+
+from anchorpy.coder.accounts import AccountsCoder
+from anchorpy.coder.idl import (
+    _idl_enum_fields_named_to_dataclass_type,
+    _idl_typedef_ty_struct_to_dataclass_type,
+)
+from anchorpy.program.namespace.account import ProgramAccount
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:
+    raise ImportError(
+        "Arrow support requires the arrow extra: pip install anchorpy[arrow]"
+    ) from e
+
+_SIMPLE_ARROW_TYPES = {
+    IdlTypeSimple.Bool: pa.bool_(),
+    IdlTypeSimple.U8: pa.uint8(),
+    IdlTypeSimple.I8: pa.int8(),
+    IdlTypeSimple.U16: pa.uint16(),
+    IdlTypeSimple.I16: pa.int16(),
+    IdlTypeSimple.U32: pa.uint32(),
+    IdlTypeSimple.I32: pa.int32(),
+    IdlTypeSimple.F32: pa.float32(),
+    IdlTypeSimple.U64: pa.uint64(),
+    IdlTypeSimple.I64: pa.int64(),
+    IdlTypeSimple.F64: pa.float64(),
+    IdlTypeSimple.U128: pa.decimal256(39, 0),
+    IdlTypeSimple.I128: pa.decimal256(39, 0),
+    IdlTypeSimple.Bytes: pa.binary(),
+    IdlTypeSimple.String: pa.string(),
+    IdlTypeSimple.PublicKey: pa.string(),
+}
+
+DEFAULT_BATCH_SIZE = 65_536
+
+# Converts a decoded value to something `pa.array` accepts.
+# None means the decoded value can be used as is.
+_Converter = Optional[Callable[[Any], Any]]
+
+
+class _Column:
+    """The Arrow type of an IDL type and how to convert decoded values to it."""
+
+    def __init__(
+        self, arrow_type: pa.DataType, convert: _Converter, nullable: bool = False
+    ) -> None:
+        self.arrow_type = arrow_type
+        self.convert = convert
+        self.nullable = nullable
+
+    def field(self, name: str) -> pa.Field:
+        return pa.field(name, self.arrow_type, nullable=self.nullable)
+
+
+class _SchemaBuilder:
+    def __init__(self, types: List[IdlTypeDefinition]) -> None:
+        self.types = types
+        self._types_by_name = {typedef.name: typedef for typedef in types}
+        self._visiting: List[str] = []
+
+    def type_column(self, type_: IdlType) -> _Column:
+        if isinstance(type_, IdlTypeSimple):
+            if type_ == IdlTypeSimple.PublicKey:
+                return _Column(pa.string(), str)
+            return _Column(_SIMPLE_ARROW_TYPES[type_], None)
+        if isinstance(type_, IdlTypeOption):
+            inner = self.type_column(type_.option)
+            convert = inner.convert
+            if convert is None:
+                return _Column(inner.arrow_type, None, nullable=True)
+            return _Column(inner.arrow_type, _optional(convert), nullable=True)
+        if isinstance(type_, IdlTypeVec):
+            return self._list_column(self.type_column(type_.vec), -1)
+        if isinstance(type_, IdlTypeArray):
+            return self._list_column(self.type_column(type_.array[0]), type_.array[1])
+        if isinstance(type_, IdlTypeDefined):
+            return self.typedef_column(type_.defined)
+        raise ValueError(f"Arrow export not implemented for {type_}")
+
+    def typedef_column(self, name: str) -> _Column:
+        if name in self._visiting:
+            raise ValueError(f"Recursive type {name} can't be exported to Arrow")
+        try:
+            typedef = self._types_by_name[name]
+        except KeyError as e:
+            raise ValueError(f"Type not found {name}") from e
+        self._visiting.append(name)
+        try:
+            return self._typedef_column(typedef)
+        finally:
+            self._visiting.pop()
+
+    def _typedef_column(self, typedef: IdlTypeDefinition) -> _Column:
+        typedef_type = typedef.ty
+        if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+            return self.struct_column(typedef)
+        if isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+            return self._enum_column(typedef_type)
+        if isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+            return self.type_column(typedef_type.value)
+        raise ValueError(f"Arrow export not implemented for {typedef.name}")
+
+    def struct_columns(self, typedef: IdlTypeDefinition) -> Dict[str, _Column]:
+        typedef_type = typedef.ty
+        if not isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+            raise ValueError(f"{typedef.name} is not a struct")
+        datacls = _idl_typedef_ty_struct_to_dataclass_type(
+            typedef_type, typedef.name, self.types
+        )
+        names = [field.name for field in dataclass_fields(datacls)]
+        return {
+            names[idx]: self.type_column(field.ty)
+            for idx, field in enumerate(typedef_type.fields)
+        }
+
+    def struct_column(self, typedef: IdlTypeDefinition) -> _Column:
+        return _struct_column(self.struct_columns(typedef), _attr_values)
+
+    def _list_column(self, element: _Column, length: int) -> _Column:
+        arrow_type = pa.list_(element.field("item"), length)
+        convert = element.convert
+        if convert is None:
+            return _Column(arrow_type, None)
+        return _Column(arrow_type, _each(convert))
+
+    def _enum_column(self, typedef_type: IdlTypeDefinitionTyEnum) -> _Column:
+        variant_names = [variant.name for variant in typedef_type.variants]
+        if all(variant.fields is None for variant in typedef_type.variants):
+            return _Column(pa.string(), lambda value: variant_names[value.index])
+        arrow_fields = [pa.field("kind", pa.string(), nullable=False)]
+        # variant index -> position in the struct and converter of its fields
+        variant_converters: Dict[int, Tuple[int, Callable[[Any], Any]]] = {}
+        for idx, variant in enumerate(typedef_type.variants):
+            if variant.fields is None:
+                continue
+            if isinstance(variant.fields, EnumFieldsNamed):
+                named: List[IdlField] = variant.fields.fields
+                datacls = _idl_enum_fields_named_to_dataclass_type(
+                    named, variant.name, self.types
+                )
+                names = [field.name for field in dataclass_fields(datacls)]
+                columns = {
+                    names[pos]: self.type_column(field.ty)
+                    for pos, field in enumerate(named)
+                }
+                column = _struct_column(columns, _attr_values)
+            else:
+                columns = {
+                    f"_{pos}": self.type_column(ty)
+                    for pos, ty in enumerate(variant.fields.fields)
+                }
+                column = _struct_column(columns, lambda _: _tuple_variant_values)
+            if column.convert is not None:
+                variant_converters[idx] = (len(arrow_fields), column.convert)
+            arrow_fields.append(
+                pa.field(variant.name, column.arrow_type, nullable=True)
+            )
+        n_fields = len(arrow_fields)
+
+        def convert(value: Any) -> Tuple[Any, ...]:
+            idx = value.index
+            row: List[Any] = [None] * n_fields
+            row[0] = variant_names[idx]
+            if idx in variant_converters:
+                pos, variant_convert = variant_converters[idx]
+                row[pos] = variant_convert(value)
+            return tuple(row)
+
+        return _Column(pa.struct(arrow_fields), convert)
+
+
+def _optional(convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda value: None if value is None else convert(value)
+
+
+def _each(convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda values: [convert(value) for value in values]
+
+
+def _attr_values(names: List[str]) -> Callable[[Any], Sequence[Any]]:
+    if len(names) == 1:
+        name = names[0]
+        return lambda value: (getattr(value, name),)
+    return attrgetter(*names)
+
+
+def _tuple_variant_values(value: Any) -> Sequence[Any]:
+    return value.tuple_data
+
+
+def _struct_column(
+    columns: Dict[str, _Column],
+    make_getter: Callable[[List[str]], Callable[[Any], Sequence[Any]]],
+) -> _Column:
+    """Map a struct to an Arrow struct whose values are built as tuples.
+
+    Args:
+        columns: The struct fields.
+        make_getter: Given the field names, returns a function that extracts the
+            field values from a decoded value, in order.
+
+    Returns:
+        The column.
+    """
+    names = list(columns)
+    arrow_type = pa.struct([column.field(name) for name, column in columns.items()])
+    get_values = make_getter(names)
+    to_convert = [
+        (idx, column.convert)
+        for idx, column in enumerate(columns.values())
+        if column.convert is not None
+    ]
+    if not to_convert:
+        return _Column(arrow_type, lambda value: tuple(get_values(value)))
+
+    def convert(value: Any) -> Tuple[Any, ...]:
+        values = list(get_values(value))
+        for idx, field_convert in to_convert:
+            values[idx] = field_convert(values[idx])
+        return tuple(values)
+
+    return _Column(arrow_type, convert)
+
+
+def _account_columns(idl: Idl, name: str) -> Dict[str, _Column]:
+    filtered = [acc for acc in idl.accounts if acc.name == name]
+    if len(filtered) != 1:
+        raise ValueError(f"Account not found {name}")
+    return _SchemaBuilder(idl.types).struct_columns(filtered[0])
+
+
+def _export_schema(
+    columns: Dict[str, _Column], name: str, public_key_column: Optional[str]
+) -> pa.Schema:
+    fields = [column.field(col_name) for col_name, column in columns.items()]
+    if public_key_column is not None:
+        if public_key_column in columns:
+            raise ValueError(f"{public_key_column} is already a field of {name}")
+        fields.insert(0, pa.field(public_key_column, pa.string()))
+    return pa.schema(fields)
+
+
+def account_schema(idl: Idl, name: str) -> pa.Schema:
+    """Map an IDL account type to an Arrow schema.
+
+    Args:
+        idl: The parsed `Idl` object.
+        name: The account name.
+
+    Returns:
+        The Arrow schema, with one top-level field per account field.
+    """
+    return _export_schema(_account_columns(idl, name), name, None)
+
+
+def to_record_batches(
+    idl: Idl,
+    name: str,
+    accounts: Iterable[Union[ProgramAccount, bytes]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    coder: Optional[AccountsCoder] = None,
+    public_key_column: Optional[str] = "public_key",
+    pause_gc: bool = False,
+) -> Iterator[pa.RecordBatch]:
+    """Stream accounts into Arrow record batches.
+
+    Args:
+        idl: The parsed `Idl` object.
+        name: The account name.
+        accounts: `ProgramAccount` objects, as returned by `AccountClient.all()`,
+            or raw account data including the discriminator.
+        batch_size: The maximum number of rows per record batch.
+        coder: The accounts coder used to decode raw account data.
+            Defaults to a new `AccountsCoder` for the IDL.
+        public_key_column: The name of the column holding the account addresses
+            as base58 strings, or None to leave it out. Rows made from raw account
+            data have a null public key.
+        pause_gc: Whether to disable the cyclic garbage collector while each
+            batch is built. This can make large exports markedly faster, but
+            it disables the collector for the whole process, including other
+            threads, until the batch is built.
+
+    Raises:
+        ValueError: If the account can't be exported to Arrow.
+
+    Yields:
+        Record batches of the account schema, preceded by the public key column.
+    """
+    columns = _account_columns(idl, name)
+    schema = _export_schema(columns, name, public_key_column)
+    accounts_coder = AccountsCoder(idl) if coder is None else coder
+    getters = [
+        (col_name, column.convert, column.arrow_type)
+        for col_name, column in columns.items()
+    ]
+    iterator = iter(accounts)
+    while True:
+        chunk = list(islice(iterator, batch_size))
+        if not chunk:
+            return
+        with _gc_paused() if pause_gc else nullcontext():
+            arrays = _batch_arrays(chunk, getters, accounts_coder, public_key_column)
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _batch_arrays(
+    chunk: List[Union[ProgramAccount, bytes]],
+    getters: List[Tuple[str, _Converter, pa.DataType]],
+    accounts_coder: AccountsCoder,
+    public_key_column: Optional[str],
+) -> List[pa.Array]:
+    public_keys: List[Optional[str]] = []
+    decoded: List[Any] = []
+    for account in chunk:
+        if isinstance(account, ProgramAccount):
+            public_keys.append(str(account.public_key))
+            decoded.append(account.account)
+        else:
+            public_keys.append(None)
+            decoded.append(accounts_coder.decode(account))
+    arrays = [] if public_key_column is None else [pa.array(public_keys, pa.string())]
+    for col_name, convert, arrow_type in getters:
+        values = [getattr(acc, col_name) for acc in decoded]
+        if convert is not None:
+            values = [convert(value) for value in values]
+        arrays.append(pa.array(values, arrow_type))
+    return arrays
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    # A batch allocates many objects that outlive the young generations but
+    # never form reference cycles. Left enabled, the cyclic garbage collector
+    # keeps rescanning them and takes more time than the conversion itself.
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+
+def write_parquet(
+    where: Any,
+    idl: Idl,
+    name: str,
+    accounts: Iterable[Union[ProgramAccount, bytes]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    coder: Optional[AccountsCoder] = None,
+    public_key_column: Optional[str] = "public_key",
+    pause_gc: bool = False,
+    **kwargs: Any,
+) -> int:
+    """Write accounts to a Parquet file, one record batch at a time.
+
+    Args:
+        where: The file path or file-like object to write to.
+        idl: The parsed `Idl` object.
+        name: The account name.
+        accounts: `ProgramAccount` objects or raw account data, as in
+            `to_record_batches`.
+        batch_size: The maximum number of rows per record batch.
+        coder: The accounts coder used to decode raw account data.
+        public_key_column: The name of the public key column, or None to leave it
+            out.
+        pause_gc: Whether to disable the cyclic garbage collector while each
+            batch is built, as in `to_record_batches`.
+        **kwargs: Passed to `pyarrow.parquet.ParquetWriter`.
+
+    Returns:
+        The number of rows written.
+    """
+    schema = _export_schema(_account_columns(idl, name), name, public_key_column)
+    batches = to_record_batches(
+        idl,
+        name,
+        accounts,
+        batch_size=batch_size,
+        coder=coder,
+        public_key_column=public_key_column,
+        pause_gc=pause_gc,
+    )
+    n_rows = 0
+    with pq.ParquetWriter(where, schema, **kwargs) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            n_rows += batch.num_rows
+    return n_rows
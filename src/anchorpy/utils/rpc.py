@@ -1,22 +1,42 @@
 """This module contains the invoke function."""
-from asyncio import gather
+import gzip
+from asyncio import (
+    Future,
+    Task,
+    TimerHandle,
+    gather,
+    get_running_loop,
+    shield,
+    sleep,
+)
+from collections import deque
+from contextlib import suppress
 from dataclasses import dataclass
+from time import monotonic
 from typing import NamedTuple, Optional, Union, cast
 
+import httpx
 from solana.rpc.async_api import AsyncClient
 from solana.rpc.commitment import Commitment, Confirmed, Finalized, Processed
 from solana.rpc.core import RPCException
 from solders.account import Account
-from solders.account_decoder import UiAccountEncoding
+from solders.account_decoder import UiAccountEncoding, UiDataSliceConfig
 from solders.commitment_config import CommitmentLevel
 from solders.pubkey import Pubkey
 from solders.rpc.config import RpcAccountInfoConfig
 from solders.rpc.requests import GetMultipleAccounts, batch_to_json
 from solders.rpc.responses import GetMultipleAccountsResp, RPCError, batch_from_json
-from toolz import concat, partition_all
+from toolz import partition_all
+
+from anchorpy.error import GetMultipleAccountsError
 
 _GET_MULTIPLE_ACCOUNTS_LIMIT = 100
 _MAX_ACCOUNT_SIZE = 10 * 1048576
+_RETRYABLE_STATUS_CODES = {408, 429}
+_MIN_BACKOFF = 0.1
+_MAX_BACKOFF = 10.0
+# Smaller request bodies aren't worth compressing.
+_GZIP_MIN_SIZE = 1024
 
 _COMMITMENT_TO_SOLDERS = {
     Finalized: CommitmentLevel.Finalized,
@@ -46,6 +66,7 @@ class AccountInfo(NamedTuple):
 class _MultipleAccountsItem:
     pubkey: Pubkey
     account: Account
+    slot: Optional[int] = None
 
 
 async def get_multiple_accounts(
@@ -53,65 +74,305 @@ async def get_multiple_accounts(
     pubkeys: list[Pubkey],
     batch_size: int = 3,
     commitment: Optional[Commitment] = None,
+    data_slice: Optional[UiDataSliceConfig] = None,
+    max_concurrency: int = 4,
+    max_retries: int = 3,
+    adaptive: bool = True,
+    max_batch_size: int = 10,
+    target_latency: float = 1.0,
+    encoding: UiAccountEncoding = UiAccountEncoding.Base64Zstd,
+    gzip_requests: bool = False,
 ) -> list[Optional[_MultipleAccountsItem]]:
     """Fetch multiple account infos through batched `getMultipleAccount` RPC requests.
 
+    At most `max_concurrency` HTTP requests are in flight at once. Requests
+    that fail with a 429 or 5xx status, or a connection error, are retried up
+    to `max_retries` times, waiting longer after each attempt or as long as the
+    `Retry-After` header says.
+
+    If `adaptive`, the number of `getMultipleAccount` objects in each HTTP
+    request starts at `batch_size`, grows by one after each request answered
+    within `target_latency`, shrinks by one after each slower request and is
+    halved after each failed one, between 1 and `max_batch_size`.
+
     Args:
         connection: The `solana-py` client object.
         pubkeys: Pubkeys to fetch.
         batch_size: The number of `getMultipleAccount` objects to include in each
             HTTP request.
         commitment: Bank state to query.
+        data_slice: Only fetch this range of the account data.
+        max_concurrency: The most HTTP requests in flight at once.
+        max_retries: How many times to retry a failed HTTP request.
+        adaptive: Whether to adapt the batch size to the latency and errors.
+        max_batch_size: The largest batch size when `adaptive`.
+        target_latency: The longest an HTTP request should take when
+            `adaptive`, in seconds.
+        encoding: The encoding of the account data in the responses. Either
+            `Base64Zstd`, which is smaller for most accounts, or `Base64`, which
+            is cheaper to decode. See `benchmarks/account_encoding.py`.
+        gzip_requests: Whether to gzip-compress large request bodies. Only
+            enable it for RPC nodes that accept compressed requests.
+
+    Raises:
+        GetMultipleAccountsError: If some of the accounts could not be fetched.
+            The accounts that were fetched are in its `accounts` attribute.
 
     Returns:
         Account infos and pubkeys.
     """
-    pubkeys_per_network_request = _GET_MULTIPLE_ACCOUNTS_LIMIT * batch_size
-    chunks = partition_all(pubkeys_per_network_request, pubkeys)
-    awaitables = [
-        _get_multiple_accounts_core(connection, pubkeys_chunk, commitment)
-        for pubkeys_chunk in chunks
+    groups = [
+        list(group) for group in partition_all(_GET_MULTIPLE_ACCOUNTS_LIMIT, pubkeys)
     ]
-    results = await gather(*awaitables, return_exceptions=False)
-    return list(concat(results))
+    offsets = [idx * _GET_MULTIPLE_ACCOUNTS_LIMIT for idx in range(len(groups))]
+    result: list[Optional[_MultipleAccountsItem]] = [None for _ in pubkeys]
+    pending = deque(range(len(groups)))
+    attempts = [0 for _ in groups]
+    errors: dict[int, Exception] = {}
+    sizer = _BatchSizer(
+        batch_size,
+        max(batch_size, max_batch_size) if adaptive else batch_size,
+        target_latency if adaptive else None,
+    )
+
+    async def worker() -> None:
+        while pending:
+            group_idxs = [
+                pending.popleft() for _ in range(min(sizer.size, len(pending)))
+            ]
+            start = monotonic()
+            try:
+                parsed = await _get_multiple_accounts_core(
+                    connection,
+                    [groups[idx] for idx in group_idxs],
+                    commitment,
+                    data_slice,
+                    encoding,
+                    gzip_requests,
+                )
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                sizer.failure()
+                attempt = max(attempts[idx] for idx in group_idxs)
+                if not _is_retryable(e) or attempt >= max_retries:
+                    for idx in group_idxs:
+                        errors[idx] = e
+                    continue
+                for idx in group_idxs:
+                    attempts[idx] = attempt + 1
+                await sleep(_backoff(e, attempt))
+                pending.extendleft(reversed(group_idxs))
+                continue
+            sizer.success(monotonic() - start)
+            for result_idx, rpc_result in enumerate(parsed):
+                idx = group_idxs[result_idx]
+                if not isinstance(rpc_result, GetMultipleAccountsResp):
+                    errors[idx] = RPCException(rpc_result)
+                    continue
+                offset = offsets[idx]
+                slot = rpc_result.context.slot
+                for account_idx, account in enumerate(rpc_result.value):
+                    if account is not None:
+                        result[offset + account_idx] = _MultipleAccountsItem(
+                            pubkey=pubkeys[offset + account_idx],
+                            account=account,
+                            slot=slot,
+                        )
+
+    await gather(*(worker() for _ in range(max_concurrency)))
+    if errors:
+        failed = [pubkey for idx in sorted(errors) for pubkey in groups[idx]]
+        distinct_errors = list({id(e): e for e in errors.values()}.values())
+        raise GetMultipleAccountsError(result, failed, distinct_errors)
+    return result
+
+
+@dataclass
+class _BatchSizer:
+    size: int
+    max_size: int
+    target_latency: Optional[float]
+
+    def success(self, latency: float) -> None:
+        if self.target_latency is None:
+            return
+        if latency <= self.target_latency:
+            self.size = min(self.size + 1, self.max_size)
+        else:
+            self.size = max(self.size - 1, 1)
+
+    def failure(self) -> None:
+        if self.target_latency is not None:
+            self.size = max(self.size // 2, 1)
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status in _RETRYABLE_STATUS_CODES or status >= 500
+    return True
+
+
+def _backoff(error: Exception, attempt: int) -> float:
+    if isinstance(error, httpx.HTTPStatusError):
+        retry_after = error.response.headers.get("retry-after")
+        if retry_after is not None:
+            with suppress(ValueError):
+                return min(float(retry_after), _MAX_BACKOFF)
+    return min(_MIN_BACKOFF * 2**attempt, _MAX_BACKOFF)
 
 
 async def _get_multiple_accounts_core(
-    connection: AsyncClient, pubkeys: list[Pubkey], commitment: Optional[Commitment]
-) -> list[Optional[_MultipleAccountsItem]]:
-    pubkey_batches = partition_all(_GET_MULTIPLE_ACCOUNTS_LIMIT, pubkeys)
+    connection: AsyncClient,
+    pubkey_groups: list[list[Pubkey]],
+    commitment: Optional[Commitment],
+    data_slice: Optional[UiDataSliceConfig] = None,
+    encoding: UiAccountEncoding = UiAccountEncoding.Base64Zstd,
+    gzip_requests: bool = False,
+) -> list[Union[RPCError, GetMultipleAccountsResp]]:
     rpc_requests: list[GetMultipleAccounts] = []
     commitment_to_use = connection._commitment if commitment is None else commitment
-    for pubkey_batch in pubkey_batches:
+    for pubkey_group in pubkey_groups:
         rpc_req = GetMultipleAccounts(
-            list(pubkey_batch),
+            pubkey_group,
             RpcAccountInfoConfig(
-                encoding=UiAccountEncoding.Base64Zstd,
+                encoding=encoding,
                 commitment=_COMMITMENT_TO_SOLDERS[commitment_to_use],
+                data_slice=data_slice,
             ),
         )
         rpc_requests.append(rpc_req)
+    content, headers = _request_body(batch_to_json(rpc_requests), gzip_requests)
     resp = await connection._provider.session.post(
-        connection._provider.endpoint_uri,
-        content=batch_to_json(rpc_requests),
-        headers={"content-encoding": "gzip", "Content-type": "application/json"},
+        connection._provider.endpoint_uri, content=content, headers=headers
     )
-    parsed = cast(
+    resp.raise_for_status()
+    return cast(
         list[Union[RPCError, GetMultipleAccountsResp]],
         batch_from_json(resp.text, [GetMultipleAccountsResp for _ in rpc_requests]),
     )
-    result: list[Optional[_MultipleAccountsItem]] = []
-    idx = 0
-    for rpc_result in parsed:
-        if not isinstance(rpc_result, GetMultipleAccountsResp):
-            raise RPCException(f"Failed to get info about accounts: {rpc_result}")
-        for account in rpc_result.value:
-            if account is None:
-                result.append(None)
-            else:
-                multiple_accounts_item = _MultipleAccountsItem(
-                    pubkey=pubkeys[idx], account=account
+
+
+def _request_body(raw: str, gzip_requests: bool) -> tuple[bytes, dict[str, str]]:
+    content = raw.encode()
+    headers = {"Content-type": "application/json"}
+    if gzip_requests and len(content) >= _GZIP_MIN_SIZE:
+        content = gzip.compress(content, compresslevel=6)
+        headers["content-encoding"] = "gzip"
+    return content, headers
+
+
+class _LoaderBatch:
+    def __init__(
+        self, commitment: Optional[Commitment], data_slice: Optional[UiDataSliceConfig]
+    ) -> None:
+        self.commitment = commitment
+        self.data_slice = data_slice
+        self.futures: dict[Pubkey, Future[Optional[_MultipleAccountsItem]]] = {}
+        self.timer: Optional[TimerHandle] = None
+
+
+class AccountLoader:
+    """Coalesce concurrent account reads into `getMultipleAccounts` requests.
+
+    Reads made through `load` within `window_ms` milliseconds of each other
+    are collected, deduplicated and sent as one `getMultipleAccounts` request,
+    and each caller gets its account back. A batch is sent early once it holds
+    `max_batch_size` distinct accounts. Reads with different commitments or
+    data slices go into separate batches.
+
+    Pass one to `Provider` to coalesce the `AccountClient.fetch` calls of every
+    program that uses the provider.
+    """
+
+    def __init__(
+        self,
+        connection: AsyncClient,
+        window_ms: float = 1.0,
+        max_batch_size: int = _GET_MULTIPLE_ACCOUNTS_LIMIT,
+    ) -> None:
+        """Init.
+
+        Args:
+            connection: The `solana-py` client object.
+            window_ms: How long to collect reads before sending them, in
+                milliseconds.
+            max_batch_size: The most accounts in one request, at most 100.
+        """
+        if not 1 <= max_batch_size <= _GET_MULTIPLE_ACCOUNTS_LIMIT:
+            raise ValueError(
+                f"max_batch_size must be between 1 and {_GET_MULTIPLE_ACCOUNTS_LIMIT},"
+                f" got {max_batch_size}"
+            )
+        self.connection = connection
+        self.window_ms = window_ms
+        self.max_batch_size = max_batch_size
+        self._batches: dict[tuple, _LoaderBatch] = {}
+        self._tasks: set[Task[None]] = set()
+
+    async def load(
+        self,
+        address: Pubkey,
+        commitment: Optional[Commitment] = None,
+        data_slice: Optional[UiDataSliceConfig] = None,
+    ) -> Optional[_MultipleAccountsItem]:
+        """Fetch an account, together with the other reads made meanwhile.
+
+        Args:
+            address: The account to fetch.
+            commitment: Bank state to query.
+            data_slice: Only fetch this range of the account data.
+
+        Raises:
+            GetMultipleAccountsError: If the request for the batch failed.
+
+        Returns:
+            The account info, or None if the account doesn't exist.
+        """
+        key = (
+            commitment,
+            None if data_slice is None else (data_slice.offset, data_slice.length),
+        )
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _LoaderBatch(commitment, data_slice)
+        future = batch.futures.get(address)
+        if future is None:
+            loop = get_running_loop()
+            future = batch.futures[address] = loop.create_future()
+            if len(batch.futures) >= self.max_batch_size:
+                self._dispatch(key)
+            elif batch.timer is None:
+                batch.timer = loop.call_later(
+                    self.window_ms / 1000, self._dispatch, key
                 )
-                result.append(multiple_accounts_item)
-            idx += 1
-    return result
+        # one caller giving up doesn't cancel the read for the others
+        return await shield(future)
+
+    def _dispatch(self, key: tuple) -> None:
+        batch = self._batches.pop(key)
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = get_running_loop().create_task(self._load_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _load_batch(self, batch: _LoaderBatch) -> None:
+        futures = batch.futures
+        try:
+            accounts = await get_multiple_accounts(
+                self.connection,
+                list(futures),
+                batch_size=1,
+                commitment=batch.commitment,
+                data_slice=batch.data_slice,
+                max_concurrency=1,
+                adaptive=False,
+            )
+        except Exception as e:  # noqa: BLE001
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for idx, future in enumerate(futures.values()):
+            if not future.done():
+                future.set_result(accounts[idx])
@@ -253,7 +253,9 @@ async def get_token_account(provider: Provider, addr: Pubkey) -> AccountInfo:
     Returns:
         The parsed `AccountInfo` of the token account.
     """
-    depositor_acc_info_raw = await provider.connection.get_account_info(addr)
+    depositor_acc_info_raw = await provider.connection.get_account_info(
+        addr, encoding="base64+zstd"
+    )
     return parse_token_account(depositor_acc_info_raw)
 
 
@@ -270,7 +272,9 @@ async def get_mint_info(
     Returns:
         The parsed `MintInfo`.
     """
-    depositor_acc_info_raw = await provider.connection.get_account_info(addr)
+    depositor_acc_info_raw = await provider.connection.get_account_info(
+        addr, encoding="base64+zstd"
+    )
     return parse_mint_account(depositor_acc_info_raw)
 
 
@@ -6,6 +6,7 @@ import toml  # type: ignore
 from anchorpy_core.idl import Idl
 from solders.pubkey import Pubkey
 
+from anchorpy.coder.code_cache import CodeCache
 from anchorpy.program.core import Program
 from anchorpy.provider import Provider
 
@@ -13,7 +14,9 @@ WorkspaceType = Dict[str, Program]
 
 
 def create_workspace(
-    path: Optional[Union[Path, str]] = None, url: Optional[str] = None
+    path: Optional[Union[Path, str]] = None,
+    url: Optional[str] = None,
+    code_cache: Optional[CodeCache] = None,
 ) -> WorkspaceType:
     """Get a workspace from the provided path to the project root.
 
@@ -21,6 +24,8 @@ def create_workspace(
         path: The path to the project root. Defaults to the current working
             directory if omitted.
         url: The URL of the JSON RPC. Defaults to http://localhost:8899.
+        code_cache: An on-disk cache of the code generated from the IDLs, shared
+            by the programs of the workspace.
 
     Returns:
         Mapping of program name to Program object.
@@ -36,7 +41,7 @@ def create_workspace(
         idl = Idl.from_json(raw)
         name = idl.name
         program_id = Pubkey.from_string(localnet_programs[name])
-        program = Program(idl, program_id, Provider.local(url))
+        program = Program(idl, program_id, Provider.local(url), code_cache=code_cache)
         result[idl.name] = program
     return result
 
@@ -0,0 +1,74 @@
+"""Helpers for tests that stand in for an RPC node."""
+from base64 import b64encode
+from pathlib import Path
+from typing import Any, Callable, Coroutine, Dict, Optional, Union
+
+import httpx
+from anchorpy import Idl, Program, Provider, Wallet
+from anchorpy.coder.accounts import _account_discriminator
+from solana.rpc.async_api import AsyncClient
+from solders.pubkey import Pubkey
+
+PROGRAM_ID = Pubkey.from_string("2dhGsWUzy5YKUsjZdLHLmkNpUDAXkNa9MYWsPc4Ziqzy")
+_DEFAULT_OWNER = Pubkey.default()
+
+_Handler = Union[
+    Callable[[httpx.Request], httpx.Response],
+    Callable[[httpx.Request], Coroutine[None, None, httpx.Response]],
+]
+
+
+def jet_auth_program(
+    connection: Optional[AsyncClient] = None, **kwargs: Any
+) -> Program:
+    """Make a `Program` for the jet_auth IDL at `PROGRAM_ID`.
+
+    Args:
+        connection: The client of the stand-in node, if any.
+        **kwargs: Passed to `Program`.
+
+    Returns:
+        The program.
+    """
+    idl = Idl.from_json(Path("tests/idls/jet_auth.json").read_text())
+    provider = None if connection is None else Provider(connection, Wallet.dummy())
+    return Program(idl, PROGRAM_ID, provider, **kwargs)
+
+
+def auth_account_data(owner: Pubkey, complete: bool = False) -> bytes:
+    """Encode a jet_auth `UserAuthentication` account."""
+    disc = _account_discriminator("UserAuthentication")
+    return disc + bytes(owner) + bytes([complete, True])
+
+
+def mock_client(handler: _Handler) -> AsyncClient:
+    """Make a client whose HTTP requests are answered by `handler`."""
+    connection = AsyncClient("http://stand-in")
+    transport = httpx.MockTransport(handler)
+    connection._provider.session = httpx.AsyncClient(transport=transport)
+    return connection
+
+
+def rpc_result(req: Dict[str, Any], result: Any) -> Dict[str, Any]:
+    """Answer a JSON-RPC request with `result`."""
+    return {"jsonrpc": "2.0", "id": req["id"], "result": result}
+
+
+def rpc_error(req: Dict[str, Any], code: int, message: str) -> Dict[str, Any]:
+    """Answer a JSON-RPC request with an error."""
+    error = {"code": code, "message": message}
+    return {"jsonrpc": "2.0", "id": req["id"], "error": error}
+
+
+def ui_account(
+    data: bytes, owner: Pubkey = _DEFAULT_OWNER, lamports: int = 1
+) -> Dict[str, Any]:
+    """Encode an account as it appears in RPC responses and notifications."""
+    return {
+        "data": [b64encode(data).decode(), "base64"],
+        "executable": False,
+        "lamports": lamports,
+        "owner": str(owner),
+        "rentEpoch": 0,
+        "space": len(data),
+    }
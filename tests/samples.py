@@ -0,0 +1,99 @@
+"""Generate valid borsh-encoded sample data for IDL types."""
+import random
+import struct
+
+from anchorpy.idl import TypeDefs
+from anchorpy_core.idl import (
+    EnumFieldsNamed,
+    IdlType,
+    IdlTypeArray,
+    IdlTypeDefined,
+    IdlTypeDefinition,
+    IdlTypeDefinitionTyAlias,
+    IdlTypeDefinitionTyEnum,
+    IdlTypeDefinitionTyStruct,
+    IdlTypeOption,
+    IdlTypeSimple,
+    IdlTypeVec,
+)
+
+_INT_SIZES = {
+    IdlTypeSimple.U8: 1,
+    IdlTypeSimple.I8: 1,
+    IdlTypeSimple.U16: 2,
+    IdlTypeSimple.I16: 2,
+    IdlTypeSimple.U32: 4,
+    IdlTypeSimple.I32: 4,
+    IdlTypeSimple.U64: 8,
+    IdlTypeSimple.I64: 8,
+    IdlTypeSimple.U128: 16,
+    IdlTypeSimple.I128: 16,
+    IdlTypeSimple.PublicKey: 32,
+}
+_MAX_DEPTH = 4
+
+
+def sample_type_bytes(
+    type_: IdlType, types: TypeDefs, rng: random.Random, depth: int = 0
+) -> bytes:
+    """Return a random valid encoding of an IDL type."""
+    if isinstance(type_, IdlTypeSimple):
+        if type_ == IdlTypeSimple.Bool:
+            return bytes([rng.randint(0, 1)])
+        if type_ == IdlTypeSimple.F32:
+            return struct.pack("<f", rng.uniform(-1e6, 1e6))
+        if type_ == IdlTypeSimple.F64:
+            return struct.pack("<d", rng.uniform(-1e6, 1e6))
+        if type_ == IdlTypeSimple.String:
+            text = "".join(rng.choice("abcdé") for _ in range(rng.randint(0, 8)))
+            encoded = text.encode()
+            return struct.pack("<I", len(encoded)) + encoded
+        if type_ == IdlTypeSimple.Bytes:
+            return struct.pack("<I", 3) + rng.randbytes(3)
+        return rng.randbytes(_INT_SIZES[type_])
+    if isinstance(type_, IdlTypeVec):
+        length = 0 if depth >= _MAX_DEPTH else rng.randint(0, 3)
+        items = [
+            sample_type_bytes(type_.vec, types, rng, depth + 1) for _ in range(length)
+        ]
+        return struct.pack("<I", length) + b"".join(items)
+    if isinstance(type_, IdlTypeOption):
+        if depth >= _MAX_DEPTH or rng.random() < 0.3:
+            return b"\x00"
+        return b"\x01" + sample_type_bytes(type_.option, types, rng, depth + 1)
+    if isinstance(type_, IdlTypeArray):
+        return b"".join(
+            sample_type_bytes(type_.array[0], types, rng, depth + 1)
+            for _ in range(type_.array[1])
+        )
+    if isinstance(type_, IdlTypeDefined):
+        typedef = [t for t in types if t.name == type_.defined][0]
+        return sample_typedef_bytes(typedef, types, rng, depth + 1)
+    raise ValueError(f"Unsupported type {type_}")
+
+
+def sample_typedef_bytes(
+    typedef: IdlTypeDefinition, types: TypeDefs, rng: random.Random, depth: int = 0
+) -> bytes:
+    """Return a random valid encoding of an IDL typedef."""
+    typedef_type = typedef.ty
+    if isinstance(typedef_type, IdlTypeDefinitionTyStruct):
+        return b"".join(
+            sample_type_bytes(f.ty, types, rng, depth) for f in typedef_type.fields
+        )
+    if isinstance(typedef_type, IdlTypeDefinitionTyEnum):
+        idx = rng.randrange(len(typedef_type.variants))
+        fields = typedef_type.variants[idx].fields
+        if fields is None:
+            return bytes([idx])
+        field_types = (
+            [f.ty for f in fields.fields]
+            if isinstance(fields, EnumFieldsNamed)
+            else fields.fields
+        )
+        return bytes([idx]) + b"".join(
+            sample_type_bytes(ty, types, rng, depth) for ty in field_types
+        )
+    if isinstance(typedef_type, IdlTypeDefinitionTyAlias):
+        return sample_type_bytes(typedef_type.value, types, rng, depth)
+    raise ValueError(f"Unsupported typedef {typedef}")
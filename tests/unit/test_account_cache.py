@@ -0,0 +1,121 @@
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from anchorpy import AccountCache, Program
+from pytest import mark
+from solana.rpc.async_api import AsyncClient
+from solders.instruction import AccountMeta, Instruction
+from solders.pubkey import Pubkey
+
+from tests.rpc_stand_in import (
+    PROGRAM_ID,
+    auth_account_data,
+    jet_auth_program,
+    mock_client,
+    rpc_result,
+    ui_account,
+)
+
+
+class _Node:
+    """Stands in for an RPC node serving accounts at a given slot."""
+
+    def __init__(self, accounts: Dict[Pubkey, bytes]) -> None:
+        self.accounts = {str(pubkey): data for pubkey, data in accounts.items()}
+        self.slot = 1
+        self.requested: List[List[str]] = []
+
+    def client(self) -> AsyncClient:
+        return mock_client(self._handle)
+
+    def _handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if isinstance(body, dict):
+            assert body["method"] == "getAccountInfo"
+            self.requested.append([body["params"][0]])
+            account = self._account(body["params"][0])
+            return httpx.Response(200, json=self._result(body, account))
+        results = []
+        for req in body:
+            assert req["method"] == "getMultipleAccounts"
+            self.requested.append(req["params"][0])
+            value = [self._account(pubkey) for pubkey in req["params"][0]]
+            results.append(self._result(req, value))
+        return httpx.Response(200, json=results)
+
+    def _result(self, req: Dict[str, Any], value: Any) -> Dict[str, Any]:
+        return rpc_result(req, {"context": {"slot": self.slot}, "value": value})
+
+    def _account(self, pubkey: str) -> Optional[Dict[str, Any]]:
+        data = self.accounts.get(pubkey)
+        return None if data is None else ui_account(data)
+
+
+def _program(connection: AsyncClient, cache: AccountCache) -> Program:
+    return jet_auth_program(connection, account_cache=cache)
+
+
+@mark.asyncio
+async def test_account_cache() -> None:
+    owners = [Pubkey.new_unique() for _ in range(3)]
+    addresses = [Pubkey.new_unique() for _ in range(4)]
+    node = _Node(
+        {addresses[idx]: auth_account_data(owner) for idx, owner in enumerate(owners)}
+    )
+    cache = AccountCache(max_age_ms=None, max_age_slots=2)
+    client = _program(node.client(), cache).account["UserAuthentication"]
+    assert client.cache is cache
+    first = await client.fetch(addresses[0])
+    assert first.owner == owners[0]
+    assert await client.fetch(addresses[0]) is first
+    assert node.requested == [[str(addresses[0])]]
+    # only the misses are fetched, and missing accounts aren't cached
+    fetched = await client.fetch_multiple(addresses)
+    assert fetched[0] is first
+    assert [None if acc is None else acc.owner for acc in fetched] == [*owners, None]
+    assert node.requested[1] == [str(addr) for addr in addresses[1:]]
+    await client.fetch_multiple(addresses)
+    assert node.requested[2] == [str(addresses[3])]
+    info = cache.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (5, 5, 3)
+    assert (info.decode_hits, info.decode_misses) == (5, 3)
+    # entries more than max_age_slots behind are fetched again, but unchanged
+    # accounts aren't decoded again
+    node.slot = 10
+    await client.fetch(addresses[1], fields=["owner"])
+    assert await client.fetch(addresses[0]) is first
+    assert cache.latest_slot == 10
+    assert len(node.requested) == 5
+    # changed accounts are decoded again
+    ix = Instruction(PROGRAM_ID, b"", [AccountMeta(addresses[0], False, True)])
+    cache.invalidate_instructions([ix], slot=11)
+    # responses from before the transaction landed aren't cached
+    assert (await client.fetch(addresses[0])).complete is False
+    node.accounts[str(addresses[0])] = auth_account_data(owners[0], complete=True)
+    node.slot = 11
+    updated = await client.fetch(addresses[0])
+    assert updated.complete is True
+    assert await client.fetch(addresses[0]) is updated
+    assert len(node.requested) == 7
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 0, 0, 10_000, 0)
+
+
+@mark.asyncio
+async def test_account_cache_max_age() -> None:
+    address, owner = Pubkey.new_unique(), Pubkey.new_unique()
+    node = _Node({address: auth_account_data(owner)})
+    cache = AccountCache(max_age_ms=50, maxsize=1)
+    client = _program(node.client(), cache).account["UserAuthentication"]
+    await client.fetch(address)
+    await client.fetch(address)
+    time.sleep(0.06)
+    await client.fetch(address)
+    assert len(node.requested) == 2
+    # the least recently used entry is evicted
+    assert (await client.fetch(address, fields=["owner"])).owner == owner
+    assert len(cache) == 1
+    await client.fetch(address)
+    assert len(node.requested) == 4
@@ -1,7 +1,17 @@
+import copy
+import random
+from contextlib import suppress
+from dataclasses import fields
 from pathlib import Path
 
 from anchorpy import AccountsCoder, Idl
-from pytest import mark
+from anchorpy.coder.common import _account_size
+from anchorpy.coder.view import AccountView
+from anchorpy.error import AccountInvalidDiscriminator
+from anchorpy_core.idl import IdlTypeDefinitionTyStruct
+from pytest import importorskip, mark, raises
+
+from tests.samples import sample_typedef_bytes
 
 
 @mark.unit
@@ -14,3 +24,186 @@ def test_accounts_coder() -> None:
     decoded = acc_coder.parse(raw_acc_data)
     encoded = acc_coder.build(decoded)
     assert encoded == raw_acc_data
+
+
+@mark.unit
+def test_accounts_coder_view() -> None:
+    """Test lazy account views decode the same fields as the accounts coder."""
+    raw = Path("tests/idls/basic_1.json").read_text()
+    idl = Idl.from_json(raw)
+    raw_acc_data = b"\xf6\x1c\x06W\xfb-2*\xd2\x04\x00\x00\x00\x00\x00\x00"
+    acc_coder = AccountsCoder(idl)
+    view = acc_coder.view(raw_acc_data)
+    assert view.data == 1234
+    assert view.materialize() == acc_coder.decode(raw_acc_data)
+    assert copy.copy(view).data == 1234
+    # private names are never looked up as fields, even before init
+    with raises(AttributeError):
+        AccountView.__new__(AccountView)._values
+    with raises(AttributeError):
+        view._missing
+    with raises(AccountInvalidDiscriminator):
+        acc_coder.view(bytes(16))
+    rng = random.Random(0)
+    for path in sorted(Path("tests/idls/").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        idl = Idl.from_json(path.read_text())
+        acc_coder = AccountsCoder(idl)
+        for acc in idl.accounts:
+            if not isinstance(acc.ty, IdlTypeDefinitionTyStruct):
+                continue
+            with suppress(ValueError):
+                if _account_size(idl, acc) > 10_000:
+                    continue
+            disc = acc_coder.acc_name_to_discriminator[acc.name]
+            data = disc + sample_typedef_bytes(acc, idl.types, rng)
+            decoded = acc_coder.decode(data)
+            assert decoded == acc_coder.parse(data).data
+            view = acc_coder.view(data)
+            # read the last fields first so that offsets resolve lazily
+            for field in reversed(fields(decoded)):
+                assert getattr(view, field.name) == getattr(decoded, field.name)
+            assert acc_coder.view(data).materialize() == decoded
+
+
+def _assert_record_matches(record, value) -> None:
+    dtype = record.dtype
+    if record.ndim:
+        assert len(record) == len(value)
+        for idx, item_value in enumerate(value):
+            _assert_record_matches(record[idx], item_value)
+    elif dtype.names == ("lo", "hi"):
+        assert int(record["lo"]) + (int(record["hi"]) << 64) == value
+    elif dtype.names:
+        for name in dtype.names:
+            _assert_record_matches(record[name], getattr(value, name))
+    elif dtype.kind == "V":
+        assert record.tobytes() == bytes(value)
+    elif isinstance(value, (bool, int, float)):
+        assert record == value
+    else:
+        # fieldless enums are stored as the variant index
+        assert record == value.index
+
+
+@mark.unit
+def test_decode_many_numpy() -> None:
+    """Test bulk NumPy decoding matches the accounts coder."""
+    importorskip("numpy")
+    rng = random.Random(0)
+    decoded_count = 0
+    for path in sorted(Path("tests/idls/").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        idl = Idl.from_json(path.read_text())
+        acc_coder = AccountsCoder(idl)
+        for acc in idl.accounts:
+            with suppress(ValueError):
+                if _account_size(idl, acc) > 10_000:
+                    continue
+            disc = acc_coder.acc_name_to_discriminator[acc.name]
+            buffers = [
+                disc + sample_typedef_bytes(acc, idl.types, rng) for _ in range(3)
+            ]
+            try:
+                records = acc_coder.decode_many_numpy(acc.name, buffers)
+            except ValueError:
+                continue
+            decoded_count += 1
+            assert len(records) == len(buffers)
+            for idx, buffer in enumerate(buffers):
+                _assert_record_matches(records[idx], acc_coder.decode(buffer))
+    assert decoded_count > 30
+    idl = Idl.from_json(Path("tests/idls/basic_1.json").read_text())
+    acc_coder = AccountsCoder(idl)
+    raw_acc_data = b"\xf6\x1c\x06W\xfb-2*\xd2\x04\x00\x00\x00\x00\x00\x00"
+    records = acc_coder.decode_many_numpy(
+        "MyAccount", [raw_acc_data, raw_acc_data + bytes(4)]
+    )
+    assert list(records["data"]) == [1234, 1234]
+    with raises(ValueError, match="discriminator"):
+        acc_coder.decode_many_numpy("MyAccount", [bytes(16)])
+    with raises(ValueError, match="shorter"):
+        acc_coder.decode_many_numpy("MyAccount", [raw_acc_data[:12]])
+
+
+@mark.unit
+def test_accounts_coder_decode_fields() -> None:
+    """Test decoding some fields matches decoding the whole account."""
+    rng = random.Random(0)
+    sliced_count = 0
+    for path in sorted(Path("tests/idls/").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        idl = Idl.from_json(path.read_text())
+        acc_coder = AccountsCoder(idl)
+        for acc in idl.accounts:
+            if not isinstance(acc.ty, IdlTypeDefinitionTyStruct):
+                continue
+            with suppress(ValueError):
+                if _account_size(idl, acc) > 10_000:
+                    continue
+            disc = acc_coder.acc_name_to_discriminator[acc.name]
+            data = disc + sample_typedef_bytes(acc, idl.types, rng)
+            decoded = acc_coder.decode(data)
+            names = [field.name for field in fields(decoded)]
+            requested = rng.sample(names, min(len(names), 3))
+            expected = {name: getattr(decoded, name) for name in requested}
+            projected = acc_coder.decode_fields(data, requested)
+            assert list(projected) == requested
+            assert dict(projected) == expected
+            size = acc_coder.fields_prefix_size(acc.name, requested)
+            if size is not None:
+                sliced_count += 1
+                assert size <= len(data)
+                assert dict(acc_coder.decode_fields(data[:size], requested)) == expected
+    assert sliced_count > 30
+    idl = Idl.from_json(Path("tests/idls/basic_1.json").read_text())
+    acc_coder = AccountsCoder(idl)
+    raw_acc_data = b"\xf6\x1c\x06W\xfb-2*\xd2\x04\x00\x00\x00\x00\x00\x00"
+    assert acc_coder.fields_prefix_size("MyAccount", ["data"]) == 16
+    assert acc_coder.decode_fields(raw_acc_data, ["data"]).data == 1234
+    with raises(ValueError, match="no fields"):
+        acc_coder.decode_fields(raw_acc_data, ["nope"])
+
+
+@mark.unit
+def test_accounts_coder_encode_field() -> None:
+    """Test encoded fields match the account data at their offset."""
+    rng = random.Random(0)
+    matched_count = 0
+    for path in sorted(Path("tests/idls/").iterdir()):
+        if "spl_token" in path.name:
+            continue
+        idl = Idl.from_json(path.read_text())
+        acc_coder = AccountsCoder(idl)
+        for acc in idl.accounts:
+            if not isinstance(acc.ty, IdlTypeDefinitionTyStruct):
+                continue
+            with suppress(ValueError):
+                if _account_size(idl, acc) > 10_000:
+                    continue
+            disc = acc_coder.acc_name_to_discriminator[acc.name]
+            data = disc + sample_typedef_bytes(acc, idl.types, rng)
+            decoded = acc_coder.decode(data)
+            for field in fields(decoded):
+                offset = acc_coder.field_offset(acc.name, field.name)
+                if offset is None:
+                    continue
+                value = getattr(decoded, field.name)
+                encoded = acc_coder.encode_field(acc.name, field.name, value)
+                assert data[offset : offset + len(encoded)] == encoded
+                matched_count += 1
+    assert matched_count > 300
+
+
+@mark.unit
+def test_accounts_coder_classify() -> None:
+    """Test accounts are classified by their discriminator."""
+    idl = Idl.from_json(Path("tests/idls/switchboard.json").read_text())
+    acc_coder = AccountsCoder(idl)
+    names = [acc.name for acc in idl.accounts]
+    buffers = [acc_coder.acc_name_to_discriminator[name] + bytes(4) for name in names]
+    buffers += [bytes(16), b"", acc_coder.acc_name_to_discriminator[names[0]]]
+    assert acc_coder.classify(buffers) == [*names, None, None, names[0]]
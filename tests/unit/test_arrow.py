@@ -0,0 +1,102 @@
+import gc
+import random
+from io import BytesIO
+from pathlib import Path
+from typing import List
+
+from anchorpy import AccountsCoder, Idl, ProgramAccount
+from construct import Container
+from pytest import importorskip, mark, raises
+from solders.pubkey import Pubkey
+
+from tests.samples import sample_typedef_bytes
+
+pa = importorskip("pyarrow")
+pq = importorskip("pyarrow.parquet")
+arrow = importorskip("anchorpy.utils.arrow")
+
+
+@mark.unit
+def test_account_schema() -> None:
+    """Test IDL types map to the expected Arrow types."""
+    idl = Idl.from_json(Path("tests/idls/clientgen_example_program.json").read_text())
+    schema = arrow.account_schema(idl, "State")
+    assert schema.field("u128_field").type == pa.decimal256(39, 0)
+    assert schema.field("pubkey_field").type == pa.string()
+    assert schema.field("vec_field").type == pa.list_(
+        pa.field("item", pa.uint64(), nullable=False)
+    )
+    assert schema.field("array_field").type.list_size == 3
+    assert schema.field("option_field").nullable
+    assert not schema.field("bool_field").nullable
+    enum_type = schema.field("enum_field1").type
+    assert enum_type.field("kind").type == pa.string()
+    assert enum_type.field("Named").nullable
+    with raises(ValueError, match="Account not found"):
+        arrow.account_schema(idl, "Missing")
+
+
+@mark.unit
+def test_record_batches_match_decoded_accounts() -> None:
+    """Test exported rows hold the decoded account values."""
+    idl = Idl.from_json(Path("tests/idls/clientgen_example_program.json").read_text())
+    coder = AccountsCoder(idl)
+    acc = next(acc for acc in idl.accounts if acc.name == "State")
+    disc = coder.acc_name_to_discriminator["State"]
+    rng = random.Random(0)
+    buffers = [disc + sample_typedef_bytes(acc, idl.types, rng) for _ in range(5)]
+    address = Pubkey.new_unique()
+    program_account = ProgramAccount(address, coder.decode(buffers[0]))
+    batches = list(
+        arrow.to_record_batches(idl, "State", [program_account, *buffers], 4)
+    )
+    assert [batch.num_rows for batch in batches] == [4, 2]
+    rows = pa.Table.from_batches(batches).to_pylist()
+    assert rows[0]["public_key"] == str(address)
+    assert rows[1]["public_key"] is None
+    for idx, buffer in enumerate(buffers):
+        row = rows[idx + 1]
+        decoded = coder.decode(buffer)
+        assert row["u64_field"] == decoded.u64_field
+        assert int(row["i128_field"]) == decoded.i128_field
+        assert row["pubkey_field"] == str(decoded.pubkey_field)
+        assert row["vec_field"] == list(decoded.vec_field)
+        assert row["enum_field1"]["kind"] == type(decoded.enum_field1).__name__
+
+
+@mark.unit
+def test_write_parquet() -> None:
+    """Test accounts round-trip through Parquet."""
+    idl = Idl.from_json(Path("tests/idls/basic_1.json").read_text())
+    raw_acc_data = b"\xf6\x1c\x06W\xfb-2*\xd2\x04\x00\x00\x00\x00\x00\x00"
+    sink = BytesIO()
+    n_rows = arrow.write_parquet(
+        sink, idl, "MyAccount", [raw_acc_data] * 3, public_key_column=None
+    )
+    assert n_rows == 3
+    table = pq.read_table(BytesIO(sink.getvalue()))
+    assert table.to_pydict() == {"data": [1234, 1234, 1234]}
+
+
+class _Probe(Container):
+    """A decoded account that records whether the garbage collector is on."""
+
+    def __init__(self, gc_states: List[bool]) -> None:
+        super().__init__(gc_states=gc_states)
+
+    @property
+    def data(self) -> int:
+        self.gc_states.append(gc.isenabled())
+        return 1
+
+
+@mark.unit
+def test_record_batches_pause_gc() -> None:
+    """Test the garbage collector is only paused when asked to."""
+    idl = Idl.from_json(Path("tests/idls/basic_1.json").read_text())
+    gc_states: List[bool] = []
+    accounts = [ProgramAccount(Pubkey.new_unique(), _Probe(gc_states))]
+    list(arrow.to_record_batches(idl, "MyAccount", accounts))
+    list(arrow.to_record_batches(idl, "MyAccount", accounts, pause_gc=True))
+    assert gc_states == [True, False]
+    assert gc.isenabled()
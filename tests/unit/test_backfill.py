@@ -0,0 +1,300 @@
+import asyncio
+import json
+from base64 import b64encode
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+from anchorpy import BackfillCheckpoint, EventBackfill, Program
+from anchorpy.coder.event import _event_discriminator
+from anchorpy.error import BackfillCheckpointError
+from pytest import mark, raises
+from solana.rpc.async_api import AsyncClient
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+
+from tests.rpc_stand_in import PROGRAM_ID, jet_auth_program, mock_client, rpc_result
+
+
+class _Tx(NamedTuple):
+    signature: Signature
+    slot: int
+    failed: bool
+    users: List[Pubkey]
+
+
+def _logs(users: List[Pubkey]) -> List[str]:
+    disc = _event_discriminator("Authenticated")
+    return [
+        f"Program {PROGRAM_ID} invoke [1]",
+        *[f"Program data: {b64encode(disc + bytes(u)).decode()}" for u in users],
+        f"Program {PROGRAM_ID} success",
+    ]
+
+
+class _Node:
+    """Stands in for an RPC node serving the history of one program."""
+
+    def __init__(self, txs: List[_Tx]) -> None:
+        self.txs = txs  # oldest first
+        self.fetched: List[Signature] = []
+        # how many more times to answer null for these transactions
+        self.unavailable: Dict[Signature, int] = {}
+        # the `before` of each getSignaturesForAddress request
+        self.signature_requests: List[Optional[str]] = []
+        # fail the getSignaturesForAddress requests after this many
+        self.max_signature_requests: Optional[int] = None
+        # how many more getTransaction batches to answer with a 429
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def client(self) -> AsyncClient:
+        return mock_client(self._handle)
+
+    async def _handle(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        if isinstance(body, dict):
+            return httpx.Response(200, json=self._signatures(body))
+        if not body:
+            # what real nodes answer to an empty batch
+            error = {"code": -32600, "message": "empty batch"}
+            return httpx.Response(200, json={"jsonrpc": "2.0", "error": error})
+        if self.rate_limited > 0:
+            self.rate_limited -= 1
+            return httpx.Response(429, headers={"retry-after": "0.01"})
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return httpx.Response(200, json=[self._transaction(req) for req in body])
+
+    def _signatures(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        assert req["method"] == "getSignaturesForAddress"
+        config = req["params"][1]
+        if len(self.signature_requests) == self.max_signature_requests:
+            raise RuntimeError("node down")
+        self.signature_requests.append(config["before"])
+        newest_first = self.txs[::-1]
+        sigs = [str(tx.signature) for tx in newest_first]
+        before, until = config["before"], config["until"]
+        start = 0 if before is None else sigs.index(before) + 1
+        end = len(sigs) if until is None else sigs.index(until)
+        page = newest_first[start:end][: config["limit"]]
+        result = [
+            {
+                "signature": str(tx.signature),
+                "slot": tx.slot,
+                "err": "AccountInUse" if tx.failed else None,
+                "memo": None,
+                "blockTime": None,
+            }
+            for tx in page
+        ]
+        return rpc_result(req, result)
+
+    def _transaction(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        assert req["method"] == "getTransaction"
+        signature = Signature.from_string(req["params"][0])
+        self.fetched.append(signature)
+        if self.unavailable.get(signature, 0) > 0:
+            self.unavailable[signature] -= 1
+            return rpc_result(req, None)
+        tx = next(tx for tx in self.txs if tx.signature == signature)
+        meta: Dict[str, Any] = {
+            "err": None,
+            "status": {"Ok": None},
+            "fee": 5000,
+            "preBalances": [],
+            "postBalances": [],
+            "logMessages": _logs(tx.users),
+        }
+        result = {"slot": tx.slot, "transaction": ["", "base64"], "meta": meta}
+        return rpc_result(req, result)
+
+
+def _history(n_txs: int) -> List[_Tx]:
+    return [
+        _Tx(
+            Signature.new_unique(),
+            slot=10 + idx // 3,
+            failed=idx % 7 == 6,
+            users=[Pubkey.new_unique() for _ in range(idx % 3)],
+        )
+        for idx in range(n_txs)
+    ]
+
+
+def _program(connection: AsyncClient) -> Program:
+    return jet_auth_program(connection)
+
+
+def _expected(txs: List[_Tx], after: Optional[Signature] = None) -> List[Pubkey]:
+    if after is not None:
+        txs = txs[[tx.signature for tx in txs].index(after) + 1 :]
+    return [user for tx in txs if not tx.failed for user in tx.users]
+
+
+@mark.asyncio
+async def test_backfill_events() -> None:
+    txs = _history(100)
+    node = _Node(txs)
+    program = _program(node.client())
+    backfill = program.backfill_events(batch_size=7, max_concurrency=3)
+    backfill.page_size = 30
+    items = [item async for item in backfill]
+    assert [item.event.data.user for item in items] == _expected(txs)
+    assert [item.slot for item in items] == sorted(item.slot for item in items)
+    assert all(item.event.name == "Authenticated" for item in items)
+    first_tx = next(tx for tx in txs if tx.users and not tx.failed)
+    assert (items[0].signature, items[0].slot) == (first_tx.signature, first_tx.slot)
+    # failed transactions aren't fetched
+    assert sorted(map(str, node.fetched)) == sorted(
+        str(tx.signature) for tx in txs if not tx.failed
+    )
+    assert 1 < node.max_in_flight <= 3
+    assert backfill.checkpoint == BackfillCheckpoint(txs[-1].signature, txs[-1].slot)
+    # only newer transactions are returned afterwards
+    newer = _history(5)
+    node.txs.extend(newer)
+    assert [item.event.data.user async for item in backfill] == _expected(newer)
+    with raises(ValueError, match="at least 1"):
+        program.backfill_events(batch_size=0)
+
+
+@mark.asyncio
+async def test_backfill_events_resume(tmp_path: Path) -> None:
+    txs = _history(60)
+    checkpoint_path = tmp_path / "checkpoint.json"
+    program = _program(_Node(txs).client())
+    seen: List[Pubkey] = []
+    with raises(RuntimeError, match="crash"):
+        async for item in program.backfill_events(
+            checkpoint_path=checkpoint_path, batch_size=5
+        ):
+            seen.append(item.event.data.user)
+            if len(seen) == 20:
+                raise RuntimeError("crash")
+    raw = json.loads(checkpoint_path.read_text())
+    checkpoint = Signature.from_string(raw["signature"])
+    checkpoint_idx = [tx.signature for tx in txs].index(checkpoint)
+    assert raw["slot"] == txs[checkpoint_idx].slot
+    # the events up to the checkpoint were all read
+    before_checkpoint = _expected(txs[: checkpoint_idx + 1])
+    assert 0 < len(before_checkpoint) <= 20
+    assert seen[: len(before_checkpoint)] == before_checkpoint
+    node = _Node(txs)
+    resumed = [
+        item.event.data.user
+        async for item in _program(node.client()).backfill_events(
+            checkpoint_path=checkpoint_path, batch_size=5
+        )
+    ]
+    assert resumed == _expected(txs, after=checkpoint)
+    assert before_checkpoint + resumed == _expected(txs)
+    assert txs[-1].signature == Signature.from_string(
+        json.loads(checkpoint_path.read_text())["signature"]
+    )
+
+
+@mark.asyncio
+async def test_backfill_events_missing_transactions() -> None:
+    txs = [
+        tx._replace(failed=False, users=[Pubkey.new_unique()]) for tx in _history(20)
+    ]
+    node = _Node(txs)
+    # not indexed yet, then found on the second retry
+    node.unavailable[txs[3].signature] = 2
+    # pruned
+    node.unavailable[txs[10].signature] = 100
+    program = _program(node.client())
+    backfill = program.backfill_events(batch_size=5, max_retries=2)
+    items = [item async for item in backfill]
+    assert [item.signature for item in items] == [
+        tx.signature for idx, tx in enumerate(txs) if idx != 10
+    ]
+    assert backfill.skipped == [txs[10].signature]
+    assert node.fetched.count(txs[10].signature) == 3
+    assert backfill.checkpoint == BackfillCheckpoint(txs[-1].signature, txs[-1].slot)
+
+
+@mark.asyncio
+async def test_backfill_events_failed_batch() -> None:
+    txs = _history(15)
+    # the second batch only has failed transactions
+    txs[5:10] = [tx._replace(failed=True) for tx in txs[5:10]]
+    node = _Node(txs)
+    program = _program(node.client())
+    items = [item async for item in program.backfill_events(batch_size=5)]
+    assert [item.event.data.user for item in items] == _expected(txs)
+    assert len(node.fetched) == len([tx for tx in txs if not tx.failed])
+
+
+@mark.asyncio
+async def test_backfill_events_rate_limited() -> None:
+    txs = _history(20)
+    node = _Node(txs)
+    node.rate_limited = 3
+    program = _program(node.client())
+    backfill = program.backfill_events(batch_size=5, max_retries=3)
+    items = [item async for item in backfill]
+    assert [item.event.data.user for item in items] == _expected(txs)
+    assert node.rate_limited == 0 and backfill.skipped == []
+    # the request fails once the retries run out
+    node.rate_limited = 2
+    with raises(httpx.HTTPStatusError):
+        [item async for item in program.backfill_events(max_retries=1)]
+
+
+def test_backfill_events_corrupt_checkpoint(tmp_path: Path) -> None:
+    checkpoint_path = tmp_path / "checkpoint.json"
+    program = _program(_Node([]).client())
+    for corrupt in ["", '{"signature": "1', '{"slot": 3}']:
+        checkpoint_path.write_text(corrupt)
+        with raises(BackfillCheckpointError, match=str(checkpoint_path)):
+            program.backfill_events(checkpoint_path=checkpoint_path)
+
+
+@mark.asyncio
+async def test_backfill_events_windows(tmp_path: Path) -> None:
+    txs = _history(100)
+    checkpoint_path = tmp_path / "checkpoint.json"
+    node = _Node(txs)
+    program = _program(node.client())
+
+    def backfill() -> EventBackfill:
+        backfill = program.backfill_events(checkpoint_path=checkpoint_path)
+        backfill.page_size = 7
+        backfill.window_size = 10
+        return backfill
+
+    # the node fails while the windows are being found
+    node.max_signature_requests = 5
+    with raises(RuntimeError, match="node down"):
+        [item async for item in backfill()]
+    raw = json.loads(checkpoint_path.read_text())
+    assert raw["signature"] is None and not raw["walked"]
+    # every 10th of the 5 * 7 newest transactions
+    newest_first = txs[::-1]
+    assert raw["windows"] == [
+        [str(tx.signature), tx.slot, tx.failed] for tx in newest_first[30::-10]
+    ]
+    assert node.fetched == []
+    # the backfill resumes from the oldest window found
+    node.max_signature_requests = None
+    node.signature_requests.clear()
+    resumed = backfill()
+    items: List[Pubkey] = []
+    async for item in resumed:
+        if not items:
+            raw = json.loads(checkpoint_path.read_text())
+            # 4 windows found before the failure, 7 after
+            assert raw["walked"] and len(raw["windows"]) == 11
+            # the windows are paged as they are read
+            n_signature_requests = len(node.signature_requests)
+        items.append(item.event.data.user)
+    assert items == _expected(txs)
+    assert node.signature_requests[0] == str(newest_first[30].signature)
+    assert len(node.signature_requests) > n_signature_requests
+    raw = json.loads(checkpoint_path.read_text())
+    assert (raw["signature"], raw["windows"]) == (str(txs[-1].signature), [])
@@ -0,0 +1,77 @@
+from dataclasses import asdict, astuple, fields, make_dataclass, replace
+from inspect import signature
+from pathlib import Path
+from typing import List
+
+from anchorpy import CodeCache, Coder, Idl
+from anchorpy.coder.datacls import _make_datacls
+from pytest import mark, raises
+
+_SOURCE = "def double(x):\n    return 2 * x\n"
+
+
+def _run(code) -> int:
+    namespace: dict = {}
+    exec(code, namespace)
+    return namespace["double"](21)
+
+
+@mark.unit
+def test_code_cache_round_trip(tmp_path: Path) -> None:
+    cache = CodeCache(tmp_path / "cache")
+    assert _run(cache.compile(_SOURCE, "<test>")) == 42
+    (entry,) = (tmp_path / "cache").iterdir()
+    assert _run(cache.compile(_SOURCE, "<test>")) == 42
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+    # a corrupt entry is recompiled and replaced
+    entry.write_bytes(b"not marshal data")
+    assert _run(cache.compile(_SOURCE, "<test>")) == 42
+    assert entry.read_bytes() != b"not marshal data"
+    cache.compile(_SOURCE.replace("2 *", "3 *"), "<test>")
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+
+@mark.unit
+def test_make_datacls_matches_make_dataclass() -> None:
+    all_names: List[List[str]] = [["a", "b_"], [], ["self", "x"]]
+    for names in all_names:
+        ours = _make_datacls("Thing", names)
+        stdlib = make_dataclass("Thing", names)
+        args = range(len(names))
+        assert repr(ours(*args)) == repr(stdlib(*args))
+        assert ours(*args) == ours(*args)
+        assert ours(*args) != stdlib(*args)
+        if names:
+            assert ours(*args) != ours(*reversed(args))
+        assert asdict(ours(*args)) == asdict(stdlib(*args))
+        assert astuple(ours(*args)) == astuple(stdlib(*args))
+        changes = {names[-1]: 7} if names else {}
+        assert repr(replace(ours(*args), **changes)) == repr(
+            replace(stdlib(*args), **changes)
+        )
+        assert getattr(ours, "__match_args__", None) == getattr(
+            stdlib, "__match_args__", None
+        )
+        assert ours.__doc__ == stdlib.__doc__
+        assert ours.__hash__ is None and stdlib.__hash__ is None
+        with raises(TypeError):
+            hash(ours(*args))
+        assert str(signature(ours)) == str(signature(stdlib))
+        assert [(f.name, f.type, f.init, f.repr, f.compare) for f in fields(ours)] == [
+            (f.name, f.type, f.init, f.repr, f.compare) for f in fields(stdlib)
+        ]
+        # only the methods dataclasses generated itself are recorded as such
+        params = ours.__dataclass_params__  # type: ignore
+        assert (params.init, params.repr, params.eq) == (False, False, False)
+    with raises(TypeError):
+        _make_datacls("Thing", ["a", "a"])
+
+
+@mark.unit
+def test_coder_fills_code_cache(tmp_path: Path) -> None:
+    idl = Idl.from_json(Path("tests/idls/jet.json").read_text())
+    Coder(idl, compiled=True, code_cache=CodeCache(tmp_path))
+    entries = set(tmp_path.iterdir())
+    assert entries
+    Coder(idl, compiled=True, code_cache=CodeCache(tmp_path))
+    assert set(tmp_path.iterdir()) == entries
@@ -0,0 +1,105 @@
+import random
+from pathlib import Path
+
+from anchorpy import Coder, Idl
+from anchorpy.coder.accounts import ACCOUNT_DISCRIMINATOR_SIZE
+from anchorpy.coder.common import _account_size
+from anchorpy.coder.compiled import _compile_typedef
+from pytest import mark, raises
+
+from tests.samples import sample_typedef_bytes
+
+_MAX_SAMPLE_SIZE = 10_000
+
+
+def _decode_or_error(decode, *args):
+    try:
+        return decode(*args)
+    except Exception as e:  # noqa: BLE001
+        return type(e)
+
+
+def _is_small(idl, typedef) -> bool:
+    try:
+        return _account_size(idl, typedef) <= _MAX_SAMPLE_SIZE
+    except ValueError:
+        return False
+
+
+def _idls():
+    for path in sorted(Path("tests/idls/").iterdir()):
+        if "spl_token" not in str(path):
+            yield Idl.from_json(path.read_text())
+
+
+@mark.unit
+def test_compiled_fixed_accounts_match_construct() -> None:
+    """Test compiled fixed-size account decoding returns the same objects."""
+    rng = random.Random(0)
+    compiled_count = 0
+    for idl in _idls():
+        coder = Coder(idl)
+        compiled_coder = Coder(idl, compiled=True)
+        for acc in idl.accounts:
+            size = _account_size(idl, acc)
+            if _compile_typedef(acc, idl.types) is None or size > _MAX_SAMPLE_SIZE:
+                continue
+            compiled_count += 1
+            disc = coder.accounts.acc_name_to_discriminator[acc.name]
+            samples = [bytes(size)] + [rng.randbytes(size) for _ in range(5)]
+            for sample in samples:
+                data = disc + sample
+                expected = _decode_or_error(coder.accounts.decode, data)
+                actual = _decode_or_error(compiled_coder.accounts.decode, data)
+                assert actual == expected
+                assert type(actual) is type(expected)
+    assert compiled_count > 10
+
+
+@mark.unit
+def test_compiled_accounts_and_types_match_construct() -> None:
+    """Test generated decoders return the same objects for every IDL type."""
+    rng = random.Random(1)
+    for idl in _idls():
+        coder = Coder(idl)
+        compiled_coder = Coder(idl, compiled=True)
+        decoders = compiled_coder.decoders
+        assert decoders is not None
+        for acc in idl.accounts:
+            if not _is_small(idl, acc):
+                continue
+            assert decoders.account(acc.name) is not None, acc.name
+            disc = coder.accounts.acc_name_to_discriminator[acc.name]
+            for _ in range(5):
+                data = disc + sample_typedef_bytes(acc, idl.types, rng)
+                expected = coder.accounts.decode(data)
+                assert compiled_coder.accounts.decode(data) == expected
+        for typedef in coder.types.filtered_types:
+            if not _is_small(idl, typedef):
+                continue
+            assert decoders.type(typedef.name) is not None, typedef.name
+            for _ in range(5):
+                data = sample_typedef_bytes(typedef, idl.types, rng)
+                expected = _decode_or_error(coder.types.decode, typedef.name, data)
+                actual = _decode_or_error(
+                    compiled_coder.types.decode, typedef.name, data
+                )
+                assert actual == expected
+                assert type(actual) is type(expected)
+
+
+@mark.unit
+def test_compiled_falls_back_to_construct() -> None:
+    """Test malformed data raises the usual construct errors."""
+    idl = Idl.from_json(Path("tests/idls/basic_1.json").read_text())
+    coder = Coder(idl, compiled=True)
+    raw_acc_data = b"\xf6\x1c\x06W\xfb-2*\xd2\x04\x00\x00\x00\x00\x00\x00"
+    assert coder.accounts.decode(raw_acc_data).data == 1234
+    with raises(Exception, match="stream read less than specified amount"):
+        coder.accounts.decode(raw_acc_data[: ACCOUNT_DISCRIMINATOR_SIZE + 4])
+    chat_idl = Idl.from_json(Path("tests/idls/chat.json").read_text())
+    chat_coder = Coder(chat_idl, compiled=True)
+    user_disc = chat_coder.accounts.acc_name_to_discriminator["User"]
+    truncated_name = b"\x05\x00\x00\x00ab"
+    with raises(Exception, match="stream read less than specified amount"):
+        chat_coder.accounts.decode(user_disc + truncated_name)
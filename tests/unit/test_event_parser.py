@@ -1,6 +1,8 @@
+from base64 import b64decode, b64encode
 from pathlib import Path
 
-from anchorpy import Event, EventParser, Idl, Program
+from anchorpy import Event, EventParser, Idl, MultiProgramEventParser, Program
+from anchorpy.coder.event import _event_discriminator
 from solders.pubkey import Pubkey
 
 
@@ -30,3 +32,106 @@ def test_event_parser() -> None:
     )
     expected_event = Event(name="MyEvent", data=expected_data)
     assert evts[0] == expected_event
+    data = b64decode(logs[2][len("Program data: ") :])
+    assert events_coder.decode(data) == events_coder.parse(data) == expected_event
+    assert events_coder.decode(bytes(16)) is None
+
+
+def test_iter_events() -> None:
+    idl = Idl.from_json(Path("tests/idls/events.json").read_text())
+    program_id = Pubkey.from_string("2dhGsWUzy5YKUsjZdLHLmkNpUDAXkNa9MYWsPc4Ziqzy")
+    program = Program(idl, program_id)
+    other = "11111111111111111111111111111111"
+    event_log = "Program data: YLjF84sCWpQFAAAAAAAAAAUAAABoZWxsbw=="
+    n_events = 20_000
+    logs = [
+        f"Program {program_id} invoke [1]",
+        *[event_log] * n_events,
+        # logs of another program are skipped
+        f"Program {other} invoke [2]",
+        event_log,
+        f"Program {other} success",
+        event_log,
+        f"Program {program_id} success",
+    ]
+    parser = EventParser(program.program_id, program.coder)
+    events = parser.iter_events(logs)
+    first = next(events)
+    assert first.name == "MyEvent"
+    assert sum(1 for _ in events) == n_events
+    callback_events: list = []
+    parser.parse_logs(logs, callback_events.append)
+    assert callback_events == list(parser.iter_events(logs))
+    assert list(parser.iter_events([])) == []
+
+
+def test_multi_program_event_parser() -> None:
+    idl = Idl.from_json(Path("tests/idls/events.json").read_text())
+    coder = Program(idl, Pubkey.default()).coder
+    caller, callee, unknown = (Pubkey.new_unique() for _ in range(3))
+    event_log = "Program data: YLjF84sCWpQFAAAAAAAAAAUAAABoZWxsbw=="
+    logs = [
+        f"Program {caller} invoke [1]",
+        "Program log: Instruction: Initialize",
+        event_log,
+        f"Program {callee} invoke [2]",
+        event_log,
+        f"Program {unknown} invoke [3]",
+        event_log,
+        f"Program {unknown} failed: custom program error: 0x1",
+        event_log,
+        f"Program {callee} consumed 1019 of 1400000 compute units",
+        f"Program {callee} success",
+        event_log,
+        f"Program {caller} success",
+        f"Program {callee} invoke [1]",
+        event_log,
+        f"Program {callee} success",
+    ]
+    parser = MultiProgramEventParser([(caller, coder), (callee, coder)])
+    found = list(parser.iter_events(logs))
+    assert [program_id for program_id, _ in found] == [
+        caller,
+        callee,
+        callee,
+        caller,
+        callee,
+    ]
+    assert all(event.name == "MyEvent" for _, event in found)
+    callback_found: list = []
+    parser.parse_logs(logs, lambda *args: callback_found.append(args))
+    assert callback_found == found
+
+
+def test_event_b64_prefilter() -> None:
+    idl = Idl.from_json(Path("tests/idls/jet_auth.json").read_text())
+    program_id = Pubkey.new_unique()
+    events_coder = Program(idl, program_id).coder.events
+    user = Pubkey.new_unique()
+    created = b64encode(_event_discriminator("AuthAccountCreated") + bytes(user))
+    authenticated = b64encode(_event_discriminator("Authenticated") + bytes(user))
+    # the prefix only depends on the discriminator
+    for data in (bytes(32), b"\xff" * 32):
+        encoded = b64encode(_event_discriminator("Authenticated") + data).decode()
+        assert events_coder.b64_prefixes[encoded[:10]] == "Authenticated"
+    event = events_coder.decode_b64(created.decode())
+    assert event is not None
+    assert (event.name, event.data.user) == ("AuthAccountCreated", user)
+    assert events_coder.decode_b64("Instruction: Authenticate") is None
+    assert events_coder.decode_b64(b64encode(bytes(40)).decode()) is None
+    # matches the prefix but isn't valid base64
+    assert events_coder.decode_b64(created.decode()[:10] + "=") is None
+    logs = [
+        f"Program {program_id} invoke [1]",
+        "Program log: Instruction: Authenticate",
+        f"Program log: {created.decode()}",
+        f"Program data: {authenticated.decode()}",
+        f"Program {program_id} success",
+    ]
+    parser = EventParser(program_id, Program(idl, program_id).coder)
+    assert [evt.name for evt in parser.iter_events(logs)] == [
+        "AuthAccountCreated",
+        "Authenticated",
+    ]
+    parser = EventParser(program_id, parser.coder, ["Authenticated"])
+    assert [evt.name for evt in parser.iter_events(logs)] == ["Authenticated"]
@@ -1,6 +1,10 @@
 from pathlib import Path
 
-from anchorpy import Idl, Program
+from anchorpy import Coder, Idl, Program
+from anchorpy.utils.rpc import _MultipleAccountsItem
+from based58 import b58encode
+from pytest import raises, warns
+from solders.account import Account
 from solders.pubkey import Pubkey
 
 
@@ -37,3 +41,84 @@ def test_clientgen_example() -> None:
     path = Path("tests/idls/clientgen_example_program.json")
     raw = path.read_text()
     Idl.from_json(raw)
+
+
+def test_coders_share_type_index() -> None:
+    idl = Idl.from_json(Path("tests/idls/switchboard.json").read_text())
+    coder = Coder(idl)
+    types = coder.types._types
+    assert coder.accounts._types is types
+    assert [t.name for t in types] == [t.name for t in idl.types]
+    typedef = types.find("AggregatorInitParams")
+    assert typedef is not None and typedef.name == "AggregatorInitParams"
+    assert types.find("NotAType") is None
+    # layouts built for the accounts are reused by the types coder
+    assert types.layouts
+    name = next(iter(types.layouts))
+    assert coder.types._get_layout(name) is types.layouts[name]
+
+
+def test_program_namespaces_are_lazy() -> None:
+    idl = Idl.from_json(Path("tests/idls/switchboard.json").read_text())
+    program = Program(idl, Pubkey.default())
+    ix_name = "aggregator_init"
+    assert len(program.rpc) == len(idl.instructions)
+    assert ix_name in program.methods
+    assert program.instruction._built == {}
+    assert program.account._built == {}
+    assert program.type._built == {}
+    rpc = program.rpc[ix_name]
+    assert program.rpc[ix_name] is rpc
+    # entries are shared between namespaces, like when they were built eagerly
+    assert program.methods[ix_name]._idl_funcs.rpc_fn is rpc
+    assert set(program.instruction._built) == {ix_name}
+    assert list(program.account) == [acc.name for acc in idl.accounts]
+    assert "AggregatorInitParams" in program.type
+    with raises(KeyError):
+        program.rpc["not_an_instruction"]
+    program.rpc["custom"] = rpc
+    assert program.rpc["custom"] is rpc
+    del program.rpc["custom"]
+    assert "custom" not in program.rpc
+
+
+def test_account_where_filters() -> None:
+    idl = Idl.from_json(Path("tests/idls/chat.json").read_text())
+    client = Program(idl, Pubkey.default()).account["User"]
+    authority = Pubkey.new_unique()
+    memcmp_filters, client_side = client._where_filters({"name": "alice"})
+    (memcmp,) = memcmp_filters
+    assert memcmp.offset == 8
+    assert memcmp.bytes == b58encode(b"\x05\x00\x00\x00alice").decode()
+    assert client_side == {}
+    # authority follows the variable-size name
+    with warns(UserWarning, match="authority"):
+        memcmp_filters, client_side = client._where_filters({"authority": authority})
+    assert memcmp_filters == []
+    assert client_side == {"authority": authority}
+    accounts_coder = client.coder.accounts
+    data = (
+        accounts_coder.acc_name_to_discriminator["User"]
+        + accounts_coder.encode_field("User", "name", "alice")
+        + accounts_coder.encode_field("User", "authority", authority)
+    )
+    assert client._matches(data, client_side)
+    assert not client._matches(data, {"authority": Pubkey.default()})
+    with raises(ValueError, match="no fields"):
+        client._where_filters({"nope": 1})
+
+
+def test_account_client_decode_multiple() -> None:
+    idl = Idl.from_json(Path("tests/idls/basic_1.json").read_text())
+    client = Program(idl, Pubkey.default()).account["MyAccount"]
+    raw = b"\xf6\x1c\x06W\xfb-2*\xd2\x04\x00\x00\x00\x00\x00\x00"
+    assert client._discriminator == raw[:8]
+    items = [
+        _MultipleAccountsItem(Pubkey.default(), Account(1, data, Pubkey.default()))
+        for data in (raw, bytes(16))
+    ]
+    decoded = client._decode_multiple([items[0], None, items[1]], None)
+    assert decoded == [client.coder.accounts.decode(raw), None, None]
+    (projected,) = client._decode_multiple(items[:1], ["data"])
+    assert projected is not None
+    assert dict(projected) == {"data": 1234}
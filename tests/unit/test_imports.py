@@ -0,0 +1,66 @@
+import subprocess
+import sys
+
+import anchorpy
+from pytest import MonkeyPatch, mark, raises
+
+_CHECK_DEFERRED = """
+import sys
+import anchorpy
+deferred = ["anchorpy.program.core", "anchorpy.pytest_plugin", "spl", "pytest"]
+print(",".join(name for name in deferred if name in sys.modules))
+"""
+
+
+@mark.unit
+def test_import_defers_submodules() -> None:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHECK_DEFERRED],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert out.stdout.strip() == ""
+
+
+@mark.unit
+def test_lazy_attributes() -> None:
+    from anchorpy.program.core import Program
+    from anchorpy.utils import token
+
+    assert anchorpy.Program is Program
+    assert anchorpy.utils.token is token
+    assert set(anchorpy.__all__) <= set(dir(anchorpy))
+    for name in anchorpy.__all__:
+        assert getattr(anchorpy, name) is not None
+    with raises(AttributeError):
+        anchorpy.not_a_name
+    with raises(AttributeError):
+        anchorpy.utils.not_a_module
+
+
+_HIDE_XPROCESS = """
+import sys
+sys.modules["xprocess"] = None  # as if it wasn't installed
+import anchorpy
+from anchorpy import *
+print(hasattr(anchorpy, "localnet_fixture"), "localnet_fixture" in dir(anchorpy))
+"""
+
+
+@mark.unit
+def test_fixtures_need_the_pytest_extra() -> None:
+    out = subprocess.run(
+        [sys.executable, "-c", _HIDE_XPROCESS],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert out.stdout.strip() == "False False"
+
+
+@mark.unit
+def test_fixture_import_error_is_attribute_error(monkeypatch: MonkeyPatch) -> None:
+    monkeypatch.delitem(vars(anchorpy), "localnet_fixture", raising=False)
+    monkeypatch.setitem(sys.modules, "anchorpy.pytest_plugin", None)
+    assert not hasattr(anchorpy, "localnet_fixture")
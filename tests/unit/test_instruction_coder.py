@@ -19,3 +19,4 @@ def test_instruction_coder() -> None:
     encoded = coder.build(ix)
     assert encoded == b"\xaf\xafm\x1f\r\x98\x9b\xed\xd2\x04\x00\x00\x00\x00\x00\x00"
     assert coder.parse(encoded) == ix
+    assert coder.decode(encoded) == ix
@@ -0,0 +1,112 @@
+import gc
+import json
+import random
+import weakref
+from pathlib import Path
+from typing import cast
+
+from anchorpy import Coder, Idl, LayoutCache, LayoutCacheInfo, Program
+from borsh_construct import Enum
+from pytest import mark, raises
+from solders.pubkey import Pubkey
+
+from tests.samples import sample_typedef_bytes
+
+_JET = Path("tests/idls/jet.json")
+
+
+@mark.unit
+def test_layout_cache_evicts_least_recently_used() -> None:
+    cache = LayoutCache(maxsize=2)
+    assert cache.get("a", lambda: 1) == 1
+    assert cache.get("b", lambda: 2) == 2
+    assert cache.get("a", lambda: 0) == 1
+    assert cache.get("c", lambda: 3) == 3
+    assert cache.get("b", lambda: 4) == 4
+    assert cache.cache_info() == LayoutCacheInfo(
+        hits=1, misses=4, maxsize=2, currsize=2
+    )
+    cache.cache_clear()
+    assert cache.cache_info() == LayoutCacheInfo(0, 0, 2, 0)
+    with raises(ValueError):
+        LayoutCache(maxsize=-1)
+
+
+@mark.unit
+def test_layout_cache_keys_are_structural() -> None:
+    cache = LayoutCache()
+    first = Coder(Idl.from_json(_JET.read_text()), layout_cache=cache)
+    misses = cache.cache_info().misses
+    assert misses
+    # A second parse of the same IDL builds new but equal IDL objects.
+    second = Coder(Idl.from_json(_JET.read_text()), layout_cache=cache)
+    info = cache.cache_info()
+    assert info.misses == misses
+    assert info.hits >= misses
+    name = "CacheInvalidError"
+    first_layout = cast(Enum, first.types._get_layout(name))
+    second_layout = cast(Enum, second.types._get_layout(name))
+    assert first_layout.enum is second_layout.enum
+
+
+@mark.unit
+def test_layout_cache_scoped_to_program() -> None:
+    idl = Idl.from_json(_JET.read_text())
+    shared = Program(idl, Pubkey.default())
+    program = Program(idl, Pubkey.default(), layout_cache=LayoutCache())
+    assert program.coder.layout_cache is not shared.coder.layout_cache
+    name = "CacheInvalidError"
+    assert program.type[name] is not shared.type[name]
+    layout = cast(Enum, program.coder.types._get_layout(name))
+    assert program.type[name] is layout.enum
+    cache_ref = weakref.ref(program.coder.layout_cache)
+    del program
+    gc.collect()
+    assert cache_ref() is None
+
+
+@mark.unit
+def test_evicted_types_stay_pinned_to_coder() -> None:
+    idl = Idl.from_json(_JET.read_text())
+    cache = LayoutCache(maxsize=1)
+    coder = Coder(idl, layout_cache=cache)
+    assert len(cache) == 1
+    acc = idl.accounts[0]
+    data = coder.accounts.acc_name_to_discriminator[acc.name] + sample_typedef_bytes(
+        acc, idl.types, random.Random(0)
+    )
+    cache.cache_clear()
+    # the view is built after its dataclass was evicted, but reuses it
+    assert coder.accounts.view(data).materialize() == coder.accounts.decode(data)
+
+
+def _state_idl(inner_type: str) -> Idl:
+    inner = {"kind": "struct", "fields": [{"name": "a", "type": inner_type}]}
+    variant_fields = [{"name": "inner", "type": {"defined": "Inner"}}]
+    state = {"kind": "enum", "variants": [{"name": "On", "fields": variant_fields}]}
+    raw = {
+        "version": "0.1.0",
+        "name": "p",
+        "instructions": [],
+        "types": [
+            {"name": "Inner", "type": inner},
+            {"name": "State", "type": state},
+        ],
+    }
+    return Idl.from_json(json.dumps(raw))
+
+
+@mark.unit
+def test_layout_cache_keys_include_nested_types() -> None:
+    cache = LayoutCache()
+    small = Coder(_state_idl("u8"), layout_cache=cache)
+    # same type names, different nested field type
+    large = Coder(_state_idl("u64"), layout_cache=cache)
+    assert small.types.decode("State", bytes([0, 7])).inner.a == 7
+    assert large.types.decode("State", bytes([0, 7, 0, 0, 0, 0, 0, 0, 1])).inner.a == (
+        7 + 2**56
+    )
+    # an identical IDL still hits the cache
+    misses = cache.cache_info().misses
+    Coder(_state_idl("u8"), layout_cache=cache)
+    assert cache.cache_info().misses == misses
@@ -0,0 +1,264 @@
+import gzip
+import json
+import threading
+import time
+from asyncio import gather
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from anchorpy import Idl, Program, Provider, Wallet
+from anchorpy.coder.accounts import _account_discriminator
+from anchorpy.error import AccountDoesNotExistError, GetMultipleAccountsError
+from anchorpy.utils.rpc import AccountLoader, get_multiple_accounts
+from pytest import mark, raises
+from solana.rpc.async_api import AsyncClient
+from solders.account_decoder import UiAccountEncoding
+from solders.pubkey import Pubkey
+
+from tests.rpc_stand_in import rpc_error, rpc_result, ui_account
+
+
+class _Node:
+    """Stands in for an RPC node answering batched `getMultipleAccounts`."""
+
+    def __init__(self, accounts: Dict[Pubkey, bytes]) -> None:
+        self.accounts = {str(pubkey): data for pubkey, data in accounts.items()}
+        self.latency = 0.0
+        # answer the next requests with these statuses
+        self.statuses: List[int] = []
+        # always answer requests for these pubkeys with this status
+        self.failing: Dict[str, int] = {}
+        self.rpc_errors: Set[str] = set()
+        self.batch_sizes: List[int] = []
+        self.requested: List[List[str]] = []
+        self.content_encodings: List[Optional[str]] = []
+        self.account_encodings: Set[str] = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def respond(self, body: bytes, content_encoding: Optional[str]) -> Any:
+        if content_encoding == "gzip":
+            body = gzip.decompress(body)
+        reqs = json.loads(body)
+        with self._lock:
+            self.batch_sizes.append(len(reqs))
+            self.content_encodings.append(content_encoding)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.latency)
+        with self._lock:
+            self.in_flight -= 1
+            if self.statuses:
+                return self.statuses.pop(0)
+        for req in reqs:
+            status = self.failing.get(req["params"][0][0])
+            if status is not None:
+                return status
+        return [self._response(req) for req in reqs]
+
+    def _response(self, req: Dict[str, Any]) -> Dict[str, Any]:
+        assert req["method"] == "getMultipleAccounts"
+        pubkeys = req["params"][0]
+        self.requested.append(pubkeys)
+        self.account_encodings.add(req["params"][1]["encoding"])
+        if pubkeys[0] in self.rpc_errors:
+            return rpc_error(req, -32603, "internal")
+        value = [self._account(pubkey) for pubkey in pubkeys]
+        return rpc_result(req, {"context": {"slot": 1}, "value": value})
+
+    def _account(self, pubkey: str) -> Optional[Dict[str, Any]]:
+        data = self.accounts.get(pubkey)
+        return None if data is None else ui_account(data)
+
+
+@contextmanager
+def _serve(node: _Node) -> Iterator[AsyncClient]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self) -> None:
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            response = node.respond(body, self.headers["Content-Encoding"])
+            if isinstance(response, int):
+                self.send_response(response)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            raw = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield AsyncClient(f"http://127.0.0.1:{server.server_address[1]}")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _accounts(n_accounts: int) -> Dict[Pubkey, bytes]:
+    return {Pubkey.new_unique(): bytes([idx % 256]) * 3 for idx in range(n_accounts)}
+
+
+def _data(accounts: List[Any]) -> List[Optional[bytes]]:
+    return [None if acc is None else acc.account.data for acc in accounts]
+
+
+@mark.asyncio
+async def test_get_multiple_accounts() -> None:
+    accounts = _accounts(500)
+    pubkeys = list(accounts)
+    # every third account doesn't exist
+    pubkeys[::3] = [Pubkey.new_unique() for _ in pubkeys[::3]]
+    node = _Node(accounts)
+    node.latency = 0.02
+    with _serve(node) as connection:
+        result = await get_multiple_accounts(
+            connection, pubkeys, batch_size=1, max_concurrency=2, adaptive=False
+        )
+    assert [None if acc is None else acc.pubkey for acc in result] == [
+        pubkey if pubkey in accounts else None for pubkey in pubkeys
+    ]
+    assert _data(result) == [accounts.get(pubkey) for pubkey in pubkeys]
+    assert node.batch_sizes == [1] * 5
+    assert node.max_in_flight == 2
+    assert node.account_encodings == {"base64+zstd"}
+    assert node.content_encodings == [None] * 5
+
+
+@mark.asyncio
+async def test_get_multiple_accounts_gzip() -> None:
+    accounts = _accounts(250)
+    node = _Node(accounts)
+    with _serve(node) as connection:
+        result = await get_multiple_accounts(
+            connection,
+            list(accounts),
+            batch_size=3,
+            adaptive=False,
+            gzip_requests=True,
+            encoding=UiAccountEncoding.Base64,
+        )
+        assert _data(result) == list(accounts.values())
+        # bodies below the threshold are sent as is
+        await get_multiple_accounts(
+            connection, [Pubkey.new_unique()], gzip_requests=True
+        )
+    assert node.content_encodings == ["gzip", None]
+    assert node.account_encodings == {"base64", "base64+zstd"}
+
+
+@mark.asyncio
+async def test_get_multiple_accounts_retries() -> None:
+    accounts = _accounts(300)
+    node = _Node(accounts)
+    node.statuses = [429, 503, 429]
+    with _serve(node) as connection:
+        result = await get_multiple_accounts(
+            connection, list(accounts), batch_size=3, max_concurrency=1
+        )
+    assert _data(result) == list(accounts.values())
+    # failed requests halve the batch size
+    assert node.batch_sizes == [3, 1, 1, 1, 2]
+
+
+@mark.asyncio
+async def test_get_multiple_accounts_adaptive() -> None:
+    accounts = _accounts(1500)
+    node = _Node(accounts)
+    with _serve(node) as connection:
+        await get_multiple_accounts(
+            connection, list(accounts), batch_size=1, max_concurrency=1
+        )
+        assert node.batch_sizes == [1, 2, 3, 4, 5]
+        node.batch_sizes.clear()
+        node.latency = 0.05
+        await get_multiple_accounts(
+            connection,
+            list(accounts),
+            batch_size=5,
+            max_concurrency=1,
+            target_latency=0.01,
+        )
+    assert node.batch_sizes == [5, 4, 3, 2, 1]
+
+
+@mark.asyncio
+async def test_get_multiple_accounts_partial_failure() -> None:
+    accounts = _accounts(400)
+    pubkeys = list(accounts)
+    node = _Node(accounts)
+    node.failing[str(pubkeys[100])] = 500
+    node.failing[str(pubkeys[200])] = 400
+    node.rpc_errors.add(str(pubkeys[300]))
+    with _serve(node) as connection, raises(GetMultipleAccountsError) as exc_info:
+        await get_multiple_accounts(
+            connection,
+            pubkeys,
+            batch_size=1,
+            max_concurrency=1,
+            max_retries=2,
+            adaptive=False,
+        )
+    error = exc_info.value
+    assert error.failed == pubkeys[100:400]
+    assert len(error.errors) == 3
+    assert _data(error.accounts) == list(accounts.values())[:100] + [None] * 300
+    # the 500 is retried, the 400 and the RPC error aren't
+    assert len(node.batch_sizes) == 4 + 2
+
+
+def _account_client(provider: Provider, idl_name: str, name: str) -> Any:
+    idl = Idl.from_json(Path(f"tests/idls/{idl_name}.json").read_text())
+    return Program(idl, Pubkey.new_unique(), provider).account[name]
+
+
+@mark.asyncio
+async def test_account_loader() -> None:
+    auth_disc = _account_discriminator("UserAuthentication")
+    owners = [Pubkey.new_unique() for _ in range(3)]
+    counters = [Pubkey.new_unique() for _ in range(2)]
+    accounts = {owner: auth_disc + bytes(owner) + bytes([1, 1]) for owner in owners}
+    for idx, counter in enumerate(counters):
+        accounts[counter] = _account_discriminator("MyAccount") + bytes([idx] * 8)
+    node = _Node(accounts)
+    with _serve(node) as connection:
+        loader = AccountLoader(connection)
+        provider = Provider(connection, Wallet.dummy(), account_loader=loader)
+        auth_client = _account_client(provider, "jet_auth", "UserAuthentication")
+        counter_client = _account_client(provider, "basic_1", "MyAccount")
+        # concurrent fetches of two programs are deduplicated into one request
+        fetched = await gather(
+            *(auth_client.fetch(owner) for owner in owners + owners),
+            *(counter_client.fetch(counter) for counter in counters),
+        )
+        assert [acc.owner for acc in fetched[:6]] == owners + owners
+        assert [acc.data for acc in fetched[6:]] == [0, 0x0101010101010101]
+        assert node.requested == [[str(pubkey) for pubkey in owners + counters]]
+        with raises(AccountDoesNotExistError):
+            await auth_client.fetch(Pubkey.new_unique())
+        # reads of different data slices are sent separately
+        node.requested.clear()
+        await gather(
+            auth_client.fetch(owners[0]), auth_client.fetch(owners[1], fields=["owner"])
+        )
+        assert sorted(node.requested) == sorted([[str(owners[0])], [str(owners[1])]])
+        # full batches are sent without waiting for the window to end
+        provider.account_loader = AccountLoader(
+            connection, window_ms=10_000, max_batch_size=2
+        )
+        start = time.monotonic()
+        await gather(*(auth_client.fetch(owner) for owner in owners[:2]))
+        assert time.monotonic() - start < 5
+    with raises(ValueError, match="between 1 and 100"):
+        AccountLoader(connection, max_batch_size=101)
@@ -0,0 +1,378 @@
+import asyncio
+import json
+from base64 import b64encode
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from anchorpy import AccountUpdate
+from anchorpy.coder.event import _event_discriminator
+from anchorpy.error import SubscriptionOverflowError
+from anchorpy.program.subscription import _websocket_url
+from pytest import mark, raises
+from solana.rpc.commitment import Confirmed
+from solders.pubkey import Pubkey
+from websockets.asyncio.server import ServerConnection, serve
+from websockets.exceptions import ConnectionClosedOK
+
+from tests.rpc_stand_in import (
+    PROGRAM_ID,
+    auth_account_data,
+    jet_auth_program,
+    ui_account,
+)
+
+_Script = List[List[Dict[str, Any]]]
+
+
+def _event_log(name: str, user: Pubkey) -> str:
+    data = _event_discriminator(name) + bytes(user)
+    return f"Program data: {b64encode(data).decode()}"
+
+
+def _notification(event_logs: List[str], err: Optional[str] = None) -> Dict[str, Any]:
+    logs = [
+        f"Program {PROGRAM_ID} invoke [1]",
+        *event_logs,
+        f"Program {PROGRAM_ID} success",
+    ]
+    return {
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {
+            "result": {
+                "context": {"slot": 5},
+                "value": {"signature": "1" * 64, "err": err, "logs": logs},
+            },
+            "subscription": 1,
+        },
+    }
+
+
+@asynccontextmanager
+async def _server(script: _Script) -> AsyncIterator[Tuple[str, List[Any]]]:
+    """Serve the k-th list of notifications on the k-th connection.
+
+    Every connection but the last is closed after its notifications are sent.
+    The subscriptions of a batch request get the IDs 1, 2, ... in order.
+    Yields the URL and the subscription requests received.
+    """
+    requests: List[Any] = []
+
+    async def handler(ws: ServerConnection) -> None:
+        conn_idx = len(requests)
+        request = json.loads(await ws.recv())
+        requests.append(request)
+        batch = request if isinstance(request, list) else [request]
+        for idx, req in enumerate(batch):
+            result = {"jsonrpc": "2.0", "result": idx + 1, "id": req["id"]}
+            await ws.send(json.dumps(result))
+        for notification in script[conn_idx]:
+            await ws.send(json.dumps(notification))
+        if conn_idx == len(script) - 1:
+            await ws.wait_closed()
+
+    async with serve(handler, "127.0.0.1", 0) as server:
+        port = next(iter(server.sockets)).getsockname()[1]
+        yield f"ws://127.0.0.1:{port}", requests
+
+
+async def _take(events: AsyncIterator[Any], n: int) -> List[Any]:
+    return [await asyncio.wait_for(events.__anext__(), 5) for _ in range(n)]
+
+
+@mark.asyncio
+async def test_subscribe_events() -> None:
+    program = jet_auth_program()
+    users = [Pubkey.new_unique() for _ in range(3)]
+    script = [
+        [
+            _notification([_event_log("AuthAccountCreated", users[0])]),
+            # failed transactions are skipped
+            _notification([_event_log("Authenticated", users[1])], "AccountInUse"),
+            _notification(
+                [
+                    _event_log("Authenticated", users[1]),
+                    _event_log("AuthAccountCreated", users[2]),
+                ]
+            ),
+        ]
+    ]
+    async with _server(script) as (url, requests):
+        async with program.subscribe_events(commitment=Confirmed, ws_url=url) as events:
+            received = await _take(events, 3)
+    assert [(evt.name, evt.data.user) for evt in received] == [
+        ("AuthAccountCreated", users[0]),
+        ("Authenticated", users[1]),
+        ("AuthAccountCreated", users[2]),
+    ]
+    assert requests[0]["method"] == "logsSubscribe"
+    assert requests[0]["params"] == [
+        {"mentions": [str(PROGRAM_ID)]},
+        {"commitment": "confirmed"},
+    ]
+    # iteration ends once closed
+    assert [evt async for evt in events] == []
+
+
+@mark.asyncio
+async def test_subscribe_events_names() -> None:
+    program = jet_auth_program()
+    users = [Pubkey.new_unique() for _ in range(3)]
+    script = [
+        [
+            _notification(
+                [
+                    _event_log("AuthAccountCreated", users[0]),
+                    _event_log("Authenticated", users[1]),
+                    _event_log("AuthAccountCreated", users[2]),
+                ]
+            ),
+        ]
+    ]
+    async with _server(script) as (url, _):
+        async with program.subscribe_events(["Authenticated"], ws_url=url) as events:
+            received = await _take(events, 1)
+            await asyncio.sleep(0.05)
+            assert events._queue.empty()
+    assert [(evt.name, evt.data.user) for evt in received] == [
+        ("Authenticated", users[1])
+    ]
+    with raises(ValueError, match="Unknown events"):
+        program.subscribe_events(["Nope"])
+
+
+@mark.asyncio
+async def test_subscribe_events_skips_bad_logs() -> None:
+    program = jet_auth_program()
+    user = Pubkey.new_unique()
+    truncated = _event_discriminator("Authenticated") + bytes(3)
+    script = [
+        [
+            _notification([f"Program data: {b64encode(truncated).decode()}"]),
+            {"jsonrpc": "2.0", "method": "logsNotification", "params": {}},
+            _notification([_event_log("Authenticated", user)]),
+        ]
+    ]
+    async with _server(script) as (url, _):
+        async with program.subscribe_events(ws_url=url) as events:
+            received = await _take(events, 1)
+            assert events.skipped == 2
+            assert events.last_skipped_error is not None
+    assert received[0].data.user == user
+
+
+@mark.asyncio
+async def test_subscribe_events_reconnect() -> None:
+    program = jet_auth_program()
+    users = [Pubkey.new_unique() for _ in range(2)]
+    script = [
+        [_notification([_event_log("Authenticated", users[0])])],
+        [_notification([_event_log("Authenticated", users[1])])],
+    ]
+    async with _server(script) as (url, requests):
+        async with program.subscribe_events(ws_url=url) as events:
+            received = await _take(events, 2)
+    assert [evt.data.user for evt in received] == users
+    assert [request["method"] for request in requests] == ["logsSubscribe"] * 2
+
+
+@mark.asyncio
+async def test_subscribe_events_no_reconnect() -> None:
+    program = jet_auth_program()
+    script: _Script = [[], []]
+    async with _server(script) as (url, _):
+        async with program.subscribe_events(ws_url=url, reconnect=False) as events:
+            with raises(ConnectionClosedOK):
+                await _take(events, 1)
+
+
+@mark.asyncio
+async def test_subscribe_events_overflow() -> None:
+    program = jet_auth_program()
+    users = [Pubkey.new_unique() for _ in range(3)]
+    # the events of one transaction are queued without yielding to the reader
+    script = [
+        [_notification([_event_log("Authenticated", user) for user in users])],
+    ]
+    async with _server(script) as (url, _):
+        async with program.subscribe_events(
+            ws_url=url, max_queue_size=1, overflow="drop_oldest"
+        ) as events:
+            received = await _take(events, 1)
+            assert events.dropped == 2
+    assert received[0].data.user == users[2]
+
+    async with _server(script) as (url, _):
+        async with program.subscribe_events(
+            ws_url=url, max_queue_size=1, overflow="block"
+        ) as events:
+            received = await _take(events, 3)
+            assert events.dropped == 0
+    assert [evt.data.user for evt in received] == users
+
+    async with _server(script) as (url, _):
+        async with program.subscribe_events(
+            ws_url=url, max_queue_size=1, overflow="error"
+        ) as events:
+            received = await _take(events, 1)
+            with raises(SubscriptionOverflowError):
+                await _take(events, 1)
+    assert received[0].data.user == users[0]
+
+
+def test_subscribe_events_args() -> None:
+    program = jet_auth_program()
+    assert program.subscribe_events().ws_url == "ws://localhost:8900"
+    with raises(ValueError):
+        program.subscribe_events(max_queue_size=0)
+    with raises(ValueError):
+        program.subscribe_events(overflow="drop_newest")  # type: ignore
+    assert _websocket_url("https://api.devnet.solana.com") == (
+        "wss://api.devnet.solana.com"
+    )
+    assert _websocket_url("http://[::1]:8899/rpc") == "ws://[::1]:8900/rpc"
+
+
+def _account_notification(
+    subscription: int, data: bytes, slot: int, lamports: int = 1
+) -> Dict[str, Any]:
+    result = {
+        "context": {"slot": slot},
+        "value": ui_account(data, PROGRAM_ID, lamports),
+    }
+    return {
+        "jsonrpc": "2.0",
+        "method": "accountNotification",
+        "params": {"result": result, "subscription": subscription},
+    }
+
+
+def _program_notification(pubkey: Pubkey, data: bytes, slot: int) -> Dict[str, Any]:
+    value = {"pubkey": str(pubkey), "account": ui_account(data, PROGRAM_ID)}
+    return {
+        "jsonrpc": "2.0",
+        "method": "programNotification",
+        "params": {
+            "result": {"context": {"slot": slot}, "value": value},
+            "subscription": 1,
+        },
+    }
+
+
+@mark.asyncio
+async def test_account_subscribe() -> None:
+    client = jet_auth_program().account["UserAuthentication"]
+    addresses = [Pubkey.new_unique() for _ in range(2)]
+    owners = [Pubkey.new_unique() for _ in range(2)]
+    script = [
+        [
+            _account_notification(1, auth_account_data(owners[0]), 5),
+            _account_notification(2, auth_account_data(owners[1]), 5),
+            # unchanged data is skipped
+            _account_notification(1, auth_account_data(owners[0]), 6, lamports=2),
+            # so are accounts of other types
+            _account_notification(2, bytes(8), 6),
+            _account_notification(1, auth_account_data(owners[0], complete=True), 7),
+        ],
+        [
+            _account_notification(1, auth_account_data(owners[0], complete=True), 8),
+            _account_notification(2, auth_account_data(owners[1], complete=True), 8),
+        ],
+    ]
+    async with _server(script) as (url, requests):
+        subscription = client.subscribe(addresses, commitment=Confirmed, ws_url=url)
+        async with subscription as updates:
+            received = await _take(updates, 4)
+            await asyncio.sleep(0.05)
+            assert updates._queue.empty()
+    assert [(upd.public_key, upd.slot) for upd in received] == [
+        (addresses[0], 5),
+        (addresses[1], 5),
+        (addresses[0], 7),
+        (addresses[1], 8),
+    ]
+    assert all(isinstance(upd, AccountUpdate) for upd in received)
+    assert [upd.account.owner for upd in received] == owners + owners
+    assert [upd.account.complete for upd in received] == [False, False, True, True]
+    # one batch of subscriptions on each connection
+    assert len(requests) == 2
+    assert [req["method"] for req in requests[0]] == ["accountSubscribe"] * 2
+    for idx, req in enumerate(requests[0]):
+        assert req["params"][0] == str(addresses[idx])
+        config = req["params"][1]
+        assert (config["encoding"], config["commitment"]) == (
+            "base64+zstd",
+            "confirmed",
+        )
+
+
+@mark.asyncio
+async def test_account_subscribe_all() -> None:
+    client = jet_auth_program().account["UserAuthentication"]
+    addresses = [Pubkey.new_unique() for _ in range(2)]
+    owner = Pubkey.new_unique()
+    script = [
+        [
+            _program_notification(addresses[0], auth_account_data(owner), 5),
+            _program_notification(addresses[1], auth_account_data(owner), 5),
+            _program_notification(addresses[0], auth_account_data(owner), 6),
+            _program_notification(
+                addresses[0], auth_account_data(owner, complete=True), 7
+            ),
+        ]
+    ]
+    async with _server(script) as (url, requests):
+        subscription = client.subscribe_all([1000], ws_url=url)
+        async with subscription as updates:
+            received = await _take(updates, 3)
+    assert [(upd.public_key, upd.slot) for upd in received] == [
+        (addresses[0], 5),
+        (addresses[1], 5),
+        (addresses[0], 7),
+    ]
+    assert requests[0]["method"] == "programSubscribe"
+    program_id, config = requests[0]["params"]
+    assert program_id == str(PROGRAM_ID)
+    assert config["encoding"] == "base64+zstd"
+    memcmp, data_size = config["filters"]
+    assert memcmp["memcmp"]["bytes"] == client._discriminator_b58
+    assert data_size == {"dataSize": 1000}
+    assert len(subscription._last_data) == 2
+    assert all(len(digest) == 16 for digest in subscription._last_data.values())
+    single = client.subscribe(addresses[0])
+    assert single.addresses == [addresses[0]]
+    assert single.ws_url == "ws://localhost:8900"
+
+
+@mark.asyncio
+async def test_account_subscribe_all_max_tracked_accounts() -> None:
+    client = jet_auth_program().account["UserAuthentication"]
+    addresses = [Pubkey.new_unique() for _ in range(3)]
+    owner = Pubkey.new_unique()
+    script = [
+        [
+            _program_notification(addresses[0], auth_account_data(owner), 5),
+            _program_notification(addresses[1], auth_account_data(owner), 5),
+            # addresses[1] is now the least recently updated
+            _program_notification(addresses[0], auth_account_data(owner), 6),
+            _program_notification(addresses[2], auth_account_data(owner), 6),
+            # so it was forgotten and its unchanged data is returned again
+            _program_notification(addresses[1], auth_account_data(owner), 7),
+            _program_notification(addresses[1], auth_account_data(owner), 8),
+            _program_notification(addresses[0], auth_account_data(owner), 8),
+        ]
+    ]
+    async with _server(script) as (url, _):
+        subscription = client.subscribe_all(ws_url=url, max_tracked_accounts=2)
+        async with subscription as updates:
+            received = await _take(updates, 5)
+    assert [(upd.public_key, upd.slot) for upd in received] == [
+        (addresses[0], 5),
+        (addresses[1], 5),
+        (addresses[2], 6),
+        (addresses[1], 7),
+        (addresses[0], 8),
+    ]
+    assert list(subscription._last_data) == [addresses[1], addresses[0]]
+    with raises(ValueError):
+        client.subscribe_all(max_tracked_accounts=0)